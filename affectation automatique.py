@@ -1,4 +1,5 @@
 import json
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import os
@@ -15,6 +16,11 @@ tampon_15m = 0.25
 temps_minimal = 0.20
 seuil_atelier = 1.25
 
+# --- Rendu du graphique ---
+# "webgl" : une trace Scattergl par couleur + une trace texte (rapide, même pour tout un matériel)
+# "detail" : une trace et des annotations par marche
+MODE_RENDU = "webgl"
+
 # --- Parc de rames ---
 parc = {
     "C": {"modele": "Corail", "numero": 22201, "quantite": 3, "utilise": 0,"places":704},
@@ -190,6 +196,115 @@ def calcul_pphpd_par_direction(df_assign, parc):
 
     return pd.DataFrame(resultats)
 
+# --- Rendu WebGL groupé ---
+def _segments(debuts, fins, ys, textes):
+    """Segments séparés par None (une seule trace pour tous les segments)."""
+    n = len(debuts)
+    x = np.full(3 * n, None, dtype=object)
+    y = np.full(3 * n, None, dtype=object)
+    t = np.full(3 * n, None, dtype=object)
+    x[0::3], x[1::3] = debuts, fins
+    y[0::3], y[1::3] = ys, ys
+    t[0::3], t[1::3] = textes, textes
+    return x, y, t
+
+
+def ajouter_traces_webgl(fig, df_assign, rame_list, UM2, UM3, df_km_par_rame):
+    """
+    Ajoute au graphique une trace Scattergl par classe de couleur (voyageurs / HLP)
+    et une seule trace texte pour toutes les étiquettes (UM, gares, HLP, écarts courts, km).
+    """
+    n = len(rame_list)
+    y_par_rame = {rame: n - 1 - i for i, rame in enumerate(rame_list)}
+
+    d = df_assign.sort_values("depart", kind="stable").sort_values("rame", kind="stable")
+    rames = d["rame"].to_numpy()
+    y = d["rame"].map(y_par_rame).to_numpy(dtype=float)
+    dep = d["depart"].to_numpy(dtype=float)
+    arr = d["arrivee"].to_numpy(dtype=float)
+    hlp = d["vide_voyageur"].astype(bool).to_numpy()
+    marche = d["marche"]
+    gare_dep = d["gare_depart"].astype(str)
+    gare_arr = d["gare_arrivee"].astype(str)
+
+    survol = (
+        "Rame: " + d["rame"].astype(str)
+        + "<br>Marche: " + marche.astype(str)
+        + "<br>Départ: " + gare_dep + " (" + d["depart"].map(h_dec_to_hm) + ")"
+        + "<br>Arrivée: " + gare_arr + " (" + d["arrivee"].map(h_dec_to_hm) + ")"
+    ).to_numpy()
+
+    # --- Barres : une trace par couleur ---
+    for couleur, masque in (("green", ~hlp), ("orange", hlp)):
+        if not masque.any():
+            continue
+        x, ys, textes = _segments(dep[masque], arr[masque], y[masque], survol[masque])
+        fig.add_trace(go.Scattergl(
+            x=x, y=ys, text=textes,
+            mode="lines",
+            line=dict(color=couleur, width=8),
+            hovertemplate="%{text}<extra></extra>",
+            showlegend=False,
+        ))
+
+    # --- Étiquettes : une seule trace texte ---
+    lx, ly, ltxt, lpos, lcoul, ltaille = [], [], [], [], [], []
+
+    def etiquettes(x, y_, txt, position, couleur="black", taille=8):
+        lx.extend(x)
+        ly.extend(y_)
+        ltxt.extend(txt)
+        lpos.extend([position] * len(x))
+        lcoul.extend([couleur] * len(x))
+        ltaille.extend([taille] * len(x))
+
+    milieu = (dep + arr) / 2
+    voy = ~hlp
+
+    # UM2 / UM3
+    for nom, ensemble in (("UM2", UM2), ("UM3", UM3)):
+        m = voy & marche.isin(ensemble).to_numpy()
+        etiquettes(milieu[m], y[m], [f"<b>{nom}</b>"] * int(m.sum()), "middle center", "cyan")
+
+    # Gares des marches voyageurs assez longues
+    m = voy & (arr - dep >= 0.60)
+    etiquettes(dep[m], y[m], ("<b>" + gare_dep[m] + "</b>").tolist(), "top right")
+    etiquettes(arr[m], y[m], ("<b>" + gare_arr[m] + "</b>").tolist(), "top left")
+
+    # HLP
+    etiquettes(milieu[hlp], y[hlp], ["<b>HLP</b>"] * int(hlp.sum()), "top center")
+
+    # Écarts de moins de 20 min entre deux marches d'une même rame
+    meme_rame = np.zeros(len(d), dtype=bool)
+    meme_rame[1:] = rames[1:] == rames[:-1]
+    ecart = np.full(len(d), np.inf)
+    ecart[1:] = dep[1:] - arr[:-1]
+    m = meme_rame & (ecart < 0.333)
+    prev_arr = np.roll(arr, 1)
+    etiquettes(
+        prev_arr[m] + ecart[m] / 2, y[m],
+        [f"<b>{int(round(e * 60))}</b>" for e in ecart[m]],
+        "middle center", "red",
+    )
+
+    # Total km par rame à 23h
+    km = df_km_par_rame[df_km_par_rame["rame"].isin(y_par_rame)]
+    etiquettes(
+        [23] * len(km), km["rame"].map(y_par_rame).tolist(),
+        [f"<b>{int(v)} km</b>" for v in km["distance_km"]],
+        "middle right", "blue", 10,
+    )
+
+    fig.add_trace(go.Scattergl(
+        x=lx, y=ly, text=ltxt,
+        mode="text",
+        textposition=lpos,
+        textfont=dict(color=lcoul, size=ltaille),
+        hoverinfo="skip",
+        showlegend=False,
+    ))
+
+
 # --- Parcourir tous les fichiers JSON ---
 for fichier_json in os.listdir(DOSSIER_JSON):
     if not fichier_json.endswith(".json"):
@@ -241,7 +356,7 @@ for fichier_json in os.listdir(DOSSIER_JSON):
             assignments.append(soir)
 
     df_assign = pd.DataFrame(assignments)
-    df_assign["vide_voyageur"] = df_assign["vide_voyageur"].fillna(False)
+    df_assign["vide_voyageur"] = df_assign["vide_voyageur"].astype("boolean").fillna(False)
 
     # --- Identifier les UM ---
     marche_counts = df_assign["marche"].value_counts()
@@ -293,130 +408,136 @@ for fichier_json in os.listdir(DOSSIER_JSON):
     )
 
 
-    for i, rame in enumerate(rame_list):
-        sous_df = df_assign[df_assign["rame"] == rame].sort_values("depart")
-        y = len(rame_list) - 1 - i
-
-        prev_arrivee = None  # Pour calculer l'écart entre marches
-
-        for _, row in sous_df.iterrows():
-            color = "green" if not row["vide_voyageur"] else "orange"
-            # width = 1 if (row["marche"] in UM2 or row["marche"] in UM3) and not row["vide_voyageur"] else 8
-            width=8
-            #offsets = [-0.1, 0.1] if (row["marche"] in UM2 or row["marche"] in UM3) and not row["vide_voyageur"] else [0]
-            offsets=[0]
-            for off in offsets:
-                fig.add_trace(go.Scatter(
-                    x=[row["depart"], row["arrivee"]],
-                    y=[y + off, y + off],
-                    mode="lines",
-                    line=dict(color=color, width=width),
-                    hovertemplate=(
-                        f"Rame: {rame}<br>"
-                        f"Marche: {row['marche']}<br>"
-                        f"Départ: {row['gare_depart']} ({h_dec_to_hm(row['depart'])})<br>"
-                        f"Arrivée: {row['gare_arrivee']} ({h_dec_to_hm(row['arrivee'])})"
-                    ),
-                    showlegend=False,
-                    name=" "
-                ))
-                if row["vide_voyageur"]:
-                    break
-                # Annotations pour UM2 ou UM3
-                if row["marche"] in UM2:
-                    # double barre → annotation "2"
-                    milieu = (row["depart"] + row["arrivee"]) / 2
+    if MODE_RENDU == "webgl":
+        ajouter_traces_webgl(fig, df_assign, rame_list, UM2, UM3, df_km_par_rame)
+    else:
+        for i, rame in enumerate(rame_list):
+            sous_df = df_assign[df_assign["rame"] == rame].sort_values("depart")
+            y = len(rame_list) - 1 - i
+
+            prev_arrivee = None  # Pour calculer l'écart entre marches
+
+            for _, row in sous_df.iterrows():
+                color = "green" if not row["vide_voyageur"] else "orange"
+                # width = 1 if (row["marche"] in UM2 or row["marche"] in UM3) and not row["vide_voyageur"] else 8
+                width=8
+                #offsets = [-0.1, 0.1] if (row["marche"] in UM2 or row["marche"] in UM3) and not row["vide_voyageur"] else [0]
+                offsets=[0]
+                for off in offsets:
+                    fig.add_trace(go.Scatter(
+                        x=[row["depart"], row["arrivee"]],
+                        y=[y + off, y + off],
+                        mode="lines",
+                        line=dict(color=color, width=width),
+                        hovertemplate=(
+                            f"Rame: {rame}<br>"
+                            f"Marche: {row['marche']}<br>"
+                            f"Départ: {row['gare_depart']} ({h_dec_to_hm(row['depart'])})<br>"
+                            f"Arrivée: {row['gare_arrivee']} ({h_dec_to_hm(row['arrivee'])})"
+                        ),
+                        showlegend=False,
+                        name=" "
+                    ))
+                    if row["vide_voyageur"]:
+                        break
+                    # Annotations pour UM2 ou UM3
+                    if row["marche"] in UM2:
+                        # double barre → annotation "2"
+                        milieu = (row["depart"] + row["arrivee"]) / 2
+                        fig.add_annotation(
+                            x=milieu,
+                            y=y + off,
+                            text="<b style='color:cyan'>UM2</b>",
+                            showarrow=False,
+                            font=dict(size=8, color="black"),
+                            xanchor="center",
+                            yanchor="middle"
+                        )
+                    elif row["marche"] in UM3:
+                        # triple UM → annotation "3"
+                        milieu = (row["depart"] + row["arrivee"]) / 2
+                        fig.add_annotation(
+                            x=milieu,
+                            y=y + off,
+                            text="<b style='color:cyan'>UM3</b>",
+                            showarrow=False,
+                            font=dict(size=8, color="black"),
+                            xanchor="center",
+                            yanchor="middle"
+                        )
+
+                # Étiquettes des gares
+                duree = row["arrivee"] - row["depart"]
+                if not row["vide_voyageur"] and duree >= 0.60:
                     fig.add_annotation(
-                        x=milieu,
-                        y=y + off,
-                        text="<b style='color:cyan'>UM2</b>",
+                        x=row["depart"],
+                        y=y+0.01,
+                        text=f"<b>{row['gare_depart']}</b>",
                         showarrow=False,
-                        font=dict(size=8, color="black"),
-                        xanchor="center",
-                        yanchor="middle"
+                        font=dict(size=8),
+                        xanchor="left",
+                        yanchor="bottom"
                     )
-                elif row["marche"] in UM3:
-                    # triple UM → annotation "3"
-                    milieu = (row["depart"] + row["arrivee"]) / 2
                     fig.add_annotation(
-                        x=milieu,
-                        y=y + off,
-                        text="<b style='color:cyan'>UM3</b>",
+                        x=row["arrivee"],
+                        y=y+0.01,
+                        text=f"<b>{row['gare_arrivee']}</b>",
+                        showarrow=False,
+                        font=dict(size=8),
+                        xanchor="right",
+                        yanchor="bottom"
+                    )
+                if row["vide_voyageur"]:
+                    fig.add_annotation(
+                        x=(row["depart"] + row["arrivee"]) / 2,
+                        y=y+0.01,
+                        text=f"<b>HLP</b>",
                         showarrow=False,
-                        font=dict(size=8, color="black"),
+                        font=dict(size=8),
                         xanchor="center",
-                        yanchor="middle"
+                        yanchor="bottom"
                     )
 
-            # Étiquettes des gares
-            duree = row["arrivee"] - row["depart"]
-            if not row["vide_voyageur"] and duree >= 0.60:
-                fig.add_annotation(
-                    x=row["depart"],
-                    y=y+0.01,
-                    text=f"<b>{row['gare_depart']}</b>",
-                    showarrow=False,
-                    font=dict(size=8),
-                    xanchor="left",
-                    yanchor="bottom"
-                )
-                fig.add_annotation(
-                    x=row["arrivee"],
-                    y=y+0.01,
-                    text=f"<b>{row['gare_arrivee']}</b>",
-                    showarrow=False,
-                    font=dict(size=8),
-                    xanchor="right",
-                    yanchor="bottom"
-                )
-            if row["vide_voyageur"]:
-                fig.add_annotation(
-                    x=(row["depart"] + row["arrivee"]) / 2,
-                    y=y+0.01,
-                    text=f"<b>HLP</b>",
-                    showarrow=False,
-                    font=dict(size=8),
-                    xanchor="center",
-                    yanchor="bottom"
-                )
-
-            # --- Nouvelle annotation rouge si moins de 20 min entre marches ---
-            if prev_arrivee is not None:
-                ecart = row["depart"] - prev_arrivee
-                if ecart < 0.333:  # 20 minutes
-                    minutes = int(round(ecart * 60))
-                    milieu = prev_arrivee + ecart / 2
+                # --- Nouvelle annotation rouge si moins de 20 min entre marches ---
+                if prev_arrivee is not None:
+                    ecart = row["depart"] - prev_arrivee
+                    if ecart < 0.333:  # 20 minutes
+                        minutes = int(round(ecart * 60))
+                        milieu = prev_arrivee + ecart / 2
+                        fig.add_annotation(
+                            x=milieu,
+                            y=y+off,
+                            text=f"<b style='color:red'>{minutes}</b>",
+                            showarrow=False,
+                            font=dict(size=8, color="red"),
+                            xanchor="center",
+                            yanchor="middle"
+                        )
+
+                prev_arrivee = row["arrivee"]  # Mettre à jour pour la prochaine marche
+            
+                # --- Annotation du total de km à 23h ---
+                total_rame_km = df_km_par_rame.loc[df_km_par_rame["rame"] == rame, "distance_km"]
+                if not total_rame_km.empty:
+                    total_rame_km = int(total_rame_km.values[0])
                     fig.add_annotation(
-                        x=milieu,
-                        y=y+off,
-                        text=f"<b style='color:red'>{minutes}</b>",
+                        x=23,
+                        y=y,
+                        text=f"<b>{total_rame_km} km</b>",
                         showarrow=False,
-                        font=dict(size=8, color="red"),
-                        xanchor="center",
+                        font=dict(size=10, color="blue"),
+                        xanchor="left",
                         yanchor="middle"
                     )
 
-            prev_arrivee = row["arrivee"]  # Mettre à jour pour la prochaine marche
-            
-            # --- Annotation du total de km à 23h ---
-            total_rame_km = df_km_par_rame.loc[df_km_par_rame["rame"] == rame, "distance_km"]
-            if not total_rame_km.empty:
-                total_rame_km = int(total_rame_km.values[0])
-                fig.add_annotation(
-                    x=23,
-                    y=y,
-                    text=f"<b>{total_rame_km} km</b>",
-                    showarrow=False,
-                    font=dict(size=10, color="blue"),
-                    xanchor="left",
-                    yanchor="middle"
-                )
-
-
-
-    # Lignes verticales toutes les 30 min
-    for h in [x*0.5 for x in range(10, 49)]:  # 5h à 24h
-        fig.add_vline(x=h, line=dict(color="gray", width=1, dash="dot"), layer="below")
+
+
+    # Lignes verticales toutes les 30 min (une seule mise à jour du layout, add_vline est lent)
+    fig.update_layout(shapes=[
+        dict(type="line", xref="x", yref="paper", x0=h, x1=h, y0=0, y1=1,
+             line=dict(color="gray", width=1, dash="dot"), layer="below")
+        for h in [x*0.5 for x in range(10, 49)]  # 5h à 24h
+    ])
 
     # Ticks horaires
     tick_vals = list(range(5, 25))
@@ -1,73 +1,83 @@
 # generate_pdf_from_marches.py
 import json
-import pandas as pd
+import hashlib
 import os
-import matplotlib.pyplot as plt
-import tempfile
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-
-# ------------------ Paramètres généraux ------------------
-DOSSIER_JSON = "marches_json"
-KM_MARCHES_FILE = "km_marches.json"
-
-# Paramètres métiers
-m_st_chrls = "MSC"
-navette_time = 0.083
-tampon = 0.333
-tampon_15m = 0.25
-temps_minimal = 0.21
-seuil_atelier = 1.25
-
-# Parc de rames
-parc = {
-    "R2N":    {"modele": "Regio2n",   "numero": 22201, "quantite": 10,  "utilise": 0, "places": 505},
-    "BGC":    {"modele": "BGC",       "numero": 81501, "quantite": 22,  "utilise": 0, "places": 200},
-    "REG":    {"modele": "Regiolis",  "numero": 84501, "quantite": 15,  "utilise": 0, "places": 220},
-    "2NPG":   {"modele": "2NPG",      "numero": 23501, "quantite": 30,  "utilise": 0, "places": 210},
-}
-
-# Gare où les rames sont affectés en dépôt
-DEPOT_AFFECTATION = {
-    "R2N": "AVG",
-    "BGC": "AVG",
-    "REG": "MBC",
-    "2NPG": "MBC",
-}
-
+import time
+import parametres
+from parametres import (
+    DOSSIER_JSON, KM_MARCHES_FILE, MAINTENANCE_FILE, PARC_RAMES_FILE, LIGNES_FILE,
+    parc, DEPOT_AFFECTATION, GARE_REMISAGE, charger_km, distances,
+    charger_maintenances, valeurs_parametres,
+)
+from modele_affectation import TypeMarche, ColonnesAffectation, compacter
+from compatibilite import materiels_candidats, construire_matrice
+
+# Les modules lourds ou optionnels (pandas et le cache des marches, ReportLab pour les PDF,
+# export HTML, base SQLite, convertisseur Excel) sont importés dans les fonctions qui s'en servent :
+# importer le moteur ne charge ni ne lit rien d'autre que les paramètres, et la ligne de commande
+# analyse ses arguments (--help compris) avant de charger pandas.
 
 # Stockage de l’équilibre des flux par axe (pour affichage dans les PDF matériels)
 # FLUX_PAR_AXE[axe_label] = {"fichier": ..., "flux": df, "materiels": [codes]}
 FLUX_PAR_AXE = {}
 
+# Nombre de processus pour le rendu des PDF (None = nombre de cœurs, 1 = séquentiel)
+NB_PROCESS_RENDU = None
+
+# Export HTML interactif des roulements (roulements_<matériel>.html).
+# Désactivé par défaut comme les autres exports : --format html ou EXPORT_HTML = True.
+EXPORT_HTML = False
+
+# Enregistrement du scénario (marches, affectations, maintenances, KPI) dans la base SQLite.
+# Désactivé par défaut (la chaîne ne produit que les PDF) : --format sqlite ou EXPORT_SQLITE = True.
+EXPORT_SQLITE = False
+SCENARIO = "base"
+
+# Export des résultats en tables typées (export_resultats) : "csv", "parquet" ou None.
+# Aucun par défaut (--format csv / parquet) ; Parquet demande pyarrow ou fastparquet, non requis.
+EXPORT_RESULTATS = None
+
+# Formats de sortie connus de exporter() (--format en ligne de commande)
+FORMATS_EXPORT = ["pdf", "html", "sqlite", "parquet", "csv"]
+
+# Mode surveillance (python affectation_pdf.py watch) : fréquence de scrutation (s)
+# et exports horaires (xlsx / csv) reconvertis dans DOSSIER_JSON quand ils changent.
+# Aucun par défaut : les marches de DOSSIER_JSON sont retouchées à la main (marches vides,
+# UM...) et une reconversion les écraserait ; à activer ici ou par watch --pdt FICHIER.
+INTERVALLE_SURVEILLANCE = 0.5
+FICHIERS_PDT = []
+
+# Empreintes des données de chaque sortie déjà produite (PDF, HTML, base, tables de résultats) :
+# une sortie dont les données n'ont pas changé n'est pas regénérée
+CACHE_RENDU_FILE = ".cache_rendu.json"
+
+# Réglages de rendu_pdf qui changent les PDF, modifiables à l'exécution (rendu_pdf.MODE_CHAINAGE = "km") :
+# pris dans l'empreinte des documents et transmis aux processus de rendu
+REGLAGES_RENDU = ["MODE_CHAINAGE", "SEUIL_CHAINAGE_DENSE", "RENDU_STREAMING", "PAGES_PAR_MORCEAU"]
+
+_empreintes_code = {}   # module → sha256 de son code, calculé une fois par processus
+
 
 # ------------------ Fonctions d'affectation ------------------
 def get_rame_id(nom_ligne: str):
-    """Retourne un ID de rame en fonction du fichier de marches."""
-    if nom_ligne == "marches_intervilles-marseille-lyon.json":
-        key = "R2N"
-    elif nom_ligne == "marches_marseille-toulon-hyeres-les-arcs-draguignan.json":
-        key = "2NPG"
-    elif nom_ligne == "marches_marseille-avignon.json":
-        key = "2NPG"
-    elif nom_ligne == "marches_vallee-du-rhone.json":
-        key = "R2N"
-    elif nom_ligne == "marches_marseille-miramas-via-cote-bleue.json":
-        key = "REG"
-    else:
-        key = "BGC" if parc["BGC"]["utilise"] < parc["BGC"]["quantite"] else "REG"
+    """
+    Retourne un ID de rame en fonction du fichier de marches : premier matériel candidat
+    (préférences compatibles avec la traction de la ligne, voir compatibilite) ayant encore des rames.
+    """
+    candidats = materiels_candidats(nom_ligne)
+    if not candidats:
+        raise RuntimeError(f"Aucun matériel compatible avec la ligne {nom_ligne}")
 
-    if parc[key]["utilise"] >= parc[key]["quantite"]:
-        raise RuntimeError(f"Plus de rames disponibles pour {parc[key]['modele']}")
+    key = next((code for code in candidats if parc[code]["utilise"] < parc[code]["quantite"]), None)
+    if key is None:
+        raise RuntimeError(f"Plus de rames disponibles pour {parc[candidats[-1]]['modele']}")
 
     rame_id = parc[key]["numero"] + parc[key]["utilise"]
     parc[key]["utilise"] += 1
     return rame_id
 
 
-def navette_mat(rame_id, gare_dep, depart, tampon, navette_time):
+def navette_mat(rame_id, gare_dep, depart, tampon, navette_time, assignments):
     navette_dict = {
         "MSC": {"gare_depart": "MBC", "gare_arrivee": "MSC"},
         "AVV": {"gare_depart": "AVG", "gare_arrivee": "AVV"},
@@ -84,93 +94,47 @@ def navette_mat(rame_id, gare_dep, depart, tampon, navette_time):
         "BRI": {"gare_depart": "BRG", "gare_arrivee": "BRI"},
     }
     if gare_dep not in navette_dict:
-        return None
+        return
 
     info = navette_dict[gare_dep]
-    return {
-        "rame": rame_id,
-        "marche": f"EVM{depart}{gare_dep}",
-        "gare_depart": info["gare_depart"],
-        "depart": depart - tampon - navette_time,
-        "gare_arrivee": info["gare_arrivee"],
-        "arrivee": depart - tampon,
-        "vide_voyageur": True,
-    }
+    assignments.ajouter(
+        rame_id, f"EVM{depart}{gare_dep}",
+        info["gare_depart"], depart - tampon - navette_time,
+        info["gare_arrivee"], depart - tampon,
+        TypeMarche.EVM,
+    )
 
 
-def navette_soir(rame_id, gare_dep, dispo):
-    mapping = {
-        "MSC": "MBC",
-        "AVV": "AVG",
-        "AVI": "AVG",
-        "LPR": "LYG",
-        "LYD": "LYG",
-        "MAS": "MAG",
-        "HYE": "HYG",
-        "TLN": "TLG",
-        "LAC": "LAG",
-        "AXP": "AXG",
-        "GAP": "GAG",
-        "SIS": "SIG",
-        "BRI": "BRG",
-    }
-    if gare_dep not in mapping:
-        return None
-    return {
-        "rame": rame_id,
-        "marche": f"EVS{dispo}",
-        "gare_depart": gare_dep,
-        "depart": dispo + tampon_15m,
-        "gare_arrivee": mapping[gare_dep],
-        "arrivee": dispo + tampon_15m + navette_time,
-        "vide_voyageur": True,
-    }
+def navette_soir(rame_id, gare_dep, dispo, assignments):
+    if gare_dep not in GARE_REMISAGE:
+        return
+    assignments.ajouter(
+        rame_id, f"EVS{dispo}",
+        gare_dep, dispo + parametres.tampon_15m,
+        GARE_REMISAGE[gare_dep], dispo + parametres.tampon_15m + parametres.navette_time,
+        TypeMarche.EVS,
+    )
 
 
 def gestion_evo(rame_id, gare_dep, depart, state, assignments):
-    mapping_navette = {
-        "MSC": "MBC",
-        "AVV": "AVG",
-        "AVI": "AVG",
-        "LPR": "LYG",
-        "LYD": "LYG",
-        "MAS": "MAG",
-        "HYE": "HYG",
-        "TLN": "TLG",
-        "LAC": "LAG",
-        "AXP": "AXG",
-        "GAP": "GAG",
-        "SIS": "SIG",
-        "BRI": "BRG",
-    }
-
-    if gare_dep not in mapping_navette:
+    if gare_dep not in GARE_REMISAGE:
         return
 
-    gare_navette = mapping_navette[gare_dep]
-
-    assignments.append(
-        {
-            "rame": rame_id,
-            "marche": f"EVI{rame_id}",
-            "gare_depart": gare_dep,
-            "depart": state["dispo"] + tampon_15m,
-            "gare_arrivee": gare_navette,
-            "arrivee": state["dispo"] + navette_time + tampon_15m,
-            "vide_voyageur": True,
-        }
+    gare_navette = GARE_REMISAGE[gare_dep]
+    tampon_15m, navette_time = parametres.tampon_15m, parametres.navette_time
+
+    assignments.ajouter(
+        rame_id, f"EVI{rame_id}",
+        gare_dep, state["dispo"] + tampon_15m,
+        gare_navette, state["dispo"] + navette_time + tampon_15m,
+        TypeMarche.EVI,
     )
 
-    assignments.append(
-        {
-            "rame": rame_id,
-            "marche": f"EVO{rame_id}",
-            "gare_depart": gare_navette,
-            "depart": depart - navette_time - tampon_15m,
-            "gare_arrivee": gare_dep,
-            "arrivee": depart - tampon_15m,
-            "vide_voyageur": True,
-        }
+    assignments.ajouter(
+        rame_id, f"EVO{rame_id}",
+        gare_navette, depart - navette_time - tampon_15m,
+        gare_dep, depart - tampon_15m,
+        TypeMarche.EVO,
     )
 
     state["gare"] = gare_dep
@@ -183,153 +147,39 @@ def calcul_pphpd_par_direction(df_assign, parc):
     PPHPD avec règle :
       - avant 12h = basé sur l'heure d'arrivée
       - après 12h = basé sur l'heure de départ
+    Seules les marches commerciales avec voyageurs comptent ; direction par parité du numéro
+    (pair = Paris, impair = Province), capacité = places du matériel de la rame.
     """
-    resultats = []
+    import pandas as pd
 
     if df_assign.empty:
-        return pd.DataFrame(resultats)
+        return pd.DataFrame([])
 
     # heure de référence PPHPD
-    df_assign = df_assign.copy()
-    df_assign["heure_pphpd"] = df_assign.apply(
-        lambda r: r["arrivee"] if r["arrivee"] < 12 else r["depart"],
-        axis=1
-    )
+    heure_pphpd = df_assign["arrivee"].where(df_assign["arrivee"] < 12, df_assign["depart"])
+    hmin = int(heure_pphpd.min())
+    hmax = int(heure_pphpd.max()) + 1
 
-    hmin = int(df_assign["heure_pphpd"].min())
-    hmax = int(df_assign["heure_pphpd"].max()) + 1
+    commerciale = (df_assign["type_marche"] == TypeMarche.COMMERCIALE) & ~df_assign["vide_voyageur"].astype(bool)
+    numero = pd.to_numeric(df_assign["marche"].astype(object), errors="coerce")
+    places = df_assign["materiel"].astype(object).map({code: info["places"] for code, info in parc.items()})
+    compte = commerciale & numero.notna() & places.notna()
 
-    for h in range(hmin, hmax):
-        tranche = df_assign[
-            (df_assign["heure_pphpd"] >= h)
-            & (df_assign["heure_pphpd"] < h + 1)
-            & (~df_assign["vide_voyageur"])
-        ]
+    capacite = pd.DataFrame({
+        "heure": heure_pphpd[compte].astype(int),
+        "direction": (numero[compte] % 2).map({0: "Paris", 1: "Province"}),
+        "pphpd": places[compte].astype(int),
+    }).groupby(["heure", "direction"])["pphpd"].sum()
 
-        for direction in ["Paris", "Province"]:
-            capacite_totale = 0
-
-            for _, row in tranche.iterrows():
-                try:
-                    num = int(row["marche"])
-                except Exception:
-                    continue
-
-                # Direction via numéro pair/impair
-                if (num % 2 == 0 and direction == "Paris") or (
-                    num % 2 == 1 and direction == "Province"
-                ):
-
-                    rame = row["rame"]
-                    for key, info in parc.items():
-                        if info["numero"] <= rame < info["numero"] + info["quantite"]:
-                            capacite_totale += info["places"]
-                            break
-
-            resultats.append(
-                {"heure": h, "direction": direction, "pphpd": capacite_totale}
-            )
-
-    return pd.DataFrame(resultats)
-
-
-# ------------------ Layout PDF ------------------
-PAGE_WIDTH, PAGE_HEIGHT = A4  # portrait
-
-LEFT_MARGIN = 15 * mm
-RIGHT_MARGIN = 15 * mm
-TOP_MARGIN = 12 * mm
-BOTTOM_MARGIN = 12 * mm
-
-MAX_RAMES_PER_PAGE = 12
-ESPACEMENT_RAME = 10  # espace vertical entre cadres
-
-HAUTEUR_DISPO = PAGE_HEIGHT - TOP_MARGIN - BOTTOM_MARGIN
-RAME_HEIGHT = (HAUTEUR_DISPO - (MAX_RAMES_PER_PAGE - 1) * ESPACEMENT_RAME) / MAX_RAMES_PER_PAGE
-
-HEURE_MIN = 0
-HEURE_MAX = 24
-ECHELLE_HEURE = (PAGE_WIDTH - LEFT_MARGIN - RIGHT_MARGIN) / (HEURE_MAX - HEURE_MIN)
-
-# Fenêtre de référence pour la performance (en heure décimale)
-WINDOW_START = 5.5   # 5h30
-WINDOW_END   = 22.5  # 22h30
-WINDOW_DURATION = WINDOW_END - WINDOW_START  # 17h
-
-# Décalage horizontal (en points) pour la première / dernière gare
-FIRST_LABEL_OFFSET = 15
-LAST_LABEL_OFFSET = 15
-
-
-def x_from_time(horaire):
-    """Convertit une heure décimale en coordonnée X du PDF."""
-    return LEFT_MARGIN + (horaire - HEURE_MIN) * ECHELLE_HEURE
-
-
-def draw_train_bar(c, x1, x2, y, height=5, color=colors.black):
-    """Barre horizontale pour une marche (voyageurs ou HLP)."""
-    c.setFillColor(color)
-    c.rect(x1, y - height / 2, x2 - x1, height, stroke=0, fill=1)
-
-
-def format_time_hm(h):
-    """Retourne uniquement les minutes (MM) pour une heure décimale."""
-    try:
-        h = float(h)
-        h_int = int(h)
-        m = int(round((h - h_int) * 60))
-        if m == 60:
-            m = 0
-        return f"{m:02d}"
-    except Exception:
-        return str(h)
-
-
-def draw_station_label(c, x, y_base, gare, heure, align="left"):
-    """Affiche gare + heure sur deux lignes."""
-    c.setFont("Helvetica", 5)
-    if align == "left":
-        c.drawString(x, y_base, gare)
-        c.drawString(x, y_base - 5, heure)
-    elif align == "right":
-        c.drawRightString(x, y_base, gare)
-        c.drawRightString(x, y_base - 5, heure)
-    else:
-        c.drawCentredString(x, y_base, gare)
-        c.drawCentredString(x, y_base - 5, heure)
-
-
-def draw_time_only(c, x, y_base, heure, align="center"):
-    """Affiche uniquement l'heure sur une ligne."""
-    c.setFont("Helvetica", 5)
-    if align == "left":
-        c.drawString(x, y_base, heure)
-    elif align == "right":
-        c.drawRightString(x, y_base, heure)
-    else:
-        c.drawCentredString(x, y_base, heure)
-
-
-# ------------------ Chargement distances ------------------
-km_dict = {}
-if os.path.exists(KM_MARCHES_FILE):
-    with open(KM_MARCHES_FILE, "r", encoding="utf-8") as f:
-        try:
-            km_data = json.load(f)
-            for d in km_data:
-                km_dict[(d["origine"], d["destination"])] = d["distance"]
-                km_dict[(d["destination"], d["origine"])] = d["distance"]
-        except Exception as e:
-            print(f"⚠️ Erreur lecture {KM_MARCHES_FILE}: {e}")
-else:
-    print(f"⚠️ {KM_MARCHES_FILE} introuvable — les distances seront à 0.")
+    grille = pd.MultiIndex.from_product([range(hmin, hmax), ["Paris", "Province"]], names=["heure", "direction"])
+    return capacite.reindex(grille, fill_value=0).astype(int).reset_index()
 
 
 def get_distance_safe(row):
     if row.get("vide_voyageur", False):
         return 0
     try:
-        return km_dict[(row["gare_depart"], row["gare_arrivee"])]
+        return distances()[(row["gare_depart"], row["gare_arrivee"])]
     except KeyError:
         print(f"⚠️ Distance inconnue pour {row['gare_depart']} → {row['gare_arrivee']}")
         return 0
@@ -340,6 +190,13 @@ def get_distance_safe(row):
         return 0
 
 
+def gares_referentiel():
+    """Gares connues : trigrammes du convertisseur, km_marches.json, remisages et dépôts."""
+    from convertisseur_marche import GARE_TO_TRIGRAM
+    gares = set(GARE_TO_TRIGRAM.values()) | {g for trajet in distances() for g in trajet}
+    return gares | set(GARE_REMISAGE) | set(GARE_REMISAGE.values()) | set(DEPOT_AFFECTATION.values())
+
+
 def get_materiel_code_from_rame(rame_id):
     """Retourne le code matériel (R2N / BGC / REG / 2NPG) à partir d'un numéro de rame."""
     for code, info in parc.items():
@@ -348,668 +205,206 @@ def get_materiel_code_from_rame(rame_id):
     return None
 
 
-# ------------------ Page paramètres ------------------
-def draw_params_page(c, materiel_code, titre_suffix):
-    """Ajoute une page récap avec les paramètres de l'algo d'attribution + flux pour ce matériel."""
-    global FLUX_PAR_AXE
-
-    c.showPage()
-
-    # Titre de la page
-    titre = f"Paramètres de l'attribution – {titre_suffix}"
-    c.setFont("Helvetica-Bold", 14)
-    c.setFillColor(colors.black)
-    c.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - 40, titre)
-
-    y = PAGE_HEIGHT - 70
-    line_height = 12
-
-    # --- Paramètres généraux ---
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(LEFT_MARGIN, y, "Paramètres généraux :")
-    y -= line_height
-
-    c.setFont("Helvetica", 9)
-    c.drawString(LEFT_MARGIN, y, f"• Temps minimal entre deux marches : {temps_minimal:.3f} h (~{int(temps_minimal*60)} min)")
-    y -= line_height
-    c.drawString(LEFT_MARGIN, y, f"• Seuil atelier (évolution) : {seuil_atelier:.3f} h (~{int(seuil_atelier*60)} min)")
-    y -= line_height
-    c.drawString(LEFT_MARGIN, y, f"• Tampon général : {tampon:.3f} h (~{int(tampon*60)} min)")
-    y -= line_height
-    c.drawString(LEFT_MARGIN, y, f"• Tampon 15 min : {tampon_15m:.3f} h (~{int(tampon_15m*60)} min)")
-    y -= line_height
-    c.drawString(LEFT_MARGIN, y, f"• Durée navette (HLP dépôt↔gare) : {navette_time:.3f} h (~{int(navette_time*60)} min)")
-    y -= line_height
-
-    # --- Paramètres d'affichage ---
-    y -= line_height // 2
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(LEFT_MARGIN, y, "Paramètres d'affichage :")
-    y -= line_height
-
-    c.setFont("Helvetica", 9)
-    c.drawString(LEFT_MARGIN, y, f"• Plage horaire affichée : {HEURE_MIN}h → {HEURE_MAX}h")
-    y -= line_height
-    c.drawString(LEFT_MARGIN, y, f"• Offset premier label gare : {FIRST_LABEL_OFFSET} pts")
-    y -= line_height
-    c.drawString(LEFT_MARGIN, y, "• Affichage minutes uniquement pour les heures de départ / arrivée")
-    y -= line_height
-
-    # --- Indicateur de performance ---
-    y -= line_height // 2
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(LEFT_MARGIN, y, "Indicateur de performance :")
-    y -= line_height
-
-    c.setFont("Helvetica", 9)
-    c.drawString(
-        LEFT_MARGIN,
-        y,
-        f"• Fenêtre de référence : {WINDOW_START:.2f}h → {WINDOW_END:.2f}h (≈ 5h30–22h30)"
-    )
-    y -= line_height
-    c.drawString(
-        LEFT_MARGIN,
-        y,
-        f"• Durée de la fenêtre : {WINDOW_DURATION:.1f} h"
-    )
-    y -= line_height
-    c.drawString(
-        LEFT_MARGIN,
-        y,
-        "• Pour chaque rame : somme des durées en marche voyageurs dans cette fenêtre"
-    )
-    y -= line_height
-    c.drawString(
-        LEFT_MARGIN,
-        y,
-        "  divisée par la durée de la fenêtre, affichée en pourcentage (Perf : XX%)."
-    )
-    y -= line_height
-
-    # --- Parc de rames ---
-    y -= line_height // 2
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(LEFT_MARGIN, y, "Parc de rames utilisé :")
-    y -= line_height
-
-    c.setFont("Helvetica", 9)
-    for code, info in parc.items():
-        txt_line = (f"• {code} – {info['modele']}: "
-                    f"{info['quantite']} rames (numéros {info['numero']} à {info['numero'] + info['quantite'] - 1}), "
-                    f"{info['places']} places par rame")
-        c.drawString(LEFT_MARGIN, y, txt_line)
-        y -= line_height
-        if y < BOTTOM_MARGIN + 80:
-            c.showPage()
-            y = PAGE_HEIGHT - TOP_MARGIN
-
-    # --- Équilibre des flux par axe (tableaux) POUR CE MATERIEL ---
-    y -= line_height // 2
-    if y < BOTTOM_MARGIN + 80:
-        c.showPage()
-        y = PAGE_HEIGHT - TOP_MARGIN
-
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(LEFT_MARGIN, y, "Équilibre des flux par axe (Arrivées - Départs)")
-    y -= line_height
-
-    col_gare_x = LEFT_MARGIN
-    col_dep_x = LEFT_MARGIN + 80
-    col_arr_x = LEFT_MARGIN + 150
-    col_diff_x = LEFT_MARGIN + 230
-    row_h = 12
-
-    for axe_label, info in FLUX_PAR_AXE.items():
-        flux_df = info.get("flux")
-        fichier = info.get("fichier", "")
-        materiels = info.get("materiels", [])
-
-        # Ne montrer que les axes où ce matériel est engagé
-        if materiel_code not in materiels:
-            continue
+# ------------------ Boucle principale ------------------
+def _empreinte_marches(df):
+    h = hashlib.sha256()
+    _hash_dataframe(h, df)
+    return h.hexdigest()
 
-        if flux_df is None or flux_df.empty:
-            continue
 
-        if y < BOTTOM_MARGIN + 60:
-            c.showPage()
-            y = PAGE_HEIGHT - TOP_MARGIN
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(LEFT_MARGIN, y, "Équilibre des flux par axe (Arrivées - Départs)")
-            y -= line_height
-
-        # Titre de l'axe
-        c.setFont("Helvetica-Bold", 9)
-        titre_axe = f"{fichier} (axe : {axe_label})"
-        c.drawString(LEFT_MARGIN, y, titre_axe)
-        y -= row_h
-
-        # En-têtes du tableau
-        c.setFont("Helvetica-Bold", 8)
-        c.drawString(col_gare_x, y, "Gare")
-        c.drawString(col_dep_x,  y, "Départs")
-        c.drawString(col_arr_x,  y, "Arrivées")
-        c.drawString(col_diff_x, y, "Diff (Arr-Dep)")
-        y -= row_h
-
-        # Contenu du tableau
-        c.setFont("Helvetica", 8)
-        for _, row in flux_df.iterrows():
-            if y < BOTTOM_MARGIN + 40:
-                c.showPage()
-                y = PAGE_HEIGHT - TOP_MARGIN
-                c.setFont("Helvetica-Bold", 8)
-                c.drawString(col_gare_x, y, "Gare")
-                c.drawString(col_dep_x,  y, "Départs")
-                c.drawString(col_arr_x,  y, "Arrivées")
-                c.drawString(col_diff_x, y, "Diff (Arr-Dep)")
-                y -= row_h
-                c.setFont("Helvetica", 8)
-
-            # la gare est dans la première colonne après reset_index()
-            gare = str(row.iloc[0])
-
-            dep = int(row.get("Departs", 0))
-            arr = int(row.get("Arrivees", 0))
-            diff = int(row.get("Diff (Arr - Dep)", 0))
-
-            c.drawString(col_gare_x, y, gare)
-            c.drawRightString(col_dep_x + 30,  y, str(dep))
-            c.drawRightString(col_arr_x + 30,  y, str(arr))
-            c.drawRightString(col_diff_x + 40, y, str(diff))
-            y -= row_h
-
-        y -= row_h  # espace entre axes
-
-
-# ------------------ PDF par matériel ------------------
-def draw_pdf_for_material(df_assign_mat, materiel_code):
+def regrouper_um(df):
     """
-    Génère un PDF pour un type de matériel donné (R2N, BGC, REG, 2NPG).
+    Marches en unité multiple : les lignes identiques (même marche, gares et horaires) sont
+    regroupées en une seule marche avec um = nb de rames à coupler (colonne um additionnée
+    si le fichier la fournit). Ordre de première apparition conservé.
     """
-    if df_assign_mat.empty:
-        return
+    cles = ["marche", "gare_depart", "depart", "gare_arrivee", "arrivee"]
+    um = df["um"] if "um" in df.columns else 1
+    colonnes = {"um": ("um", "sum")}
+    if "vide_voyageur" in df.columns:
+        colonnes["vide_voyageur"] = ("vide_voyageur", "first")
+    return df.assign(um=um).groupby(cles, sort=False).agg(**colonnes).reset_index()
 
-    # --- Liste complète des rames du matériel (utilisées + inutilisées) ---
-    info = parc[materiel_code]
-    premier = info["numero"]
-    dernier = info["numero"] + info["quantite"] - 1
-    all_rames = list(range(premier, dernier + 1))
-
-    rames_utilisees = sorted(df_assign_mat["rame"].unique())
-    rames_inutilisees = [r for r in all_rames if r not in rames_utilisees]
-
-    # Ajouter des lignes pour rames inutilisées
-    lignes_vides = []
-    for rame in rames_inutilisees:
-        gare_dodo = DEPOT_AFFECTATION.get(materiel_code, "MBC")
-        lignes_vides.append({
-            "rame": rame,
-            "marche": None,
-            "gare_depart": gare_dodo,
-            "depart": None,
-            "gare_arrivee": gare_dodo,
-            "arrivee": None,
-            "vide_voyageur": False,
-            "distance_km": 0,
-            "axe": "Non utilisée",
-            "gare_dortoir": gare_dodo
-        })
-
-    if lignes_vides:
-        df_vides = pd.DataFrame(lignes_vides)
-        df_vides = df_vides.loc[:, ~(df_vides.isna().all())]  # évite warning pandas
-        df_assign_mat = pd.concat([df_assign_mat, df_vides], ignore_index=True)
-
-    # Rame list complète
-    rame_list = sorted(df_assign_mat["rame"].unique())
-
-    nom_pdf = f"roulements_{materiel_code}.pdf"
-    c = canvas.Canvas(nom_pdf, pagesize=A4)
-
-    # ------- Titre PDF -------
-    titre = f"Roulements – {materiel_code}"
-    c.setFont("Helvetica-Bold", 14)
-    c.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - 20, titre)
-
-    # Km par rame
-    df_km_par_rame = (
-        df_assign_mat[~df_assign_mat["vide_voyageur"]]
-        .groupby("rame")["distance_km"]
-        .sum()
-        .reset_index()
-    )
 
-    # Début / fin de journée
-    df_sorted_dep = df_assign_mat.sort_values("depart")
-    firsts = df_sorted_dep.groupby("rame").first()
-    df_sorted_arr = df_assign_mat.sort_values("arrivee")
-    lasts = df_sorted_arr.groupby("rame").last()
+def affecter_fichier(fichier_json, axe_label, df):
+    """
+    Affecte les marches d'un fichier (triées par départ) aux rames du parc.
+    Une marche en UM reçoit um rames (couplage) ; à l'arrivée chaque rame repart
+    de son côté (découplage) et reprend sa propre suite de marches.
+    Renvoie les affectations (HLP compris), l'équilibre des flux et le PPHPD de l'axe.
+    """
+    import pandas as pd
 
-    start_station = firsts["gare_depart"].to_dict()
-    end_station = lasts["gare_arrivee"].to_dict()
+    rame_state = {}
+    assignments = ColonnesAffectation()
+    temps_minimal, seuil_atelier = parametres.temps_minimal, parametres.seuil_atelier
 
-    # Numérotation lignes
-    nb_rames = len(rame_list)
-    rame_to_line = {rame: i + 1 for i, rame in enumerate(rame_list)}
+    for _, train in regrouper_um(df).iterrows():
 
-    # Compatibilités roulées
-    compatible = {i + 1: [] for i in range(nb_rames)}
+        gare_dep = train["gare_depart"]
+        depart = train["depart"]
+        um = int(train["um"])
+        rames_um = []
 
-    for i, rame_i in enumerate(rame_list):
-        li = i + 1
-        end_i = end_station.get(rame_i)
+        for _ in range(um):
+            candidate = None
 
-        for j, rame_j in enumerate(rame_list):
-            lj = j + 1
-            if end_i is not None and start_station.get(rame_j) == end_i and li != lj:
-                compatible[li].append(lj)
+            for rame_id, state in rame_state.items():
+                if rame_id in rames_um:
+                    continue
+                if state["gare"] == gare_dep and state["dispo"] + temps_minimal <= depart:
+                    if depart - state["dispo"] > seuil_atelier:
+                        gestion_evo(rame_id, state["gare"], depart, state, assignments)
+                    candidate = rame_id
+                    break
 
-        if not compatible[li]:
-            compatible[li].append(li)
+            if candidate is None:
+                candidate = get_rame_id(fichier_json)
+                navette_mat(candidate, gare_dep, depart, parametres.tampon_15m, parametres.navette_time, assignments)
+                rame_state[candidate] = {"gare": gare_dep, "dispo": 0}
 
-    next_line = {}
-    matchR = {}
+            rames_um.append(candidate)
+            assignments.ajouter(
+                candidate, train["marche"],
+                train["gare_depart"], train["depart"],
+                train["gare_arrivee"], train["arrivee"],
+                vide_voyageur=train.get("vide_voyageur", False),
+                um=um, um_tete=rames_um[0],
+            )
 
-    def dfs_match(i, seen):
-        for j in compatible[i]:
-            if j in seen:
-                continue
-            seen.add(j)
-            if j not in matchR or dfs_match(matchR[j], seen):
-                matchR[j] = i
-                return True
-        return False
+            rame_state[candidate]["gare"] = train["gare_arrivee"]
+            rame_state[candidate]["dispo"] = train["arrivee"]
 
-    for i in range(1, nb_rames + 1):
-        dfs_match(i, set())
+    # Ajouter navettes du soir
+    for rame_id, state in rame_state.items():
+        navette_soir(rame_id, state["gare"], state["dispo"], assignments)
 
-    for j, i in matchR.items():
-        next_line[i] = j
+    # stats par axe
+    df_assign_file = assignments.vers_dataframe(axe=axe_label)
+    df_assign_file["distance_km"] = df_assign_file.apply(get_distance_safe, axis=1)
+    df_assign_file["materiel"] = df_assign_file["rame"].apply(get_materiel_code_from_rame)
+    df_assign_file = compacter(df_assign_file)
 
-    for i in range(1, nb_rames + 1):
-        if i not in next_line:
-            next_line[i] = (i % nb_rames) + 1
+    premiers_depart = df_assign_file.sort_values("depart").groupby("rame").first()
+    dernieres_arrivee = df_assign_file.sort_values("arrivee").groupby("rame").last()
+    # value_counts sur les valeurs (une catégorie absente compterait 0)
+    depart_counts = premiers_depart["gare_depart"].astype(str).value_counts().rename("Departs")
+    arrivee_counts = dernieres_arrivee["gare_arrivee"].astype(str).value_counts().rename("Arrivees")
+    flux_balance = pd.concat([depart_counts, arrivee_counts], axis=1).fillna(0).astype(int)
+    flux_balance["Diff (Arr - Dep)"] = flux_balance["Arrivees"] - flux_balance["Departs"]
 
-    prev_line = {i: i for i in range(1, nb_rames + 1)}
-    for i, j in next_line.items():
-        prev_line[j] = i
+    return {
+        "assignments": df_assign_file,
+        "flux": {
+            "fichier": fichier_json,
+            "flux": flux_balance.reset_index(),
+            "materiels": sorted(df_assign_file["materiel"].dropna().unique().tolist()),
+        },
+        "pphpd": calcul_pphpd_par_direction(df_assign_file, parc),
+    }
 
-    # Performance
-    df_voy = df_assign_mat[~df_assign_mat["vide_voyageur"]].copy()
-    if not df_voy.empty:
-        df_voy["depart_clip"] = df_voy["depart"].clip(lower=WINDOW_START, upper=WINDOW_END)
-        df_voy["arrivee_clip"] = df_voy["arrivee"].clip(lower=WINDOW_START, upper=WINDOW_END)
-        df_voy["duree_fenetre"] = (df_voy["arrivee_clip"] - df_voy["depart_clip"]).clip(lower=0)
-        df_perf_par_rame = (
-            df_voy.groupby("rame")["duree_fenetre"].sum().reset_index()
-        )
-        df_perf_par_rame["taux_utilisation"] = (
-            df_perf_par_rame["duree_fenetre"] / WINDOW_DURATION * 100.0
-        )
-    else:
-        df_perf_par_rame = pd.DataFrame(columns=["rame", "duree_fenetre", "taux_utilisation"])
-
-    # Dessin des rames
-    y_start = PAGE_HEIGHT - TOP_MARGIN
-    rame_counter = 0
-    # ===== Détection des unités multiples (UM) =====
-    um_by_marche = (
-        df_assign_mat.groupby("marche")["rame"]
-        .apply(list)
-        .to_dict()
-    )
-    # ===============================================
-
-    for rame in rame_list:
-
-        if rame_counter >= MAX_RAMES_PER_PAGE:
-            c.showPage()
-            y_start = PAGE_HEIGHT - TOP_MARGIN
-            rame_counter = 0
-
-        sous_df = df_assign_mat[df_assign_mat["rame"] == rame].sort_values("depart")
-
-        cadre_top = y_start
-        cadre_bottom = y_start - RAME_HEIGHT
-        y_line = cadre_bottom + (RAME_HEIGHT / 2)
-
-        # ---- Roulement ----
-        ligne_auj = rame_to_line[rame]
-        ligne_demain = next_line[ligne_auj]
-        ligne_hier = prev_line[ligne_auj]
-
-        axe_label = " / ".join(sous_df["axe"].dropna().unique()) or "axe inconnu"
-        texte_roulement = f"{ligne_hier} ➜ {ligne_auj} ➜ {ligne_demain}"
-
-        # Cadre
-        c.setStrokeColor(colors.HexColor("#3A7ECB"))
-        c.rect(LEFT_MARGIN, cadre_bottom,
-               PAGE_WIDTH - LEFT_MARGIN - RIGHT_MARGIN,
-               RAME_HEIGHT)
-
-        # Titre rame + axe
-        c.setFont("Helvetica-Bold", 5)
-        c.setFillColor(colors.magenta)
-        c.drawString(LEFT_MARGIN + 6, cadre_top - 12, texte_roulement)
-        c.setFillColor(colors.green)
-        c.drawString(LEFT_MARGIN + 30, cadre_bottom + 4, axe_label)
-
-        # Performance
-        perf_row = df_perf_par_rame.loc[df_perf_par_rame["rame"] == rame]
-        if not perf_row.empty:
-            perf_val = perf_row["taux_utilisation"].values[0]
-            c.setFont("Helvetica-Bold", 5)
-            c.setFillColor(colors.green)
-            c.drawRightString(PAGE_WIDTH - RIGHT_MARGIN - 6,
-                              cadre_bottom + 4,
-                              f"Perf : {perf_val:.0f}%")
-            c.setFillColor(colors.black)
-
-        # Km total
-        km_row = df_km_par_rame.loc[df_km_par_rame["rame"] == rame]
-        if not km_row.empty:
-            km_val = int(km_row["distance_km"].values[0])
-            c.setFont("Helvetica-Bold", 5)
-            c.setFillColor(colors.blue)
-            c.drawString(LEFT_MARGIN + 6, cadre_bottom + 4, f"{km_val} km")
-            c.setFillColor(colors.black)
-
-        # === RAME INUTILISÉE ===
-        if sous_df["marche"].isna().all():
-            gare_dodo = sous_df.iloc[0]["gare_dortoir"]
-            c.setFont("Helvetica-Bold", 10)
-            c.setFillColor(colors.darkgray)
-            c.drawCentredString(
-                (LEFT_MARGIN + PAGE_WIDTH - RIGHT_MARGIN) / 2,
-                y_line + 5,
-                f"Rame garée à : {gare_dodo}"
-            )
-            y_start -= (RAME_HEIGHT + ESPACEMENT_RAME)
-            rame_counter += 1
-            continue
-        # =======================
-
-        # Ligne centrale
-        c.setStrokeColor(colors.black)
-        #c.line(LEFT_MARGIN, y_line, PAGE_WIDTH - RIGHT_MARGIN, y_line)
-
-        # Traits horaires
-        c.setFont("Helvetica", 4)
-        for h in range(HEURE_MIN, HEURE_MAX + 1):
-            xh = x_from_time(h)
-            c.setLineWidth(.8) 
-            c.setStrokeColor(colors.lightgrey)
-            c.setDash(1, 2)
-            c.line(xh, cadre_bottom, xh, cadre_top,)
-            c.setDash()
-            c.setFillColor(colors.black)
-            c.drawString(xh - 5, cadre_top - 6, f"{h}h")
-            c.setLineWidth(1) 
-
-
-        # === Marches classiques ===
-        prev_node = None
-        prev_arrivee = None
-        premiere_marche = True
-
-        for _, row in sous_df.iterrows():
-            # ===== Détection UM pour cette marche =====
-            marche = row["marche"]
-            um_list = um_by_marche.get(marche, [])
-            is_um = len(um_list) >= 2
-            is_current_lead = (is_um and rame == um_list[0])
-            # ==========================================
-
-            x1 = x_from_time(row["depart"])
-            x2 = x_from_time(row["arrivee"])
-
-            if x2 < LEFT_MARGIN:
-                continue
-            if x1 > PAGE_WIDTH - RIGHT_MARGIN:
-                continue
 
-            x1 = max(x1, LEFT_MARGIN + 2)
-            x2 = min(x2, PAGE_WIDTH - RIGHT_MARGIN - 2)
-
-            if row.get("vide_voyageur", True):
-                bar_color = colors.lightgrey
-            else:
-                bar_color = colors.black
-            # ===== Choix épaisseur selon UM =====
-            if is_um:
-                if is_current_lead:
-                    draw_train_bar(c, x1, x2, y_line+ 1.5, height=3, color=bar_color)
-                    draw_train_bar(c, x1, x2, y_line- 2, height=0.75, color=bar_color)
-                else:
-                    draw_train_bar(c, x1, x2, y_line+ 2, height=0.75, color=bar_color)
-                    draw_train_bar(c, x1, x2, y_line- 1.5, height=3, color=bar_color)
-            else:
-                    draw_train_bar(c, x1, x2, y_line, height=5, color=bar_color) # Cas normal
-
-            # if row.get("vide_voyageur", False):
-            #     # === HLP → ligne ondulée ===
-            #     draw_wave_bar(c, x1, x2, y_line, amplitude=2, wavelength=8, color=colors.lightgrey)
-            # else:
-            #     # === Marche voyageurs → barre normale ===
-            #     draw_train_bar(c, x1, x2, y_line, height=5, color=colors.black)
-
-            # ====================================
-
-            gare_dep = str(row["gare_depart"])
-            gare_arr = str(row["gare_arrivee"])
-            heure_dep = format_time_hm(row["depart"])
-            heure_arr = format_time_hm(row["arrivee"])
-
-            depart_label_deja_fait = False
-            c.setFillColor(colors.black)
-
-            # --- Affichage de la gare de départ ---
-            if prev_node is not None:
-                if prev_node["gare"] == gare_dep:
-                    # Gares identiques → on affiche au milieu
-                    xm = (prev_node["x"] + x1) / 2.0
-                    y_base = y_line - 7
-
-                    c.setFont("Helvetica", 5)
-                    c.drawCentredString(xm, y_base, gare_dep)
-
-                    draw_time_only(c, prev_node["x"], y_base - 5, prev_node["heure"], "center")
-                    draw_time_only(c, x1, y_base - 10, heure_dep, "center")
-
-                    depart_label_deja_fait = True
-                else:
-                    # On affiche la gare précédente à droite
-                    draw_station_label(
-                        c,
-                        prev_node["x"] - 1,
-                        y_line - 7,
-                        prev_node["gare"],
-                        prev_node["heure"],
-                        align="right",
-                    )
-
-            if not depart_label_deja_fait:
-                base_x = x1 + 1
-                if premiere_marche:
-                    x_depart = base_x - FIRST_LABEL_OFFSET
-                else:
-                    x_depart = base_x
-
-                draw_station_label(
-                    c, x_depart, y_line - 7, gare_dep, heure_dep, align="left"
-                )
-
-            # --- Numéro de marche ---
-            c.setFont("Helvetica", 5)
-            c.setFillColor(colors.darkgray)
-            marche=str(row["marche"])
-            if "EVM" in marche or "EVO" in marche or "EVI" in marche or "EVS" in marche:
-                marche_text = "HLP"
-            else:
-                marche_text = str(row["marche"])
-            y_num = y_line + (12 if row.get("vide_voyageur", False) else 7)
-            c.drawCentredString((x1 + x2) / 2, y_num, marche_text)
-
-            # --- Affichage des écarts trop courts ---
-            if prev_arrivee is not None:
-                ecart = row["depart"] - prev_arrivee
-                if ecart < 0.333:
-                    minutes = int(round(ecart * 60))
-                    milieu = (row["depart"] + prev_arrivee) / 2
-                    xm = x_from_time(milieu)
-                    c.setFont("Helvetica-Bold", 4)
-                    c.setFillColor(colors.red)
-                    c.drawCentredString(xm, y_line, f"{minutes}")
-                    c.setFillColor(colors.black)
-
-            prev_arrivee = row["arrivee"]
-            prev_node = {"gare": gare_arr, "x": x2, "heure": heure_arr}
-            premiere_marche = False
-
-
-        # === AFFICHAGE DE LA DERNIÈRE GARE ===
-        if prev_node is not None:
-            x_last = prev_node["x"] + LAST_LABEL_OFFSET
-            draw_station_label(
-                c,
-                x_last,
-                y_line - 7,
-                prev_node["gare"],
-                prev_node["heure"],
-                align="right",
-            )
+def _label_axe(fichier_json):
+    return os.path.splitext(fichier_json)[0].removeprefix("marches_").replace("-", " – ")
 
 
-        y_start -= (RAME_HEIGHT + ESPACEMENT_RAME)
-        rame_counter += 1
+def selection_axes(fichiers, axes):
+    """
+    Fichiers de marches retenus pour les axes demandés, désignés par nom de fichier
+    avec ou sans « marches_ » / « .json » (ex. marseille-avignon). None = tous.
+    """
+    if not axes:
+        return list(fichiers)
+    courts = {f: os.path.splitext(f)[0].removeprefix("marches_") for f in fichiers}
+    noms = {f: {f, os.path.splitext(f)[0], courts[f]} for f in fichiers}
+    inconnus = [a for a in axes if not any(a in n for n in noms.values())]
+    if inconnus:
+        raise ValueError(
+            f"Axe(s) inconnu(s) : {', '.join(inconnus)} — disponibles : {', '.join(sorted(courts.values()))}"
+        )
+    return [f for f in fichiers if any(a in noms[f] for a in axes)]
 
-    # Dernière page : paramètres
-    draw_params_page(c, materiel_code, f"Matériel {materiel_code}")
-    c.save()
-    print(f"PDF généré : {nom_pdf}")
 
-# ------------------ Boucle principale ------------------
-def process_and_generate():
+def affecter_marches(memo=None, axes=None, marches=None):
+    """
+    Étape 1 : affectation des marches de DOSSIER_JSON (remplit FLUX_PAR_AXE).
+    Renvoie (df_assign_global, marches_par_axe, pphpd_par_axe), ou None si rien n'est affecté.
+    memo : dict conservé entre deux appels (mode surveillance) pour ne ré-affecter que les fichiers modifiés ;
+    axes : fichiers de marches à affecter (voir selection_axes), None = tous ;
+    marches : {fichier: DataFrame} déjà chargées et validées (service « et si ? »), sinon charger_marches.
+    Les rames sont numérotées dans l'ordre des fichiers : un axe affecté seul peut donc
+    recevoir d'autres numéros que dans la chaîne complète.
+    """
     global FLUX_PAR_AXE
-    FLUX_PAR_AXE = {}
+    import pandas as pd
+    from cache_marches import charger_marches
 
-    # Load maintenance JSON
-    with open("gestion_maintenance.json", "r", encoding="utf-8") as f:
-        maintenance_data = json.load(f)
+    FLUX_PAR_AXE = {}
 
     # reset parc usage counters
     for k in parc:
         parc[k]["utilise"] = 0
 
-    if not os.path.exists(DOSSIER_JSON):
+    if marches is None and not os.path.exists(DOSSIER_JSON):
         print(f"⚠️ Dossier {DOSSIER_JSON} introuvable.")
         return
 
-    all_assignments = []
+    all_assignments = []   # une table compacte par fichier
     pphpd_par_axe = {}
+    marches_par_axe = {}
 
     # ------------------------ 1) AFFECTATION DES MARCHES ------------------------
-    for fichier_json in sorted(os.listdir(DOSSIER_JSON)):
-
-        if not fichier_json.endswith(".json"):
-            continue
-
-        chemin_json = os.path.join(DOSSIER_JSON, fichier_json)
-        with open(chemin_json, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        base = os.path.splitext(fichier_json)[0]
-        if base.startswith("marches_"):
-            base = base[len("marches_"):]
-        axe_label = base.replace("-", " – ")
-
-        df = pd.DataFrame(data).sort_values("depart").reset_index(drop=True)
-        rame_state = {}
-        assignments = []
-
-        for _, train in df.iterrows():
-
-            gare_dep = train["gare_depart"]
-            depart = train["depart"]
-            candidate = None
-
-            for rame_id, state in rame_state.items():
-                if state["gare"] == gare_dep and state["dispo"] + temps_minimal <= depart:
-                    if depart - state["dispo"] > seuil_atelier:
-                        gestion_evo(rame_id, state["gare"], depart, state, assignments)
-                    candidate = rame_id
-                    break
-
-            if candidate is None:
-                candidate = get_rame_id(fichier_json)
-                marche_navette = navette_mat(candidate, gare_dep, depart, tampon_15m, navette_time)
-                if marche_navette:
-                    assignments.append(marche_navette)
-                rame_state[candidate] = {"gare": gare_dep, "dispo": 0}
-
-            assignments.append({
-                "rame": candidate,
-                "marche": train["marche"],
-                "gare_depart": train["gare_depart"],
-                "depart": train["depart"],
-                "gare_arrivee": train["gare_arrivee"],
-                "arrivee": train["arrivee"],
-                "vide_voyageur": train.get("vide_voyageur", False)
-            })
-
-            rame_state[candidate]["gare"] = train["gare_arrivee"]
-            rame_state[candidate]["dispo"] = train["arrivee"]
-
-        # Ajouter navettes du soir
-        for rame_id, state in rame_state.items():
-            soir = navette_soir(rame_id, state["gare"], state["dispo"])
-            if soir:
-                assignments.append(soir)
-
-        # Marquer axe ferroviaire
-        for a in assignments:
-            a["axe"] = axe_label
+    # Marches triées par départ, relues depuis le cache colonnaire si les JSON n'ont pas changé,
+    # validées d'un coup (les marches invalides n'entrent pas dans l'affectation)
+    marches_par_fichier = marches if marches is not None else charger_marches(
+        DOSSIER_JSON, gares_connues=gares_referentiel(), trajets_connus=distances().keys()
+    )
 
-        all_assignments.extend(assignments)
+    retenus = selection_axes(marches_par_fichier, axes)
 
-        # stats par axe
-        df_assign_file = pd.DataFrame(assignments)
-        df_assign_file["vide_voyageur"] = df_assign_file["vide_voyageur"].astype("boolean").fillna(False)
-        df_assign_file["distance_km"] = df_assign_file.apply(get_distance_safe, axis=1)
-        df_assign_file["materiel"] = df_assign_file["rame"].apply(get_materiel_code_from_rame)
+    for fichier_json, df in marches_par_fichier.items():
+        if fichier_json not in retenus:
+            continue
 
-        premiers_depart = df_assign_file.sort_values("depart").groupby("rame").first()
-        dernieres_arrivee = df_assign_file.sort_values("arrivee").groupby("rame").last()
-        depart_counts = premiers_depart["gare_depart"].value_counts().rename("Departs")
-        arrivee_counts = dernieres_arrivee["gare_arrivee"].value_counts().rename("Arrivees")
-        flux_balance = pd.concat([depart_counts, arrivee_counts], axis=1).fillna(0).astype(int)
-        flux_balance["Diff (Arr - Dep)"] = flux_balance["Arrivees"] - flux_balance["Departs"]
+        axe_label = _label_axe(fichier_json)
+        marches_par_axe[axe_label] = df
 
-        FLUX_PAR_AXE[axe_label] = {
-            "fichier": fichier_json,
-            "flux": flux_balance.reset_index(),
-            "materiels": sorted(df_assign_file["materiel"].dropna().unique().tolist()),
-        }
+        # Résultat réutilisé si le fichier et l'état du parc à son début sont inchangés
+        cle = (_empreinte_marches(df), tuple(parc[k]["utilise"] for k in parc))
+        if memo is not None and fichier_json in memo and memo[fichier_json][0] == cle:
+            _, resultat, utilise = memo[fichier_json]
+            for k, n in zip(parc, utilise):
+                parc[k]["utilise"] = n
+        else:
+            resultat = affecter_fichier(fichier_json, axe_label, df)
+            if memo is not None:
+                memo[fichier_json] = (cle, resultat, tuple(parc[k]["utilise"] for k in parc))
 
-        pphpd_par_axe[axe_label] = calcul_pphpd_par_direction(df_assign_file, parc)
+        all_assignments.append(resultat["assignments"])
+        FLUX_PAR_AXE[axe_label] = resultat["flux"]
+        pphpd_par_axe[axe_label] = resultat["pphpd"]
 
     # Si aucune marche
     if not all_assignments:
         print("Aucun assignment global généré.")
-        return
+        return None
 
+    # Catégories réunifiées après le concat (distance et matériel déjà calculés par fichier)
+    df_assign_global = compacter(pd.concat(all_assignments, ignore_index=True))
+    return df_assign_global, marches_par_axe, pphpd_par_axe
 
-    # ------------------------ 2) INJECTION MAINTENANCE ------------------------
-    df_assign_global = pd.DataFrame(all_assignments)
-    df_assign_global["vide_voyageur"] = df_assign_global["vide_voyageur"].astype("boolean").fillna(False)
-    df_assign_global["distance_km"] = df_assign_global.apply(get_distance_safe, axis=1)
-    df_assign_global["materiel"] = df_assign_global["rame"].apply(get_materiel_code_from_rame)
 
-    # ------------------ 2) AFFECTATION DES MAINTENANCES (mimique des trains) ------------------
+def placer_maintenances(df_assign_global, maintenance_data=None):
+    """
+    Étape 2 : place les créneaux de maintenance (maintenance_data, par défaut MAINTENANCE_FILE)
+    dans les trous des roulements ; renvoie les affectations complétées des lignes MAINT-.
+    """
+    import pandas as pd
 
-    maintenance_rows = []
+    if maintenance_data is None:
+        maintenance_data = charger_maintenances()
+
+    maintenance_rows = []   # une table par matériel
 
     for code in parc.keys():
 
@@ -1021,6 +416,7 @@ def process_and_generate():
             continue
 
         slots = maintenance_data[code]["slots"]
+        maint = ColonnesAffectation()
 
         # état dynamique des rames comme pour les trains
         rame_state = {}
@@ -1073,17 +469,12 @@ def process_and_generate():
                         if last_gare != location:
                             continue
 
-                        maintenance_rows.append({
-                            "rame": rame_id,
-                            "marche": f"MAINT-{code}-{round(free_start,2)}",
-                            "gare_depart": location,
-                            "depart": free_start,
-                            "gare_arrivee": location,
-                            "arrivee": free_start + duration,
-                            "vide_voyageur": True,
-                            "materiel": code,
-                            "axe": "MAINTENANCE"
-                        })
+                        maint.ajouter(
+                            rame_id, f"MAINT-{code}-{round(free_start,2)}",
+                            location, free_start,
+                            location, free_start + duration,
+                            TypeMarche.MAINT,
+                        )
 
                         # mise à jour des états
                         rame_state[rame_id]["dispo"] = free_start + duration
@@ -1106,124 +497,477 @@ def process_and_generate():
             if not placed:
                 print(f"⚠️ IMPOSSIBLE : {code} maintenance ({duration}h) dans fenêtre {win_start}-{win_end}")
 
+        if len(maint):
+            maintenance_rows.append(maint.vers_dataframe(materiel=code, axe="MAINTENANCE"))
+
     # merge
     if maintenance_rows:
-        df_assign_global = pd.concat([df_assign_global, pd.DataFrame(maintenance_rows)], ignore_index=True)
+        df_assign_global = compacter(pd.concat([df_assign_global] + maintenance_rows, ignore_index=True))
         df_assign_global = df_assign_global.sort_values("depart")
+    return df_assign_global
+
+
+def formats_par_defaut():
+    return (["pdf"] + (["html"] if EXPORT_HTML else []) + (["sqlite"] if EXPORT_SQLITE else [])
+            + ([EXPORT_RESULTATS] if EXPORT_RESULTATS else []))
+
+
+def afficher_maintenances(df_assign_global, materiels=None):
+    for code in materiels or parc.keys():
+        df_maint = df_assign_global[
+            (df_assign_global["materiel"] == code) & (df_assign_global["type_marche"] == TypeMarche.MAINT)
+        ]
+        if df_maint.empty:
+            continue
+        print(f"\n=== Maintenances appliquées pour {code} ===")
+        print(df_maint[["rame","marche","gare_depart","depart","gare_arrivee","arrivee"]])
+
+
+def exporter(df_assign_global, marches_par_axe, pphpd_par_axe, pool=None, materiels=None, formats=None,
+             dossier="", scenario=None):
+    """
+    Étape 3 : base SQLite, tables de résultats, HTML et PDF (ReportLab n'est chargé qu'ici, par le rendu),
+    chacun regénéré seulement si ses données ont changé (empreintes dans CACHE_RENDU_FILE).
+    materiels : codes matériel à exporter (None = tout le parc) ;
+    formats : sous-ensemble de FORMATS_EXPORT (None = formats_par_defaut()) ;
+    dossier : dossier de sortie de tous les fichiers (PDF, HTML, résultats, base, cache de rendu ;
+    "" = dossier courant) ;
+    scenario : nom du scénario dans la base SQLite (None = SCENARIO).
+    """
+    formats = formats_par_defaut() if formats is None else formats
+    materiels = list(parc.keys()) if materiels is None else materiels
+    scenario = scenario or SCENARIO
+    if dossier:
+        os.makedirs(dossier, exist_ok=True)
+
+    # Comme les PDF (render_documents), chaque export n'est refait que si ses données ont changé
+    chemin_cache = os.path.join(dossier, CACHE_RENDU_FILE)
+    cache = _load_cache_rendu(chemin_cache)
+    empreintes = {}
+
+    def inchange(sortie, chemin, empreinte):
+        if cache.get(sortie) == empreinte and os.path.exists(chemin):
+            print(f"Export inchangé, non regénéré : {sortie}")
+            return True
+        empreintes[sortie] = empreinte
+        return False
+
+    tables_flux = [(axe, info["flux"]) for axe, info in FLUX_PAR_AXE.items() if info.get("flux") is not None]
+
+    if "sqlite" in formats:
+        from base_roulements import BASE_ROULEMENTS_FILE, ouvrir_base, enregistrer_scenario
+        chemin_base = os.path.join(dossier, BASE_ROULEMENTS_FILE)
+        empreinte = _empreinte_export(
+            "base_roulements.py",
+            [("affectations", df_assign_global)] + list(marches_par_axe.items()) + list(pphpd_par_axe.items()),
+        )
+        if not inchange(f"{BASE_ROULEMENTS_FILE}:{scenario}", chemin_base, empreinte):
+            conn = ouvrir_base(chemin_base)
+            enregistrer_scenario(conn, df_assign_global, marches_par_axe, pphpd_par_axe, scenario)
+            conn.close()
+
+    for format_resultats in ("parquet", "csv"):
+        if format_resultats in formats:
+            from export_resultats import RESULTATS_DIR, exporter_resultats
+            dossier_resultats = os.path.join(dossier, RESULTATS_DIR)
+            empreinte = _empreinte_export(
+                "export_resultats.py",
+                [("affectations", df_assign_global)] + list(pphpd_par_axe.items()) + tables_flux,
+            )
+            # schema.json est écrit en dernier : présent = export complet
+            if not inchange(f"{RESULTATS_DIR}:{format_resultats}",
+                            os.path.join(dossier_resultats, "schema.json"), empreinte):
+                exporter_resultats(df_assign_global, pphpd_par_axe, FLUX_PAR_AXE,
+                                   dossier=dossier_resultats, format=format_resultats)
 
 
     # ------------------------ 3) EXPORT PDF ------------------------
-    generate_pphpd_global(pphpd_par_axe)
+    # Chaque document ne reçoit que ses données : le rendu peut tourner dans un autre processus
+    jobs = [("pphpd", pphpd_par_axe)]
 
-    for code in parc.keys():
+    for code in materiels:
         df_mat = df_assign_global[df_assign_global["materiel"] == code].copy()
         if df_mat.empty:
             continue
 
-        print(f"\n=== Maintenances appliquées pour {code} ===")
-        print(df_mat[df_mat["marche"].astype(str).str.startswith("MAINT")][["rame","marche","gare_depart","depart","gare_arrivee","arrivee"]])
+        afficher_maintenances(df_mat, [code])
+
+        flux_mat = {
+            axe: info for axe, info in FLUX_PAR_AXE.items()
+            if code in info.get("materiels", [])
+        }
+        jobs.append(("materiel", (df_mat, code, flux_mat)))
+
+        if "html" in formats:
+            from export_html import export_roulements_html
+            nom_html = f"roulements_{code}.html"
+            chemin_html = os.path.join(dossier, nom_html)
+            if not inchange(nom_html, chemin_html, _empreinte_export("export_html.py", [(code, df_mat)])):
+                export_roulements_html(df_mat, code, chemin_html)
+
+    if empreintes:
+        _enregistrer_cache_rendu(chemin_cache, empreintes)
+
+    if "pdf" in formats:
+        render_documents(jobs, pool=pool, dossier=dossier)
+
+
+def process_and_generate(memo=None, pool=None):
+    """
+    Chaîne complète : affectation, maintenances, base SQLite, HTML et PDF.
+    memo : dict conservé entre deux appels (mode surveillance) pour ne ré-affecter que les fichiers modifiés ;
+    pool : ProcessPoolExecutor de rendu déjà démarré.
+    """
+    resultat = affecter_marches(memo)
+    if resultat is None:
+        return
+    df_assign_global, marches_par_axe, pphpd_par_axe = resultat
 
-        draw_pdf_for_material(df_mat, code)
+    df_assign_global = placer_maintenances(df_assign_global)
+    exporter(df_assign_global, marches_par_axe, pphpd_par_axe, pool=pool)
 
     print("\n✅ Process terminé avec maintenance + tampon EVO intégrés.")
 
-def generate_pphpd_global(pphpd_par_axe):
-    from reportlab.lib.utils import ImageReader
-
-    PAGE_WIDTH, PAGE_HEIGHT = A4
-    nom_pdf = "PPHPD_global.pdf"
-
-    c = canvas.Canvas(nom_pdf, pagesize=A4)
-    # ========= PAGE 1 : TITRE + TEXTE TECHNIQUE =========
-    c.setFont("Helvetica-Bold", 20)
-    c.drawCentredString(PAGE_WIDTH/2, PAGE_HEIGHT - 40, "PPHPD – Global")
-
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(40, PAGE_HEIGHT - 90, "Méthode de calcul du PPHPD")
-
-    c.setFont("Helvetica", 10)
-    text = [
-        "Le PPHPD (Place Par Heure et par Direction) permet d’estimer la",
-        "capacité théorique maximale offerte par l’exploitation, heure par heure.",
-        "",
-        "Règles appliquées :",
-        " • Avant 12h : le PPHPD est calculé à partir de l’heure d’arrivée des trains.",
-        " • Après 12h : le PPHPD est calculé à partir de l’heure de départ.",
-        " • Les marches vides voyageurs (HLP, navettes, évolutions) sont exclues.",
-        " • La direction est déterminée par le numéro de marche :",
-        "      - Numéro pair   → direction Paris",
-        "      - Numéro impair → direction Province",
-    ]
-
-    y = PAGE_HEIGHT - 120
-    for line in text:
-        c.drawString(40, y, line)
-        y -= 14
-
-    c.showPage()
-    # ========= FIN PAGE INTRO =========
-
-    # Mise en page : 2 graphiques par page
-    graphs_per_page = 0
-    current_y = PAGE_HEIGHT - 80
-    graph_height = 200
-    left_margin = 40
-    right_margin = 40
-
-    for axe, df in pphpd_par_axe.items():
-        if df.empty:
+
+def _render_job(job, valeurs=None, dossier="", reglages=None):
+    """
+    Rend un document PDF dans dossier (exécuté dans un processus de rendu).
+    valeurs : paramètres métier du processus parent, repris pour la page paramètres ;
+    reglages : REGLAGES_RENDU du processus parent (un processus du pool peut avoir été
+    démarré avec d'autres valeurs).
+    """
+    import rendu_pdf
+    from rendu_pdf import draw_pdf_for_material, generate_pphpd_global
+    for nom, valeur in (valeurs or {}).items():
+        setattr(parametres, nom, valeur)
+    for nom, valeur in (reglages or {}).items():
+        setattr(rendu_pdf, nom, valeur)
+    kind, payload = job
+    if kind == "pphpd":
+        generate_pphpd_global(payload, dossier=dossier)
+    else:
+        draw_pdf_for_material(*payload, dossier=dossier)
+    return kind
+
+
+def _nom_pdf_job(job):
+    kind, payload = job
+    return "PPHPD_global.pdf" if kind == "pphpd" else f"roulements_{payload[1]}.pdf"
+
+
+def _hash_dataframe(h, df):
+    import pandas as pd
+
+    h.update(json.dumps([str(col) for col in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+
+
+def _empreinte_code(module):
+    """sha256 du code d'un module du dossier du moteur (lu une fois par processus)."""
+    if module not in _empreintes_code:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module), "rb") as f:
+            _empreintes_code[module] = hashlib.sha256(f.read()).hexdigest()
+    return _empreintes_code[module]
+
+
+def reglages_rendu():
+    """Valeurs en vigueur de REGLAGES_RENDU (charge rendu_pdf : appelé seulement quand un PDF est demandé)."""
+    import rendu_pdf
+    return {nom: getattr(rendu_pdf, nom) for nom in REGLAGES_RENDU}
+
+
+def hash_document(job):
+    """
+    Empreinte des entrées d'un document : tranche d'affectation, paramètres, réglages de rendu,
+    flux des axes concernés (et code du moteur, des paramètres et du rendu,
+    pour regénérer après modification).
+    """
+    kind, payload = job
+    h = hashlib.sha256()
+
+    for module in ("affectation_pdf.py", "parametres.py", "rendu_pdf.py"):
+        h.update(_empreinte_code(module).encode())
+
+    params = {
+        **valeurs_parametres(),
+        "rendu": reglages_rendu(),
+        "parc": {
+            code: {k: v for k, v in info.items() if k != "utilise"}
+            for code, info in parc.items()
+        },
+        "depots": DEPOT_AFFECTATION,
+    }
+    h.update(json.dumps(params, sort_keys=True).encode())
+
+    if kind == "pphpd":
+        for axe, df in payload.items():
+            h.update(axe.encode())
+            _hash_dataframe(h, df)
+    else:
+        df_mat, code, flux_par_axe = payload
+        h.update(code.encode())
+        _hash_dataframe(h, df_mat)
+        for axe, info in flux_par_axe.items():
+            h.update(json.dumps([axe, info.get("fichier"), info.get("materiels")]).encode())
+            if info.get("flux") is not None:
+                _hash_dataframe(h, info["flux"])
+
+    return h.hexdigest()
+
+
+def _empreinte_export(module, tables):
+    """Empreinte d'un export : code du module qui l'écrit et tables [(nom, DataFrame)] exportées."""
+    h = hashlib.sha256(_empreinte_code(module).encode())
+    for nom, df in tables:
+        h.update(str(nom).encode())
+        _hash_dataframe(h, df)
+    return h.hexdigest()
+
+
+def _enregistrer_cache_rendu(chemin, empreintes):
+    """Ajoute les empreintes des sorties produites au cache (relu : un autre export a pu l'écrire)."""
+    cache = _load_cache_rendu(chemin)
+    cache.update(empreintes)
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+def _load_cache_rendu(chemin=CACHE_RENDU_FILE):
+    if not os.path.exists(chemin):
+        return {}
+    try:
+        with open(chemin, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Erreur lecture {chemin}: {e}")
+        return {}
+
+
+def render_documents(jobs, nb_process=None, force=False, pool=None, dossier=""):
+    """
+    Rend les PDF (PPHPD + un par matériel), chacun dans son propre processus.
+    La durée totale est alors celle du document le plus long.
+    Un PDF dont les données n'ont pas changé depuis le dernier rendu n'est pas regénéré
+    (sauf force=True). pool : ProcessPoolExecutor déjà démarré (mode surveillance).
+    dossier : dossier des PDF et de leur cache de rendu.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    chemin_cache = os.path.join(dossier, CACHE_RENDU_FILE)
+    cache = _load_cache_rendu(chemin_cache)
+    empreintes = {}
+    a_rendre = []
+    for job in jobs:
+        nom_pdf = _nom_pdf_job(job)
+        empreinte = hash_document(job)
+        if not force and cache.get(nom_pdf) == empreinte and os.path.exists(os.path.join(dossier, nom_pdf)):
+            print(f"PDF inchangé, non regénéré : {nom_pdf}")
             continue
+        empreintes[nom_pdf] = empreinte
+        a_rendre.append(job)
+
+    if nb_process is None:
+        nb_process = NB_PROCESS_RENDU or os.cpu_count() or 1
+    nb_process = min(nb_process, len(a_rendre))
+
+    valeurs = [valeurs_parametres()] * len(a_rendre)
+    dossiers = [dossier] * len(a_rendre)
+    reglages = [reglages_rendu()] * len(a_rendre)
+    if pool is not None and len(a_rendre) > 1:
+        list(pool.map(_render_job, a_rendre, valeurs, dossiers, reglages))
+    elif nb_process <= 1:
+        for job in a_rendre:
+            _render_job(job, dossier=dossier)
+    else:
+        with ProcessPoolExecutor(max_workers=nb_process) as pool:
+            # list() pour remonter les exceptions des processus de rendu
+            list(pool.map(_render_job, a_rendre, valeurs, dossiers, reglages))
 
-        dfp = df.pivot(index="heure", columns="direction", values="pphpd").fillna(0)
-
-        # Génération du graphe
-        plt.figure(figsize=(8, 3))
-        for col in dfp.columns:
-            plt.plot(dfp.index, dfp[col], marker="o", label=col)
-        plt.title(f"PPHPD – {axe}")
-        plt.grid(True)
-        plt.legend()
-
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-        plt.savefig(tmp.name, dpi=150, bbox_inches='tight')
-        plt.close()
-
-        # Nouvelle page si on a déjà 2 graphiques sur la page
-        if graphs_per_page >= 2:
-            c.showPage()
-            graphs_per_page = 0
-            current_y = PAGE_HEIGHT - 80
-
-        img = ImageReader(tmp.name)
-
-        # Titre de l'axe
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(left_margin, current_y, f"Axe : {axe}")
-
-        # Positionnement de l'image juste en dessous
-        img_top = current_y - 20
-        img_width = PAGE_WIDTH - left_margin - right_margin
-        img_height = graph_height
-        c.drawImage(
-            img,
-            left_margin,
-            img_top - img_height,
-            width=img_width,
-            height=img_height,
-            preserveAspectRatio=True,
-        )
+    if empreintes:
+        _enregistrer_cache_rendu(chemin_cache, empreintes)
 
-        graphs_per_page += 1
-        current_y = img_top - img_height - 40  # espace avant le prochain graphe
 
+# ------------------ Mode surveillance ------------------
+def _dates_fichiers(fichiers_pdt=()):
+    """Date de modification de chaque entrée surveillée (marches, référentiels, exports horaires)."""
+    from cache_marches import fichiers_sources
+
+    chemins = [MAINTENANCE_FILE, KM_MARCHES_FILE, PARC_RAMES_FILE, LIGNES_FILE] + list(fichiers_pdt)
+    if os.path.exists(DOSSIER_JSON):
+        chemins += [os.path.join(DOSSIER_JSON, f) for f in fichiers_sources(DOSSIER_JSON)]
+    dates = {}
+    for chemin in chemins:
         try:
-            os.unlink(tmp.name)
-        except PermissionError:
+            dates[chemin] = os.stat(chemin).st_mtime_ns
+        except OSError:
             pass
+    return dates
+
+
+def surveiller(intervalle=None, fichiers_pdt=None):
+    """
+    Relance la chaîne à chaque modification d'une entrée, en gardant en mémoire
+    les affectations par fichier et le pool de rendu : seuls les fichiers de marches
+    modifiés sont ré-affectés, et seuls les PDF et exports (HTML, base, résultats)
+    dont les données changent sont regénérés.
+    fichiers_pdt : exports horaires à reconvertir quand ils changent (défaut FICHIERS_PDT).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    intervalle = intervalle or INTERVALLE_SURVEILLANCE
+    fichiers_pdt = FICHIERS_PDT if fichiers_pdt is None else fichiers_pdt
+    nb_process = NB_PROCESS_RENDU or os.cpu_count() or 1
+    memo = {}
+    precedent = {}
+    charger_km()   # lu avant le démarrage du pool : les processus de rendu en héritent
+    pool = ProcessPoolExecutor(max_workers=nb_process)
+    print(f"👀 Surveillance de {DOSSIER_JSON}/, {MAINTENANCE_FILE}, {KM_MARCHES_FILE} (Ctrl+C pour arrêter)")
+    if fichiers_pdt:
+        print(f"   Reconversion dans {DOSSIER_JSON}/ à chaque modification de : {', '.join(fichiers_pdt)}")
+
+    try:
+        while True:
+            dates = _dates_fichiers(fichiers_pdt)
+            modifies = sorted(c for c in set(dates) | set(precedent) if dates.get(c) != precedent.get(c))
+            if not modifies:
+                time.sleep(intervalle)
+                continue
+
+            if precedent:
+                print(f"\n🔄 Modifié : {', '.join(modifies)}")
+
+            # Export horaire modifié : reconversion dans DOSSIER_JSON avant la mise à jour
+            reconvertis = [c for c in modifies if c in fichiers_pdt and c in dates and precedent]
+            if reconvertis:
+                from convertisseur_marche import parse_excel_to_json, parse_csv_to_json
+            for chemin in reconvertis:
+                if chemin.lower().endswith(".csv"):
+                    parse_csv_to_json(chemin, DOSSIER_JSON)
+                else:
+                    parse_excel_to_json(chemin, DOSSIER_JSON)
+            if reconvertis:
+                dates = _dates_fichiers(fichiers_pdt)
+
+            # Référentiel km : distances et rendu à recalculer entièrement
+            if KM_MARCHES_FILE in modifies and precedent:
+                charger_km()
+                memo.clear()
+                pool.shutdown()
+                pool = ProcessPoolExecutor(max_workers=nb_process)
+
+            # Référentiels traction / électrification : matrice de compatibilité à reconstruire
+            if {PARC_RAMES_FILE, LIGNES_FILE} & set(modifies) and precedent:
+                construire_matrice()
+                memo.clear()
+
+            precedent = dates
+            debut = time.perf_counter()
+            try:
+                process_and_generate(memo, pool)
+            except Exception as e:
+                print(f"❌ Erreur pendant la mise à jour : {e}")
+            print(f"⏱ Mis à jour en {time.perf_counter() - debut:.2f} s")
+    except KeyboardInterrupt:
+        print("\nSurveillance arrêtée.")
+    finally:
+        pool.shutdown()
+
+
+# ------------------ Ligne de commande ------------------
+def resume_affectation(df_assign_global):
+    """Par axe et matériel : rames, marches commerciales, HLP et km commerciaux."""
+    df = df_assign_global[df_assign_global["type_marche"] != TypeMarche.MAINT]
+    vide = df["vide_voyageur"].astype(bool)
+    return df.assign(commerciales=~vide, hlp=vide).groupby(["axe", "materiel"], observed=True).agg(
+        rames=("rame", "nunique"), marches=("commerciales", "sum"), hlp=("hlp", "sum"),
+        km_commerciaux=("distance_km", "sum"),
+    )
+
+
+def afficher_pphpd(pphpd_par_axe):
+    for axe, dfp in pphpd_par_axe.items():
+        if dfp.empty:
+            continue
+        print(f"\n=== PPHPD {axe} ===")
+        print(dfp.pivot_table(index="heure", columns="direction", values="pphpd", fill_value=0).to_string())
+
+
+def _parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Affectation des rames, maintenances, PPHPD et rendu des roulements."
+    )
+    commun = argparse.ArgumentParser(add_help=False)
+    commun.add_argument("--axe", action="append", metavar="AXE",
+                        help="fichier de marches à traiter (ex. marseille-avignon), répétable ; défaut : tous")
+    commun.add_argument("--materiel", action="append", choices=list(parc), metavar="CODE",
+                        help=f"matériel à afficher / exporter ({', '.join(parc)}), répétable ; défaut : tous")
+    commun.add_argument("--format", action="append", choices=FORMATS_EXPORT, dest="formats",
+                        help="format de sortie, répétable ; défaut : aucun pour assign / pphpd / maintenance")
+    commun.add_argument("--no-render", action="store_true",
+                        help="ne produire aucun PDF (même si --format pdf)")
+
+    sous = parser.add_subparsers(dest="commande", metavar="COMMANDE")
+    sous.add_parser("assign", parents=[commun], help="affectation seule, résumé par axe et matériel")
+    sous.add_parser("pphpd", parents=[commun], help="affectation puis tableau PPHPD par axe")
+    sous.add_parser("maintenance", parents=[commun], help="affectation puis placement des maintenances")
+    sous.add_parser("render", parents=[commun], help="chaîne complète (commande par défaut)")
+    watch = sous.add_parser("watch", help="relance la chaîne à chaque modification des entrées")
+    watch.add_argument("--intervalle", type=float, help=f"scrutation en s (défaut {INTERVALLE_SURVEILLANCE})")
+    watch.add_argument("--pdt", action="append", metavar="FICHIER",
+                       help=f"export horaire (xlsx / csv) à reconvertir dans {DOSSIER_JSON}/ quand il change, "
+                            "répétable ; écrase les marches retouchées à la main")
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    commande = args.commande or "render"
+
+    if commande == "watch":
+        surveiller(args.intervalle, args.pdt)
+        return
+
+    # Sans commande : chaîne complète aux formats par défaut
+    formats = getattr(args, "formats", None)
+    if formats is None:
+        formats = formats_par_defaut() if commande == "render" else []
+    if getattr(args, "no_render", False):
+        formats = [f for f in formats if f != "pdf"]
+    materiels = getattr(args, "materiel", None)
+
+    try:
+        resultat = affecter_marches(axes=getattr(args, "axe", None))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    if resultat is None:
+        return
+    df_assign_global, marches_par_axe, pphpd_par_axe = resultat
+
+    if commande == "assign":
+        resume = resume_affectation(df_assign_global)
+        if materiels:
+            resume = resume[resume.index.get_level_values("materiel").isin(materiels)]
+        print(resume.to_string())
+    elif commande == "pphpd":
+        afficher_pphpd(pphpd_par_axe)
+        # Seul le document PPHPD global est rendu (pas les roulements par matériel)
+        if formats:
+            exporter(df_assign_global, marches_par_axe, pphpd_par_axe, materiels=[], formats=formats)
+        return
+
+    if commande in ("maintenance", "render"):
+        df_assign_global = placer_maintenances(df_assign_global)
+        if commande == "maintenance" and not formats:
+            afficher_maintenances(df_assign_global, materiels)
 
-    c.save()
-    print(f"PDF global PPHPD généré : {nom_pdf}")
+    if formats:
+        exporter(df_assign_global, marches_par_axe, pphpd_par_axe, materiels=materiels, formats=formats)
+    if commande == "render":
+        print("\n✅ Process terminé avec maintenance + tampon EVO intégrés.")
 
 
 if __name__ == "__main__":
-    process_and_generate()
+    main()
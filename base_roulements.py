@@ -0,0 +1,193 @@
+# base_roulements.py
+# Base SQLite locale des scénarios : marches, affectations, maintenances et indicateurs,
+# indexés pour répondre aux questions ponctuelles (gare, plage horaire, rame, marche)
+# sans relancer l'affectation ni relire les PDF.
+import sqlite3
+import pandas as pd
+from modele_affectation import TypeMarche
+from parametres import distances
+
+
+BASE_ROULEMENTS_FILE = "roulements.sqlite"
+SCENARIO_DEFAUT = "base"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS marches (
+    scenario TEXT NOT NULL, axe TEXT NOT NULL, marche TEXT NOT NULL,
+    gare_depart TEXT, depart REAL, gare_arrivee TEXT, arrivee REAL, vide_voyageur INTEGER
+);
+CREATE TABLE IF NOT EXISTS affectations (
+    scenario TEXT NOT NULL, axe TEXT, materiel TEXT, rame INTEGER NOT NULL, marche TEXT NOT NULL,
+    gare_depart TEXT, depart REAL, gare_arrivee TEXT, arrivee REAL, vide_voyageur INTEGER, distance_km REAL
+);
+CREATE TABLE IF NOT EXISTS maintenances (
+    scenario TEXT NOT NULL, materiel TEXT, rame INTEGER NOT NULL, marche TEXT NOT NULL,
+    gare TEXT, debut REAL, fin REAL
+);
+CREATE TABLE IF NOT EXISTS kpis (
+    scenario TEXT NOT NULL, axe TEXT, indicateur TEXT NOT NULL,
+    heure INTEGER, direction TEXT, valeur REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_marches_gare_dep ON marches (scenario, gare_depart, depart);
+CREATE INDEX IF NOT EXISTS idx_marches_gare_arr ON marches (scenario, gare_arrivee, arrivee);
+CREATE INDEX IF NOT EXISTS idx_marches_marche ON marches (scenario, marche);
+CREATE INDEX IF NOT EXISTS idx_affectations_rame ON affectations (scenario, rame, depart);
+CREATE INDEX IF NOT EXISTS idx_affectations_marche ON affectations (scenario, marche);
+CREATE INDEX IF NOT EXISTS idx_affectations_gare_dep ON affectations (scenario, gare_depart, depart);
+CREATE INDEX IF NOT EXISTS idx_affectations_gare_arr ON affectations (scenario, gare_arrivee, arrivee);
+CREATE INDEX IF NOT EXISTS idx_maintenances_rame ON maintenances (scenario, rame, debut);
+CREATE INDEX IF NOT EXISTS idx_maintenances_gare ON maintenances (scenario, gare, debut);
+CREATE INDEX IF NOT EXISTS idx_kpis ON kpis (scenario, indicateur, axe, heure);
+"""
+
+TABLES = ["marches", "affectations", "maintenances", "kpis"]
+
+
+def ouvrir_base(chemin=BASE_ROULEMENTS_FILE):
+    conn = sqlite3.connect(chemin)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _lignes(df, colonnes):
+    """Tuples Python (et non scalaires numpy) pour executemany ; NaN → NULL."""
+    df = df.reindex(columns=colonnes)
+    df = df.astype(object).where(df.notna(), None)
+    return list(zip(*(df[c].tolist() for c in colonnes)))
+
+
+def _inserer(conn, table, scenario, df, colonnes):
+    if df.empty:
+        return
+    df = df.assign(scenario=scenario)
+    place = ", ".join("?" * (len(colonnes) + 1))
+    conn.executemany(
+        f"INSERT INTO {table} (scenario, {', '.join(colonnes)}) VALUES ({place})",
+        _lignes(df, ["scenario"] + colonnes),
+    )
+
+
+def _kpis(df_assign, pphpd_par_axe):
+    """
+    PPHPD par axe / heure / direction + km commerciaux, km HLP et nb de rames par axe.
+    distance_km est nulle pour les marches vides : les km HLP sont repris de km_marches.json
+    (trajet sans distance connue, ex. navette vers un faisceau : 0).
+    """
+    kpis = []
+    for axe, dfp in pphpd_par_axe.items():
+        if not dfp.empty:
+            kpis.append(dfp.rename(columns={"pphpd": "valeur"}).assign(axe=axe, indicateur="pphpd"))
+
+    if not df_assign.empty:
+        vide = df_assign["vide_voyageur"].astype(bool)
+        km_dict = distances()
+        km_hlp = pd.Series(
+            [km_dict.get(trajet, 0.0) for trajet in zip(df_assign.loc[vide, "gare_depart"], df_assign.loc[vide, "gare_arrivee"])],
+            index=df_assign.index[vide], dtype="float64",
+        )
+        for km, indicateur in [(df_assign.loc[~vide, "distance_km"], "km_commerciaux"), (km_hlp, "km_hlp")]:
+            if not km.empty:
+                par_axe = km.groupby(df_assign.loc[km.index, "axe"], observed=True).sum()
+                kpis.append(par_axe.rename("valeur").reset_index().assign(indicateur=indicateur))
+        kpis.append(
+            df_assign.groupby("axe", observed=True)["rame"].nunique().rename("valeur").reset_index().assign(indicateur="nb_rames")
+        )
+    return pd.concat(kpis, ignore_index=True) if kpis else pd.DataFrame()
+
+
+def enregistrer_scenario(conn, df_assign_global, marches_par_axe, pphpd_par_axe, scenario=SCENARIO_DEFAUT):
+    """
+    Remplace le scénario dans la base (une transaction, insertions en masse) :
+    marches sources par axe, affectations (HLP compris), maintenances et indicateurs.
+    """
+    df = df_assign_global.assign(marche=df_assign_global["marche"].astype(str))
+    est_maint = df["type_marche"] == TypeMarche.MAINT
+    df_affect = df[~est_maint]
+    df_maint = df[est_maint].rename(columns={"gare_depart": "gare", "depart": "debut", "arrivee": "fin"})
+
+    marches = pd.concat(
+        [m.assign(axe=axe) for axe, m in marches_par_axe.items()], ignore_index=True
+    ) if marches_par_axe else pd.DataFrame()
+    if not marches.empty:
+        marches["marche"] = marches["marche"].astype(str)
+
+    with conn:
+        for table in TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE scenario = ?", (scenario,))
+        _inserer(conn, "marches", scenario, marches,
+                 ["axe", "marche", "gare_depart", "depart", "gare_arrivee", "arrivee", "vide_voyageur"])
+        _inserer(conn, "affectations", scenario, df_affect,
+                 ["axe", "materiel", "rame", "marche", "gare_depart", "depart", "gare_arrivee", "arrivee",
+                  "vide_voyageur", "distance_km"])
+        _inserer(conn, "maintenances", scenario, df_maint,
+                 ["materiel", "rame", "marche", "gare", "debut", "fin"])
+        _inserer(conn, "kpis", scenario, _kpis(df_affect, pphpd_par_axe),
+                 ["axe", "indicateur", "heure", "direction", "valeur"])
+
+    print(f"Base {scenario!r} : {len(df_affect)} affectations, {len(df_maint)} maintenances enregistrées")
+
+
+# ------------------ Requêtes ------------------
+def requete(conn, sql, params=()):
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def passages_en_gare(conn, gare, debut=0, fin=24, scenario=SCENARIO_DEFAUT):
+    """Affectations partant de / arrivant à la gare entre debut et fin (heures décimales)."""
+    return requete(conn, """
+        SELECT * FROM affectations WHERE scenario = ? AND gare_depart = ? AND depart BETWEEN ? AND ?
+        UNION
+        SELECT * FROM affectations WHERE scenario = ? AND gare_arrivee = ? AND arrivee BETWEEN ? AND ?
+        ORDER BY depart
+    """, (scenario, gare, debut, fin, scenario, gare, debut, fin))
+
+
+def marches_sur_plage(conn, debut, fin, scenario=SCENARIO_DEFAUT):
+    """Affectations circulant (au moins en partie) entre debut et fin."""
+    return requete(conn, """
+        SELECT * FROM affectations WHERE scenario = ? AND depart <= ? AND arrivee >= ? ORDER BY depart
+    """, (scenario, fin, debut))
+
+
+def roulement_rame(conn, rame, scenario=SCENARIO_DEFAUT):
+    """Journée complète d'une rame : marches, HLP et maintenances, dans l'ordre."""
+    return requete(conn, """
+        SELECT marche, gare_depart, depart, gare_arrivee, arrivee, vide_voyageur, axe
+        FROM affectations WHERE scenario = ? AND rame = ?
+        UNION ALL
+        SELECT marche, gare, debut, gare, fin, 1, 'MAINTENANCE'
+        FROM maintenances WHERE scenario = ? AND rame = ?
+        ORDER BY depart
+    """, (scenario, int(rame), scenario, int(rame)))
+
+
+def affectation_marche(conn, marche, scenario=SCENARIO_DEFAUT):
+    """Rame(s) affectée(s) à une marche."""
+    return requete(conn, "SELECT * FROM affectations WHERE scenario = ? AND marche = ?", (scenario, str(marche)))
+
+
+def horaire_en_gare(conn, gare, debut=0, fin=24, scenario=SCENARIO_DEFAUT):
+    """Marches du service horaire partant de / arrivant à la gare entre debut et fin, affectées ou non."""
+    return requete(conn, """
+        SELECT * FROM marches WHERE scenario = ? AND gare_depart = ? AND depart BETWEEN ? AND ?
+        UNION
+        SELECT * FROM marches WHERE scenario = ? AND gare_arrivee = ? AND arrivee BETWEEN ? AND ?
+        ORDER BY depart
+    """, (scenario, gare, debut, fin, scenario, gare, debut, fin))
+
+
+def horaire_marche(conn, marche, scenario=SCENARIO_DEFAUT):
+    """Sillon d'une marche du service horaire (axe, gares, heures)."""
+    return requete(conn, "SELECT * FROM marches WHERE scenario = ? AND marche = ?", (scenario, str(marche)))
+
+
+def marches_non_affectees(conn, scenario=SCENARIO_DEFAUT):
+    """Marches du service horaire sans rame (rejetées à la validation ou hors des axes affectés)."""
+    return requete(conn, """
+        SELECT m.* FROM marches m
+        WHERE m.scenario = ? AND NOT EXISTS (
+            SELECT 1 FROM affectations a WHERE a.scenario = m.scenario AND a.marche = m.marche
+        )
+        ORDER BY m.axe, m.depart
+    """, (scenario,))
@@ -0,0 +1,139 @@
+# cache_marches.py
+# Cache binaire colonnaire des marches (marches_json/*.json) : un .npy par colonne,
+# gares encodées en entiers. Tant que les fichiers sources sont inchangés, les colonnes
+# sont relues en memory-map au lieu de re-parser et re-trier le JSON.
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from validation_marches import valider_marches
+
+
+CACHE_MARCHES_DIR = ".cache_marches"
+VERSION_CACHE = 3
+MARCHE_ABSENTE = -1   # numéro stocké pour une marche sans numéro (rejetée à la validation)
+UM_INVALIDE = 0       # um stocké pour une valeur illisible ou non entière (rejetée à la validation)
+
+# Colonnes stockées (une entrée par marche, fichiers concaténés dans l'ordre trié)
+# um : nb de rames couplées demandé par la marche (1 si le fichier ne le précise pas)
+COLONNES_CACHE = ["marche", "gare_depart", "depart", "gare_arrivee", "arrivee", "vide_voyageur", "um"]
+
+
+def fichiers_sources(dossier_json):
+    return sorted(f for f in os.listdir(dossier_json) if f.endswith(".json"))
+
+
+def empreinte_sources(dossier_json, fichiers):
+    """sha256 des noms et contenus des fichiers de marches (+ version du format)."""
+    h = hashlib.sha256(f"cache_marches v{VERSION_CACHE}".encode())
+    for fichier in fichiers:
+        h.update(fichier.encode() + b"\0")
+        with open(os.path.join(dossier_json, fichier), "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def lire_marches_json(dossier_json, fichier):
+    """Lecture d'un fichier de marches, triées par départ (comme l'affectation l'attend)."""
+    with open(os.path.join(dossier_json, fichier), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return pd.DataFrame(data).sort_values("depart").reset_index(drop=True)
+
+
+def construire_cache(dossier_json, fichiers, empreinte, cache_dir=CACHE_MARCHES_DIR):
+    """Parse tous les fichiers une fois et écrit les colonnes + meta.json (écrit en dernier)."""
+    dfs = [lire_marches_json(dossier_json, fichier) for fichier in fichiers]
+    df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame(columns=COLONNES_CACHE)
+    if "vide_voyageur" not in df.columns:
+        df["vide_voyageur"] = False
+    if "um" not in df.columns:
+        df["um"] = 1
+
+    gares, codes = np.unique(
+        np.concatenate([df["gare_depart"].astype(str), df["gare_arrivee"].astype(str)]),
+        return_inverse=True,
+    )
+    n = len(df)
+    # Numéros entiers (marche absente → MARCHE_ABSENTE), sinon texte
+    numeros = pd.to_numeric(df["marche"], errors="coerce")
+    entiers = (numeros.notna() | df["marche"].isna()).all() and (numeros.dropna() % 1 == 0).all()
+    # um absent → 1 ; illisible ou non entier → UM_INVALIDE
+    um = pd.to_numeric(df["um"], errors="coerce")
+    um = um.where(um % 1 == 0, UM_INVALIDE).where(df["um"].notna(), 1)
+    colonnes = {
+        "marche": numeros.fillna(MARCHE_ABSENTE).to_numpy(dtype=np.int64) if entiers
+                  else df["marche"].fillna("").astype(str).to_numpy(dtype=str),   # unicode fixe : mmap possible
+        "gare_depart": codes[:n].astype(np.int32),
+        "gare_arrivee": codes[n:].astype(np.int32),
+        "depart": df["depart"].to_numpy(dtype=np.float64),
+        "arrivee": df["arrivee"].to_numpy(dtype=np.float64),
+        "vide_voyageur": df["vide_voyageur"].astype("boolean").fillna(False).to_numpy(dtype=bool),
+        "um": um.clip(lower=-1, upper=np.iinfo(np.int32).max).to_numpy(dtype=np.int32),
+    }
+
+    os.makedirs(cache_dir, exist_ok=True)
+    chemin_meta = os.path.join(cache_dir, "meta.json")
+    if os.path.exists(chemin_meta):
+        os.remove(chemin_meta)
+    for nom, valeurs in colonnes.items():
+        np.save(os.path.join(cache_dir, f"{nom}.npy"), valeurs)
+
+    meta = {
+        "version": VERSION_CACHE,
+        "empreinte": empreinte,
+        "fichiers": fichiers,
+        "bornes": np.cumsum([0] + [len(d) for d in dfs]).tolist(),
+        "gares": gares.tolist(),
+    }
+    with open(chemin_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def _lire_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def charger_marches(dossier_json, cache_dir=CACHE_MARCHES_DIR, gares_connues=None, trajets_connus=None):
+    """
+    Renvoie {fichier_json: DataFrame des marches valides triées par départ}.
+    Le cache est (re)construit si l'empreinte des sources a changé ; la validation
+    (validation_marches) porte sur toutes les marches en une seule passe.
+    """
+    fichiers = fichiers_sources(dossier_json)
+    empreinte = empreinte_sources(dossier_json, fichiers)
+
+    meta = _lire_meta(cache_dir)
+    if meta is None or meta.get("empreinte") != empreinte:
+        print(f"Cache des marches reconstruit ({len(fichiers)} fichiers) : {cache_dir}")
+        construire_cache(dossier_json, fichiers, empreinte, cache_dir)
+        meta = _lire_meta(cache_dir)
+
+    colonnes = {
+        nom: np.load(os.path.join(cache_dir, f"{nom}.npy"), mmap_mode="r")
+        for nom in COLONNES_CACHE
+    }
+    gares = np.array(meta["gares"], dtype=object)
+    bornes = meta["bornes"]
+
+    table = pd.DataFrame({
+        "marche": colonnes["marche"],
+        "gare_depart": gares[colonnes["gare_depart"]],
+        "depart": colonnes["depart"],
+        "gare_arrivee": gares[colonnes["gare_arrivee"]],
+        "arrivee": colonnes["arrivee"],
+        "vide_voyageur": colonnes["vide_voyageur"],
+        "um": colonnes["um"],
+    })
+    source = pd.Series(np.repeat(meta["fichiers"], np.diff(bornes)), dtype=object)
+    _, rejet = valider_marches(table.assign(fichier=source), gares_connues, trajets_connus, colonne_source="fichier")
+
+    marches = {}
+    for i, fichier in enumerate(meta["fichiers"]):
+        tranche = slice(bornes[i], bornes[i + 1])
+        marches[fichier] = table.iloc[tranche][~rejet[tranche]].reset_index(drop=True)
+    return marches
@@ -0,0 +1,132 @@
+# compatibilite.py
+# Compatibilité traction / électrification : les modes de traction des matériels (parc_rames.json)
+# et l'électrification des lignes (lignes.json) sont convertis une fois en masques de bits,
+# puis en une matrice ligne × matériel. L'affectation ne fait plus qu'un test de bit par candidat.
+import json
+import os
+import parametres
+from parametres import (
+    PARC_RAMES_FILE, LIGNES_FILE, LIGNE_PAR_FICHIER, MODELE_PARC_RAMES, PREFERENCES_MATERIEL,
+)
+
+
+# Mode de traction → bit
+TRACTION_BITS = {"diesel": 1, "DC": 2, "AC": 4}
+TOUTES_TRACTIONS = sum(TRACTION_BITS.values())   # référentiel absent : aucune restriction
+
+# Ordre des matériels dans les masques (bit i = i-ème code de parametres.parc), fixé avec la matrice :
+# lu à l'appel, la matrice est reconstruite si les codes du parc ont changé
+_index_materiel = {}
+_masques_lignes = {}   # fichier de marches → masque des matériels compatibles (mis en cache)
+_candidats = {}        # (fichier de marches, mutualisation) → codes matériel à essayer, dans l'ordre
+
+
+def masque_traction(modes):
+    """
+    Liste de modes → masque ; False (ligne non électrifiée) = diesel seul,
+    None (non renseigné) = aucune restriction.
+    """
+    if modes is False:
+        return TRACTION_BITS["diesel"]
+    if modes is None:
+        return TOUTES_TRACTIONS
+    masque = 0
+    for mode in modes:
+        if mode not in TRACTION_BITS:
+            raise ValueError(f"Mode de traction inconnu : {mode} — connus : {', '.join(TRACTION_BITS)}")
+        masque |= TRACTION_BITS[mode]
+    return masque
+
+
+def _lire_json(chemin):
+    if not os.path.exists(chemin):
+        print(f"⚠️ {chemin} introuvable — aucune restriction de traction.")
+        return None
+    with open(chemin, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def traction_materiels(chemin=PARC_RAMES_FILE):
+    """
+    {code matériel: masque de traction}. Les modèles de parc_rames.json sont rattachés au parc
+    par MODELE_PARC_RAMES ; un matériel sans modèle dans le fichier n'est pas restreint.
+    """
+    donnees = _lire_json(chemin)
+    if donnees is None:
+        return {code: TOUTES_TRACTIONS for code in parametres.parc}
+    par_modele = {r["modele"]: r for r in donnees.get("rames", [])}
+    traction = {}
+    for code in parametres.parc:
+        modele = par_modele.get(MODELE_PARC_RAMES.get(code))
+        if modele is None:
+            print(f"⚠️ {code} : modèle {MODELE_PARC_RAMES.get(code)!r} absent de {chemin} "
+                  f"— aucune restriction de traction.")
+            traction[code] = TOUTES_TRACTIONS
+        else:
+            traction[code] = masque_traction(modele["traction"])
+    return traction
+
+
+def electrification_lignes(chemin=LIGNES_FILE):
+    """{nom de ligne: masque des tractions possibles} (clé electrification absente : toutes)."""
+    return {ligne["ligne"]: masque_traction(ligne.get("electrification")) for ligne in (_lire_json(chemin) or [])}
+
+
+def construire_matrice(traction=None, electrification=None):
+    """
+    Matrice ligne × matériel sous forme de masques : bit index_materiel()[code] du masque
+    d'un fichier = le matériel peut y circuler (au moins un mode de traction commun).
+    """
+    traction = traction_materiels() if traction is None else traction
+    electrification = electrification_lignes() if electrification is None else electrification
+    _index_materiel.clear()
+    _index_materiel.update((code, i) for i, code in enumerate(parametres.parc))
+    _masques_lignes.clear()
+    _candidats.clear()
+    for fichier, ligne in LIGNE_PAR_FICHIER.items():
+        modes = electrification.get(ligne, TOUTES_TRACTIONS)
+        _masques_lignes[fichier] = sum(
+            1 << _index_materiel[code] for code, t in traction.items() if t & modes and code in _index_materiel
+        )
+    return dict(_masques_lignes)
+
+
+def index_materiel():
+    """{code: bit} des masques ; matrice (re)construite si absente ou si les codes du parc ont changé."""
+    if not _masques_lignes or list(_index_materiel) != list(parametres.parc):
+        construire_matrice()
+    return _index_materiel
+
+
+def masque_ligne(fichier_json):
+    """Masque des matériels compatibles (fichier inconnu de LIGNE_PAR_FICHIER : tous)."""
+    index = index_materiel()
+    return _masques_lignes.get(fichier_json, (1 << len(index)) - 1)
+
+
+def compatible(fichier_json, code):
+    return bool(masque_ligne(fichier_json) >> index_materiel()[code] & 1)
+
+
+def materiels_candidats(fichier_json):
+    """
+    Codes matériel à engager pour un fichier, dans l'ordre : préférences compatibles,
+    puis (parametres.MUTUALISATION_MATERIEL, lu à l'appel) les autres matériels compatibles.
+    Calculé une fois par fichier et par valeur du paramètre.
+    """
+    index = index_materiel()   # vide _candidats si la matrice est reconstruite
+    mutualisation = bool(parametres.MUTUALISATION_MATERIEL)
+    cle = (fichier_json, mutualisation)
+    if cle not in _candidats:
+        masque = masque_ligne(fichier_json)
+        preferes = PREFERENCES_MATERIEL.get(fichier_json, PREFERENCES_MATERIEL[None])
+        candidats = [code for code in preferes if code in index and masque >> index[code] & 1]
+        if mutualisation:
+            candidats += [code for code in index if code not in candidats and masque >> index[code] & 1]
+        _candidats[cle] = candidats
+    return _candidats[cle]
+
+
+def matrice_compatibilite():
+    """Vue lisible de la matrice : {fichier: {code: bool}}."""
+    return {fichier: {code: compatible(fichier, code) for code in parametres.parc} for fichier in LIGNE_PAR_FICHIER}
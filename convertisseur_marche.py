@@ -1,4 +1,5 @@
 import json
+import numpy as np
 import pandas as pd
 import os
 import unicodedata
@@ -48,51 +49,201 @@ def clean_line_name(raw: str) -> str:
     txt = re.sub(r"-+", "-", txt)
     return txt.strip("-")
 
-def parse_excel_to_json(path_excel: str, dossier_sortie: str = "marches_json"):
-    os.makedirs(dossier_sortie, exist_ok=True)
+def iter_feuilles_excel(path_excel: str, toutes_feuilles: bool = False):
+    """
+    Ouvre le classeur en mode read_only et renvoie, pour chaque feuille, un itérateur paresseux
+    de ses lignes (tuples de 5 valeurs) : rien n'est chargé en mémoire.
+    Par défaut seule la première feuille est lue (comme pd.read_excel).
+    """
+    from openpyxl import load_workbook   # seulement pour la lecture Excel (le CSV s'en passe)
+    wb = load_workbook(path_excel, read_only=True, data_only=True)
+    try:
+        feuilles = wb.worksheets if toutes_feuilles else wb.worksheets[:1]
+        for ws in feuilles:
+            yield (tuple(row) + (None,) * (5 - len(row)) for row in ws.iter_rows(max_col=5, values_only=True))
+    finally:
+        wb.close()
+
+def convertir_marche(row) -> dict:
+    """Convertit une ligne (marche, origine, heure, terminus, heure) en marche JSON."""
+    marche_id, gare_depart, heure_depart, gare_arrivee, heure_arrivee = (str(v).strip() for v in row[:5])
+    return {
+        "marche": int(marche_id.split("/")[0]),
+        "gare_depart": GARE_TO_TRIGRAM.get(gare_depart, gare_depart),
+        "depart": heure_to_decimal(heure_depart),
+        "gare_arrivee": GARE_TO_TRIGRAM.get(gare_arrivee, gare_arrivee),
+        "arrivee": heure_to_decimal(heure_arrivee)
+    }
+
+class EcrivainMarches:
+    """
+    Écrit un fichier JSON par ligne au fil de l'eau (même format que json.dump(indent=4)) :
+    une seule ligne est ouverte à la fois, rien n'est accumulé en mémoire.
+    Chaque ligne est écrite dans un fichier temporaire (<fichier>.tmp) ; valider() les met
+    en place une fois toute la source lue, abandonner() les supprime (fichiers existants intacts).
+    """
+
+    def __init__(self, dossier_sortie: str):
+        self.dossier_sortie = dossier_sortie
+        self.nom_ligne = None
+        self.fichier = None
+        self.nb = 0
+        self.termines = {}   # nom de ligne → nb de marches écrites dans son fichier temporaire
+        os.makedirs(dossier_sortie, exist_ok=True)
+
+    def chemin(self, nom_ligne: str) -> str:
+        return os.path.join(self.dossier_sortie, f"marches_{nom_ligne}.json")
+
+    def chemin_temporaire(self, nom_ligne: str) -> str:
+        return self.chemin(nom_ligne) + ".tmp"
+
+    def nouvelle_ligne(self, nom_ligne: str):
+        self.fermer()
+        self.nom_ligne = nom_ligne
+        # Entête répété : la dernière section remplace la précédente
+        if self.termines.pop(nom_ligne, None) is not None:
+            os.remove(self.chemin_temporaire(nom_ligne))
+
+    def ecrire(self, marche: dict):
+        bloc = json.dumps(marche, indent=4, ensure_ascii=False)
+        self.ecrire_blocs(["\n".join("    " + l for l in bloc.split("\n"))])
+
+    def ecrire_blocs(self, blocs):
+        """Ajoute des marches déjà formatées (objets JSON indentés d'un niveau)."""
+        if not len(blocs):
+            return
+        if self.fichier is None:
+            # Ouverture à la première marche : pas de fichier pour une ligne vide
+            self.fichier = open(self.chemin_temporaire(self.nom_ligne), "w", encoding="utf-8")
+            self.fichier.write("[\n")
+        else:
+            self.fichier.write(",\n")
+        self.fichier.write(",\n".join(blocs))
+        self.nb += len(blocs)
+
+    def fermer(self):
+        if self.fichier is not None:
+            self.fichier.write("\n]")
+            self.fichier.close()
+            self.termines[self.nom_ligne] = self.nb
+        self.fichier = None
+        self.nb = 0
+
+    def valider(self):
+        """Source lue sans erreur : les fichiers temporaires remplacent les fichiers par ligne."""
+        self.fermer()
+        for nom_ligne, nb in self.termines.items():
+            os.replace(self.chemin_temporaire(nom_ligne), self.chemin(nom_ligne))
+            print(f"✅ {self.chemin(nom_ligne)} généré avec {nb} marches")
+        self.termines = {}
+
+    def abandonner(self):
+        """Supprime les fichiers temporaires restants (aucun après valider)."""
+        if self.fichier is not None:
+            self.fichier.close()
+            self.termines[self.nom_ligne] = self.nb
+            self.fichier = None
+        for nom_ligne in self.termines:
+            os.remove(self.chemin_temporaire(nom_ligne))
+        self.termines = {}
+
+def parse_excel_to_json(path_excel: str, dossier_sortie: str = "marches_json", toutes_feuilles: bool = False):
+    ecrivain = EcrivainMarches(dossier_sortie)
 
-    # Lecture brute sans header
-    df = pd.read_excel(path_excel, header=None)
+    try:
+        for lignes_feuille in iter_feuilles_excel(path_excel, toutes_feuilles):
+            # Chaque feuille commence par son propre entête de colonnes
+            current_line = None
+
+            for row in lignes_feuille:
+                first_cell = str(row[0]).strip() if row[0] is not None else ""
+
+                # Détection entête de ligne
+                if first_cell.lower().startswith("ligne"):
+                    # Exemple : "Ligne Marseille - Briançon"
+                    raw_name = first_cell.replace("Ligne", "").strip()
+                    current_line = clean_line_name(raw_name)
+                    ecrivain.nouvelle_ligne(current_line)
+                    continue
+
+                # Si marche valide
+                if current_line and all(v is not None for v in row):
+                    ecrivain.ecrire(convertir_marche(row))
+        ecrivain.valider()
+    finally:
+        ecrivain.abandonner()
+
+# --- Export CSV (";", BOM, sections "Ligne ...;;;;", heures HH.MM) ---
+TAILLE_BLOC_CSV = 100_000
+
+def heures_to_decimal(horaires: pd.Series) -> pd.Series:
+    """Version vectorisée de heure_to_decimal (NaN si le format n'est pas HH.MM)."""
+    hm = horaires.str.strip().str.extract(r"^([+-]?\d+)\.([+-]?\d+)$").astype(float)
+    return (hm[0] + hm[1] / 60).round(3)
+
+def gares_to_trigram(gares: pd.Series) -> pd.Series:
+    """Noms complets → trigrammes (nom conservé s'il est inconnu)."""
+    gares = gares.str.strip()
+    return gares.map(GARE_TO_TRIGRAM).fillna(gares)
 
-    lignes = {}
-    current_line = None
+def _json_valeurs(valeurs: pd.Series) -> pd.Series:
+    """Encode chaque valeur distincte une seule fois, comme json.dumps."""
+    return valeurs.map({v: json.dumps(v, ensure_ascii=False) for v in valeurs.unique()})
 
-    for _, row in df.iterrows():
-        first_cell = str(row[0]).strip() if pd.notna(row[0]) else ""
+def _json_heures(heures: pd.Series) -> pd.Series:
+    return heures.map(repr).where(heures.notna(), "null")
 
-        # Détection entête de ligne
-        if first_cell.lower().startswith("ligne"):
+def formater_marches_csv(bloc: pd.DataFrame) -> pd.Series:
+    """Formate un bloc de marches valides en objets JSON (même texte que EcrivainMarches.ecrire)."""
+    marche = bloc[0].str.strip().str.split("/").str[0].astype(int).astype(str)
+    return (
+        '    {\n        "marche": ' + marche
+        + ',\n        "gare_depart": ' + _json_valeurs(gares_to_trigram(bloc[1]))
+        + ',\n        "depart": ' + _json_heures(heures_to_decimal(bloc[2]))
+        + ',\n        "gare_arrivee": ' + _json_valeurs(gares_to_trigram(bloc[3]))
+        + ',\n        "arrivee": ' + _json_heures(heures_to_decimal(bloc[4]))
+        + "\n    }"
+    )
+
+def parse_csv_to_json(path_csv: str, dossier_sortie: str = "marches_json", taille_bloc: int = TAILLE_BLOC_CSV):
+    """
+    Équivalent de parse_excel_to_json pour l'export CSV : lecture par blocs de taille_bloc lignes,
+    conversions vectorisées sur chaque bloc, écriture au fil de l'eau des fichiers par ligne.
+    """
+    ecrivain = EcrivainMarches(dossier_sortie)
+    blocs = pd.read_csv(
+        path_csv, sep=";", header=None, usecols=range(5), dtype=str,
+        encoding="utf-8-sig", chunksize=taille_bloc,
+    )
+
+    try:
+        for df in blocs:
+            df.columns = range(5)
+            first_cell = df[0].str.strip()
+
+            # Détection entêtes de ligne ; les lignes qui précèdent le premier entête
+            # continuent la section du bloc précédent
+            est_entete = first_cell.str.lower().str.startswith("ligne").fillna(False).to_numpy()
+            entetes = np.flatnonzero(est_entete)
             # Exemple : "Ligne Marseille - Briançon"
-            raw_name = first_cell.replace("Ligne", "").strip()
-            current_line = clean_line_name(raw_name)
-            lignes[current_line] = []
-            continue
-
-        # Si marche valide
-        if current_line and pd.notna(row[0]) and pd.notna(row[1]) and pd.notna(row[2]) and pd.notna(row[3]) and pd.notna(row[4]):
-            marche_id = str(row[0]).strip()
-            gare_depart = str(row[1]).strip()
-            heure_depart = str(row[2]).strip()
-            gare_arrivee = str(row[3]).strip()
-            heure_arrivee = str(row[4]).strip()
-
-            marche = {
-                "marche": int(marche_id.split("/")[0]),
-                "gare_depart": GARE_TO_TRIGRAM.get(gare_depart, gare_depart),
-                "depart": heure_to_decimal(heure_depart),
-                "gare_arrivee": GARE_TO_TRIGRAM.get(gare_arrivee, gare_arrivee),
-                "arrivee": heure_to_decimal(heure_arrivee)
-            }
-            lignes[current_line].append(marche)
-
-    # Écriture d’un fichier JSON par ligne
-    for nom_ligne, marches in lignes.items():
-        if not marches:
-            continue
-        chemin = os.path.join(dossier_sortie, f"marches_{nom_ligne}.json")
-        with open(chemin, "w", encoding="utf-8") as f:
-            json.dump(marches, f, indent=4, ensure_ascii=False)
-        print(f"✅ {chemin} généré avec {len(marches)} marches")
+            noms = [clean_line_name(first_cell.iat[i].replace("Ligne", "").strip()) for i in entetes]
+
+            # Marches valides : 5 cellules renseignées, dans une section nommée
+            section = np.cumsum(est_entete)
+            section_nommee = np.array([bool(ecrivain.nom_ligne)] + [bool(n) for n in noms])
+            valides = np.flatnonzero(df.notna().all(axis=1).to_numpy() & ~est_entete & section_nommee[section])
+            textes = formater_marches_csv(df.iloc[valides]).tolist()
+
+            # Écriture section par section (tranches du bloc déjà formaté)
+            bornes = np.searchsorted(valides, np.concatenate([entetes, [len(df)]]))
+            ecrivain.ecrire_blocs(textes[:bornes[0]])
+            for k, nom in enumerate(noms):
+                ecrivain.nouvelle_ligne(nom)
+                ecrivain.ecrire_blocs(textes[bornes[k]:bornes[k + 1]])
+        ecrivain.valider()
+    finally:
+        blocs.close()
+        ecrivain.abandonner()
 
 if __name__ == "__main__":
     parse_excel_to_json("Pdt 2025-26 SUD PACA Ouest Provence.xlsx")
@@ -0,0 +1,261 @@
+# export_html.py
+# Export HTML autonome des roulements : données en colonnes JSON compactes,
+# rendu canvas limité aux rames et à la plage horaire visibles (fluide à plusieurs milliers de rames).
+import json
+import numpy as np
+from modele_affectation import TypeMarche, TYPES_HLP
+
+
+# Type de marche affiché (couleur des barres)
+TYPE_VOYAGEUR = 0
+TYPE_HLP = 1
+TYPE_MAINTENANCE = 2
+
+
+def colonnes_roulements(df_assign_mat):
+    """
+    Convertit les marches d'un matériel en colonnes compactes (une entrée par marche,
+    triées par rame puis départ) + index de début de chaque rame.
+    """
+    d = df_assign_mat[df_assign_mat["depart"].notna()]
+    d = d.sort_values("depart", kind="stable").sort_values("rame", kind="stable")
+
+    rames = d["rame"].to_numpy()
+    rame_list = sorted(set(rames.tolist()))
+    debut = np.searchsorted(rames, rame_list, side="left").tolist() + [len(d)]
+
+    gares, gares_idx = np.unique(
+        np.concatenate([d["gare_depart"].astype(str), d["gare_arrivee"].astype(str)]),
+        return_inverse=True,
+    )
+    n = len(d)
+
+    marche = d["marche"].astype(str)
+    type_marche = np.where(d["vide_voyageur"].astype(bool), TYPE_HLP, TYPE_VOYAGEUR)
+    type_marche = np.where(d["type_marche"].to_numpy() == TypeMarche.MAINT, TYPE_MAINTENANCE, type_marche)
+    # Libellé : « HLP » pour les navettes / évolutions, numéro de marche (ou MAINT-…) sinon
+    est_hlp = np.isin(d["type_marche"].to_numpy(), TYPES_HLP)
+
+    voy = type_marche == TYPE_VOYAGEUR
+    km = d["distance_km"].where(voy, 0) if "distance_km" in d.columns else None
+    km_par_rame = (
+        km.groupby(d["rame"]).sum().reindex(rame_list, fill_value=0).astype(int).tolist()
+        if km is not None else [0] * len(rame_list)
+    )
+    axes = (
+        d[["rame", "axe"]].dropna().drop_duplicates()
+        .groupby("rame")["axe"].agg(" / ".join).reindex(rame_list, fill_value="").tolist()
+        if "axe" in d.columns else [""] * len(rame_list)
+    )
+
+    return {
+        "rames": [int(r) for r in rame_list],
+        "axes": axes,
+        "km": km_par_rame,
+        "debut": debut,
+        "gares": gares.tolist(),
+        "dep": np.round(d["depart"].to_numpy(dtype=float), 3).tolist(),
+        "arr": np.round(d["arrivee"].to_numpy(dtype=float), 3).tolist(),
+        "gd": gares_idx[:n].tolist(),
+        "ga": gares_idx[n:].tolist(),
+        "marche": marche.where(~est_hlp, "HLP").tolist(),
+        "type": type_marche.tolist(),
+    }
+
+
+def export_roulements_html(df_assign_mat, materiel_code, nom_html=None):
+    """Écrit roulements_<materiel>.html : visualiseur autonome (aucune dépendance externe)."""
+    if df_assign_mat.empty:
+        return None
+
+    nom_html = nom_html or f"roulements_{materiel_code}.html"
+    donnees = colonnes_roulements(df_assign_mat)
+    donnees["titre"] = f"Roulements – {materiel_code}"
+
+    # "</" échappé : le JSON est inclus dans une balise <script>
+    json_donnees = json.dumps(donnees, separators=(",", ":"), ensure_ascii=False).replace("</", "<\\/")
+    html = HTML_TEMPLATE.replace("__TITRE__", donnees["titre"]).replace("__DONNEES__", json_donnees)
+
+    with open(nom_html, "w", encoding="utf-8") as f:
+        f.write(html)
+    print(f"HTML généré : {nom_html}")
+    return nom_html
+
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>__TITRE__</title>
+<style>
+  html, body { margin: 0; height: 100%; font-family: Helvetica, Arial, sans-serif; }
+  body { display: flex; flex-direction: column; }
+  #barre { padding: 6px 10px; border-bottom: 1px solid #ccc; font-size: 13px; display: flex; gap: 12px; align-items: center; }
+  #barre h1 { font-size: 15px; margin: 0 12px 0 0; }
+  #zone { position: relative; flex: 1; overflow: hidden; }
+  #dessin { position: absolute; top: 0; left: 0; pointer-events: none; }
+  #defilement { position: absolute; inset: 0; overflow-y: auto; overflow-x: hidden; }
+  #info { position: absolute; display: none; background: #fff; border: 1px solid #888;
+          padding: 4px 6px; font-size: 12px; pointer-events: none; white-space: pre; }
+</style>
+</head>
+<body>
+<div id="barre">
+  <h1>__TITRE__</h1>
+  <span id="resume"></span>
+  <button id="tout">0h – 24h</button>
+  <span>Ctrl + molette : zoom horaire · Maj + molette : défilement horaire</span>
+</div>
+<div id="zone">
+  <canvas id="dessin"></canvas>
+  <div id="defilement"><div id="hauteur"></div></div>
+  <div id="info"></div>
+</div>
+<script id="donnees" type="application/json">__DONNEES__</script>
+<script>
+(function () {
+  const D = JSON.parse(document.getElementById("donnees").textContent);
+  const N = D.rames.length;
+  const LIGNE_H = 28, GAUCHE = 110, DROITE = 60, ENTETE = 18;
+  const COULEURS = ["#000000", "#b8b8b8", "#d9822b"];
+
+  const zone = document.getElementById("zone");
+  const canvas = document.getElementById("dessin");
+  const ctx = canvas.getContext("2d");
+  const defil = document.getElementById("defilement");
+  const info = document.getElementById("info");
+  document.getElementById("hauteur").style.height = (N * LIGNE_H + ENTETE) + "px";
+  document.getElementById("resume").textContent = N + " rames, " + D.dep.length + " marches";
+
+  let t0 = 0, t1 = 24, largeur = 0, hauteur = 0, demande = false;
+
+  function redimensionner() {
+    const dpr = window.devicePixelRatio || 1;
+    largeur = zone.clientWidth - (defil.offsetWidth - defil.clientWidth);
+    hauteur = zone.clientHeight;
+    canvas.width = largeur * dpr;
+    canvas.height = hauteur * dpr;
+    canvas.style.width = largeur + "px";
+    canvas.style.height = hauteur + "px";
+    ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+    planifier();
+  }
+
+  function X(t) { return GAUCHE + (t - t0) / (t1 - t0) * (largeur - GAUCHE - DROITE); }
+  function T(x) { return t0 + (x - GAUCHE) / (largeur - GAUCHE - DROITE) * (t1 - t0); }
+
+  function planifier() {
+    if (!demande) { demande = true; requestAnimationFrame(dessiner); }
+  }
+
+  function dessiner() {
+    demande = false;
+    ctx.clearRect(0, 0, largeur, hauteur);
+    const haut = defil.scrollTop;
+    const premiere = Math.max(0, Math.floor((haut - ENTETE) / LIGNE_H));
+    const derniere = Math.min(N, premiere + Math.ceil(hauteur / LIGNE_H) + 1);
+
+    // Grille horaire (pas adapté au zoom)
+    const pas = (t1 - t0) > 12 ? 1 : (t1 - t0) > 4 ? 0.5 : 0.25;
+    ctx.font = "10px Helvetica, Arial, sans-serif";
+    ctx.textAlign = "center";
+    ctx.strokeStyle = "#e2e2e2";
+    ctx.fillStyle = "#555";
+    ctx.beginPath();
+    for (let h = Math.ceil(t0 / pas) * pas; h <= t1; h += pas) {
+      const x = Math.round(X(h)) + 0.5;
+      ctx.moveTo(x, ENTETE); ctx.lineTo(x, hauteur);
+      const hh = Math.floor(h), mm = Math.round((h - hh) * 60);
+      ctx.fillText(hh + "h" + (mm ? String(mm).padStart(2, "0") : ""), x, 12);
+    }
+    ctx.stroke();
+
+    const echelle = (largeur - GAUCHE - DROITE) / (t1 - t0);
+    for (let i = premiere; i < derniere; i++) {
+      const y = ENTETE + i * LIGNE_H - haut + LIGNE_H / 2;
+      if (y < ENTETE) continue;
+
+      ctx.textAlign = "left";
+      ctx.fillStyle = "#000";
+      ctx.fillText(String(D.rames[i]), 6, y + 3);
+      ctx.fillStyle = "#2a7a2a";
+      ctx.fillText(D.km[i] + " km", largeur - DROITE + 6, y + 3);
+
+      for (let k = D.debut[i]; k < D.debut[i + 1]; k++) {
+        if (D.arr[k] < t0 || D.dep[k] > t1) continue;
+        const x1 = Math.max(X(D.dep[k]), GAUCHE), x2 = Math.min(X(D.arr[k]), largeur - DROITE);
+        ctx.fillStyle = COULEURS[D.type[k]];
+        ctx.fillRect(x1, y - 3, Math.max(x2 - x1, 1), 6);
+
+        // Libellés seulement s'il y a la place
+        if (x2 - x1 > 34) {
+          ctx.textAlign = "center";
+          ctx.fillStyle = "#666";
+          ctx.fillText(D.marche[k], (x1 + x2) / 2, y - 6);
+        }
+        if (echelle > 120) {
+          ctx.fillStyle = "#000";
+          ctx.textAlign = "left";
+          ctx.fillText(D.gares[D.gd[k]], x1, y + 14);
+          ctx.textAlign = "right";
+          ctx.fillText(D.gares[D.ga[k]], x2, y + 14);
+        }
+      }
+    }
+  }
+
+  function hm(t) {
+    const h = Math.floor(t), m = Math.round((t - h) * 60);
+    return String(h + (m === 60 ? 1 : 0)).padStart(2, "0") + ":" + String(m === 60 ? 0 : m).padStart(2, "0");
+  }
+
+  defil.addEventListener("scroll", planifier, { passive: true });
+  window.addEventListener("resize", redimensionner);
+  document.getElementById("tout").addEventListener("click", function () { t0 = 0; t1 = 24; planifier(); });
+
+  defil.addEventListener("wheel", function (e) {
+    if (!e.ctrlKey && !e.shiftKey && !e.deltaX) return;
+    e.preventDefault();
+    const r = defil.getBoundingClientRect();
+    const duree = t1 - t0;
+    if (e.ctrlKey) {
+      const tc = T(e.clientX - r.left), f = e.deltaY > 0 ? 1.2 : 1 / 1.2;
+      const d = Math.min(24, Math.max(0.25, duree * f));
+      t0 = tc - (tc - t0) * d / duree;
+      t1 = t0 + d;
+    } else {
+      const dt = (e.deltaX || e.deltaY) / (largeur - GAUCHE - DROITE) * duree;
+      t0 += dt; t1 += dt;
+    }
+    if (t0 < 0) { t1 -= t0; t0 = 0; }
+    if (t1 > 24) { t0 -= t1 - 24; t1 = 24; }
+    t0 = Math.max(0, t0);
+    planifier();
+  }, { passive: false });
+
+  defil.addEventListener("mousemove", function (e) {
+    const r = defil.getBoundingClientRect();
+    const x = e.clientX - r.left, y = e.clientY - r.top + defil.scrollTop - ENTETE;
+    const i = Math.floor(y / LIGNE_H), t = T(x);
+    info.style.display = "none";
+    if (i < 0 || i >= N || x < GAUCHE) return;
+    for (let k = D.debut[i]; k < D.debut[i + 1]; k++) {
+      if (D.dep[k] <= t && t <= D.arr[k]) {
+        info.textContent = "Rame " + D.rames[i] + " – " + D.axes[i] +
+          (D.type[k] === 2 ? "\\nMaintenance " : "\\nMarche ") + D.marche[k] +
+          "\\n" + D.gares[D.gd[k]] + " " + hm(D.dep[k]) + " → " + D.gares[D.ga[k]] + " " + hm(D.arr[k]);
+        info.style.left = (x + 12) + "px";
+        info.style.top = (e.clientY - r.top + 12) + "px";
+        info.style.display = "block";
+        return;
+      }
+    }
+  });
+  defil.addEventListener("mouseleave", function () { info.style.display = "none"; });
+
+  redimensionner();
+})();
+</script>
+</body>
+</html>
+"""
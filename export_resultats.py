@@ -0,0 +1,124 @@
+# export_resultats.py
+# Export des résultats de la chaîne (affectations, maintenances, PPHPD, équilibre des flux)
+# en tables typées à schéma fixe : Parquet si pyarrow / fastparquet est installé, sinon CSV
+# + schema.json. Les outils en aval relisent les résultats sans relancer l'affectation.
+import importlib.util
+import json
+import os
+import pandas as pd
+from modele_affectation import TypeMarche
+
+
+RESULTATS_DIR = "resultats"
+VERSION_SCHEMA = 3
+
+# table : {colonne: dtype pandas}
+SCHEMAS = {
+    "affectations": {
+        "axe": "category", "materiel": "category", "rame": "int32", "marche": "string",
+        "type_marche": "int8", "um": "int8", "gare_depart": "category", "depart": "float64", "gare_arrivee": "category", "arrivee": "float64",
+        "vide_voyageur": "bool", "distance_km": "float64",
+    },
+    "maintenances": {
+        "materiel": "category", "rame": "int32", "marche": "string",
+        "gare": "category", "debut": "float64", "fin": "float64",
+    },
+    "pphpd": {
+        "axe": "category", "heure": "int8", "direction": "category", "pphpd": "int32",
+    },
+    "flux": {
+        "axe": "category", "fichier": "string", "gare": "category",
+        "departs": "int32", "arrivees": "int32", "diff": "int32",
+    },
+}
+
+
+def parquet_disponible():
+    return any(importlib.util.find_spec(m) is not None for m in ("pyarrow", "fastparquet"))
+
+
+def _typer(df, schema):
+    df = df.reindex(columns=list(schema)).reset_index(drop=True)
+    return df.astype(schema)
+
+
+def _table_vide(nom):
+    return pd.DataFrame(columns=list(SCHEMAS[nom]))
+
+
+def tables_resultats(df_assign_global, pphpd_par_axe, flux_par_axe):
+    """Tables typées (schéma SCHEMAS) à partir des résultats de la chaîne."""
+    df = df_assign_global.assign(marche=df_assign_global["marche"].astype(str))
+    df["vide_voyageur"] = df["vide_voyageur"].astype("boolean").fillna(False)
+    est_maint = df["type_marche"] == TypeMarche.MAINT
+
+    maintenances = df[est_maint].rename(columns={"gare_depart": "gare", "depart": "debut", "arrivee": "fin"})
+
+    pphpd = [dfp.assign(axe=axe) for axe, dfp in pphpd_par_axe.items() if not dfp.empty]
+
+    flux = []
+    for axe, info in flux_par_axe.items():
+        dff = info.get("flux")
+        if dff is None or dff.empty:
+            continue
+        dff = dff.set_axis(["gare", "departs", "arrivees", "diff"], axis=1)
+        flux.append(dff.assign(axe=axe, fichier=info.get("fichier")))
+
+    return {
+        "affectations": _typer(df[~est_maint], SCHEMAS["affectations"]),
+        "maintenances": _typer(maintenances, SCHEMAS["maintenances"]),
+        "pphpd": _typer(pd.concat(pphpd, ignore_index=True) if pphpd else _table_vide("pphpd"), SCHEMAS["pphpd"]),
+        "flux": _typer(pd.concat(flux, ignore_index=True) if flux else _table_vide("flux"), SCHEMAS["flux"]),
+    }
+
+
+def exporter_resultats(df_assign_global, pphpd_par_axe, flux_par_axe, dossier=RESULTATS_DIR, format="csv"):
+    """
+    Écrit une table par fichier (<table>.parquet ou <table>.csv) et schema.json (écrit en dernier).
+    format : "csv" ou "parquet" (repli sur "csv" si aucun moteur Parquet n'est installé).
+    """
+    if format == "parquet" and not parquet_disponible():
+        print("⚠️ pyarrow / fastparquet absent — export des résultats en CSV.")
+        format = "csv"
+
+    os.makedirs(dossier, exist_ok=True)
+    chemin_schema = os.path.join(dossier, "schema.json")
+    if os.path.exists(chemin_schema):
+        os.remove(chemin_schema)
+
+    tables = tables_resultats(df_assign_global, pphpd_par_axe, flux_par_axe)
+    for nom, df in tables.items():
+        chemin = os.path.join(dossier, f"{nom}.{format}")
+        if format == "parquet":
+            df.to_parquet(chemin, index=False)
+        else:
+            df.to_csv(chemin, index=False)
+
+    schema = {
+        "version": VERSION_SCHEMA,
+        "format": format,
+        "tables": {nom: {"colonnes": SCHEMAS[nom], "lignes": len(df)} for nom, df in tables.items()},
+    }
+    with open(chemin_schema, "w", encoding="utf-8") as f:
+        json.dump(schema, f, indent=2, ensure_ascii=False)
+
+    print(f"Résultats exportés ({format}) : {dossier}/ — "
+          + ", ".join(f"{nom} {len(df)}" for nom, df in tables.items()))
+
+
+def charger_resultats(dossier=RESULTATS_DIR, tables=None):
+    """Relit les tables exportées avec leurs types ({table: DataFrame}), sans relancer la chaîne."""
+    with open(os.path.join(dossier, "schema.json"), "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    if schema.get("version") != VERSION_SCHEMA:
+        raise ValueError(f"Schéma des résultats v{schema.get('version')} — v{VERSION_SCHEMA} attendu")
+
+    resultats = {}
+    for nom in tables or schema["tables"]:
+        colonnes = schema["tables"][nom]["colonnes"]
+        chemin = os.path.join(dossier, f"{nom}.{schema['format']}")
+        if schema["format"] == "parquet":
+            resultats[nom] = pd.read_parquet(chemin)
+        else:
+            resultats[nom] = pd.read_csv(chemin, dtype=colonnes)
+    return resultats
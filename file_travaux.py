@@ -0,0 +1,240 @@
+# file_travaux.py
+# File de travaux asynchrone (asyncio) devant le moteur, pour plusieurs planificateurs à la fois :
+# les calculs partent dans des processus, par ordre de priorité, sur deux voies séparées —
+# les requêtes rapides (kpi / pphpd / affectation) ne passent jamais derrière un rendu PDF.
+# Chaque travail diffuse sa progression (étapes) et peut être annulé tant qu'il attend.
+#
+#   file = FileTravaux(); await file.demarrer()
+#   travail = file.soumettre("kpi", {"temps_minimal": 0.25, "parc": {"BGC": 24}})
+#   async for evenement in travail.progression(): ...
+#   resultat = await travail.resultat()
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Type de travail → priorité par défaut (plus petit = plus urgent)
+PRIORITES = {"kpi": 0, "pphpd": 0, "affectation": 1, "rendu": 5}
+TYPES_RAPIDES = {"kpi", "pphpd", "affectation"}
+
+NB_PROCESS_RAPIDES = 1     # voie des requêtes rapides
+NB_PROCESS_LOURDS = 2      # voie des rendus (affectation + maintenances + exports)
+INTERVALLE_PROGRESSION = 0.05   # relève des messages de progression des processus (s)
+
+# Sorties des rendus : un dossier par travail (<n° de travail>-<scénario>), pour que deux rendus
+# simultanés n'écrivent jamais les mêmes fichiers ni les sorties de la chaîne de base
+DOSSIER_RENDUS = "rendus_whatif"
+
+EN_ATTENTE, EN_COURS, TERMINE, ERREUR, ANNULE = "en attente", "en cours", "terminé", "erreur", "annulé"
+
+
+# ------------------ Côté processus de calcul ------------------
+_etat = None   # EtatWhatif du processus : données gardées chaudes d'un travail à l'autre
+
+
+def _signaler(file_progression, id_travail, etape):
+    if file_progression is not None:
+        file_progression.put({"id": id_travail, "etape": etape, "t": time.time()})
+
+
+def executer_travail(id_travail, type_travail, demande, file_progression=None):
+    """Exécuté dans un processus de calcul : scénario « et si ? » ou chaîne complète avec exports."""
+    global _etat
+    import affectation_pdf as moteur
+    from service_whatif import EtatWhatif, normaliser_demande, nom_scenario, parametres_temporaires
+
+    if _etat is None:
+        _signaler(file_progression, id_travail, "chargement des données")
+        _etat = EtatWhatif()
+    scenario = normaliser_demande(demande)
+
+    if type_travail in TYPES_RAPIDES:
+        _signaler(file_progression, id_travail, "affectation")
+        resultat, _ = _etat.scenario(scenario)
+        return resultat[type_travail]
+
+    # Rendu : un seul processus de rendu par travail (les travaux lourds tournent déjà en parallèle)
+    moteur.NB_PROCESS_RENDU = 1
+    nom = nom_scenario(scenario)
+    dossier = os.path.join(DOSSIER_RENDUS, f"{id_travail:04d}-{nom}")
+    with parametres_temporaires(scenario["parametres"], scenario["parc"]):
+        _signaler(file_progression, id_travail, "affectation")
+        res = moteur.affecter_marches(axes=scenario["axes"] or None, marches=_etat.marches)
+        if res is None:
+            return {"documents": 0}
+        df, marches_par_axe, pphpd_par_axe = res
+        _signaler(file_progression, id_travail, "maintenances")
+        df = moteur.placer_maintenances(df, _etat.maintenances)
+        _signaler(file_progression, id_travail, "exports")
+        formats = demande.get("format")
+        moteur.exporter(df, marches_par_axe, pphpd_par_axe,
+                        materiels=demande.get("materiel"), formats=[formats] if isinstance(formats, str) else formats,
+                        dossier=dossier, scenario=nom)
+    return {"affectations": len(df), "formats": formats or moteur.formats_par_defaut(),
+            "dossier": dossier, "scenario": nom}
+
+
+# ------------------ Côté boucle asyncio ------------------
+class Travail:
+    """Un travail soumis : état, résultat (futur) et flux d'évènements de progression."""
+
+    def __init__(self, id_travail, type_travail, demande, priorite):
+        self.id = id_travail
+        self.type = type_travail
+        self.demande = demande
+        self.priorite = priorite
+        self.etat = EN_ATTENTE
+        self.annulation_demandee = False
+        self.soumis = time.time()
+        self._futur = asyncio.get_running_loop().create_future()
+        self._evenements = asyncio.Queue()
+        self.signaler(EN_ATTENTE)
+
+    def signaler(self, etape):
+        self._evenements.put_nowait({"id": self.id, "etape": etape, "t": time.time()})
+
+    def terminer(self, etat, resultat=None, erreur=None):
+        self.etat = etat
+        if not self._futur.done():
+            if etat == ERREUR:
+                self._futur.set_exception(erreur)
+            elif etat == ANNULE:
+                self._futur.cancel()
+            else:
+                self._futur.set_result(resultat)
+        self.signaler(etat)
+        self._evenements.put_nowait(None)
+
+    async def progression(self):
+        """Évènements {id, etape, t} jusqu'à la fin du travail (terminé / erreur / annulé)."""
+        while True:
+            evenement = await self._evenements.get()
+            if evenement is None:
+                return
+            yield evenement
+
+    async def resultat(self):
+        return await self._futur
+
+
+class FileTravaux:
+    """
+    Deux voies (rapide / lourde), chacune avec sa file à priorités et son pool de processus.
+    Annulation : immédiate pour un travail en attente ; un travail en cours n'est pas
+    interrompu (il tourne dans un autre processus) mais son résultat est ignoré.
+    """
+
+    def __init__(self, nb_rapides=NB_PROCESS_RAPIDES, nb_lourds=NB_PROCESS_LOURDS):
+        self.nb = {"rapide": nb_rapides, "lourd": nb_lourds}
+        self.travaux = {}
+        self._compteur = itertools.count(1)
+        self._taches = []
+
+    async def demarrer(self):
+        self._manager = multiprocessing.Manager()
+        self._progression = self._manager.Queue()
+        self._files = {voie: asyncio.PriorityQueue() for voie in self.nb}
+        self._pools = {voie: ProcessPoolExecutor(max_workers=n) for voie, n in self.nb.items()}
+        for voie, n in self.nb.items():
+            self._taches += [asyncio.create_task(self._ouvrier(voie)) for _ in range(n)]
+        self._taches.append(asyncio.create_task(self._relayer_progression()))
+
+    async def arreter(self):
+        for tache in self._taches:
+            tache.cancel()
+        await asyncio.gather(*self._taches, return_exceptions=True)
+        for travail in self.travaux.values():
+            if travail.etat == EN_ATTENTE:
+                travail.terminer(ANNULE)
+        for pool in self._pools.values():
+            pool.shutdown(cancel_futures=True)
+        self._manager.shutdown()
+
+    def soumettre(self, type_travail, demande=None, priorite=None):
+        if type_travail not in PRIORITES:
+            raise ValueError(f"Type de travail inconnu : {type_travail} — connus : {', '.join(PRIORITES)}")
+        priorite = PRIORITES[type_travail] if priorite is None else priorite
+        travail = Travail(next(self._compteur), type_travail, demande or {}, priorite)
+        self.travaux[travail.id] = travail
+        voie = "rapide" if type_travail in TYPES_RAPIDES else "lourd"
+        # (priorité, ordre d'arrivée) : à priorité égale, premier soumis premier servi
+        self._files[voie].put_nowait((priorite, travail.id, travail))
+        return travail
+
+    def annuler(self, id_travail):
+        """True si le travail ne produira pas de résultat (annulé en attente ou ignoré en cours)."""
+        travail = self.travaux.get(id_travail)
+        if travail is None or travail.etat in (TERMINE, ERREUR, ANNULE):
+            return False
+        if travail.etat == EN_ATTENTE:
+            travail.terminer(ANNULE)
+        else:
+            travail.annulation_demandee = True
+            travail.signaler("annulation demandée (résultat ignoré)")
+        return True
+
+    def etat(self):
+        """Résumé des travaux : id → (type, priorité, état)."""
+        return {t.id: (t.type, t.priorite, t.etat) for t in self.travaux.values()}
+
+    async def _ouvrier(self, voie):
+        boucle = asyncio.get_running_loop()
+        while True:
+            _, _, travail = await self._files[voie].get()
+            if travail.etat != EN_ATTENTE:
+                continue   # annulé pendant l'attente
+            travail.etat = EN_COURS
+            travail.signaler(EN_COURS)
+            try:
+                resultat = await boucle.run_in_executor(
+                    self._pools[voie], executer_travail,
+                    travail.id, travail.type, travail.demande, self._progression,
+                )
+            except Exception as e:
+                travail.terminer(ANNULE if travail.annulation_demandee else ERREUR, erreur=e)
+            else:
+                travail.terminer(ANNULE if travail.annulation_demandee else TERMINE, resultat)
+
+    async def _relayer_progression(self):
+        """Messages des processus de calcul → flux d'évènements du travail concerné."""
+        while True:
+            try:
+                message = self._progression.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(INTERVALLE_PROGRESSION)
+                continue
+            travail = self.travaux.get(message["id"])
+            if travail is not None and travail.etat == EN_COURS:
+                travail.signaler(message["etape"])
+
+
+async def _demonstration():
+    """Un rendu lourd et des KPI soumis en même temps : les KPI répondent sans attendre le rendu."""
+    file = FileTravaux()
+    await file.demarrer()
+    debut = time.perf_counter()
+
+    async def suivre(travail):
+        async for evenement in travail.progression():
+            print(f"[{time.perf_counter() - debut:6.2f} s] #{travail.id} {travail.type:<6} {evenement['etape']}")
+
+    travaux = [
+        file.soumettre("rendu", {"format": ["pdf"]}),
+        file.soumettre("rendu", {"temps_minimal": 0.25, "format": ["pdf"]}),
+        file.soumettre("kpi"),
+        file.soumettre("kpi", {"parc": {"BGC": 24}}),
+        file.soumettre("pphpd", {"axe": "vallee-du-rhone"}),
+    ]
+    file.annuler(travaux[1].id)
+    await asyncio.gather(*(suivre(t) for t in travaux))
+    kpi = await travaux[3].resultat()
+    print(f"KPI (BGC=24) : {kpi['rames_utilisees']}")
+    await file.arreter()
+
+
+if __name__ == "__main__":
+    asyncio.run(_demonstration())
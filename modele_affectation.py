@@ -0,0 +1,82 @@
+# modele_affectation.py
+# Modèle typé des affectations : les lignes sont accumulées en colonnes (pas un dict par marche)
+# et le DataFrame final est compact — gares, axes, matériels et numéros de marche en catégories,
+# rames en int32, type de marche en int8 (TypeMarche) au lieu de colonnes object.
+import enum
+
+
+class TypeMarche(enum.IntEnum):
+    COMMERCIALE = 0   # marche du service horaire (numérotée), voyageurs ou vide selon vide_voyageur
+    EVM = 1           # navette de mise en place du matin (faisceau → gare)
+    EVO = 2           # retour du faisceau avant une marche (évolution)
+    EVI = 3           # départ vers le faisceau après une marche (évolution)
+    EVS = 4           # navette du soir (gare → faisceau de remisage)
+    MAINT = 5         # créneau de maintenance
+
+
+# Types sans voyageurs ajoutés par l'affectation (affichés « HLP »)
+TYPES_HLP = (TypeMarche.EVM, TypeMarche.EVO, TypeMarche.EVI, TypeMarche.EVS)
+
+# Types des colonnes d'un DataFrame d'affectations (colonnes présentes seulement).
+# Les heures restent en float64 : les trous de maintenance et le rendu les comparent
+# à l'égalité près, un float32 décalerait des marches de quelques secondes.
+DTYPES_AFFECTATION = {
+    "rame": "int32",
+    "marche": "category",
+    "um": "int8",
+    "um_tete": "int32",
+    "type_marche": "int8",
+    "gare_depart": "category",
+    "depart": "float64",
+    "gare_arrivee": "category",
+    "arrivee": "float64",
+    "vide_voyageur": "bool",
+    "axe": "category",
+    "distance_km": "float32",
+    "materiel": "category",
+}
+
+
+def compacter(df):
+    """Applique DTYPES_AFFECTATION (après un concat, les catégories sont réunifiées)."""
+    return df.astype({col: t for col, t in DTYPES_AFFECTATION.items() if col in df.columns})
+
+
+class ColonnesAffectation:
+    """Affectations accumulées en colonnes : une ligne = un indice dans chaque liste."""
+
+    __slots__ = ("rame", "marche", "type_marche", "gare_depart", "depart", "gare_arrivee", "arrivee",
+                 "vide_voyageur", "um", "um_tete")
+
+    def __init__(self):
+        for nom in self.__slots__:
+            setattr(self, nom, [])
+
+    def __len__(self):
+        return len(self.rame)
+
+    def ajouter(self, rame, marche, gare_depart, depart, gare_arrivee, arrivee,
+                type_marche=TypeMarche.COMMERCIALE, vide_voyageur=None, um=1, um_tete=None):
+        """
+        vide_voyageur par défaut : tout type autre qu'une marche commerciale.
+        um : nb de rames couplées sur la marche, um_tete : rame de tête (par défaut la rame elle-même).
+        """
+        self.rame.append(rame)
+        self.marche.append(marche)
+        self.type_marche.append(int(type_marche))
+        self.gare_depart.append(gare_depart)
+        self.depart.append(depart)
+        self.gare_arrivee.append(gare_arrivee)
+        self.arrivee.append(arrivee)
+        self.vide_voyageur.append(
+            type_marche != TypeMarche.COMMERCIALE if vide_voyageur is None else bool(vide_voyageur)
+        )
+        self.um.append(um)
+        self.um_tete.append(rame if um_tete is None else um_tete)
+
+    def vers_dataframe(self, **constantes):
+        """DataFrame compact ; constantes : colonnes de valeur unique (axe=..., materiel=...)."""
+        import pandas as pd
+
+        df = pd.DataFrame({nom: getattr(self, nom) for nom in self.__slots__})
+        return compacter(df.assign(**constantes))
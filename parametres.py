@@ -0,0 +1,138 @@
+# parametres.py
+# Paramètres métier, parc et référentiels partagés par l'affectation et le rendu.
+# Bibliothèque standard uniquement et aucune lecture de fichier à l'import :
+# les référentiels (km_marches.json, gestion_maintenance.json) sont lus à la demande.
+import json
+import os
+
+
+# ------------------ Paramètres généraux ------------------
+DOSSIER_JSON = "marches_json"
+KM_MARCHES_FILE = "km_marches.json"
+MAINTENANCE_FILE = "gestion_maintenance.json"
+PARC_RAMES_FILE = "parc_rames.json"
+LIGNES_FILE = "lignes.json"
+
+# Paramètres métiers
+m_st_chrls = "MSC"
+navette_time = 0.083
+tampon = 0.333
+tampon_15m = 0.25
+temps_minimal = 0.21
+seuil_atelier = 1.25
+
+# Paramètres métier modifiables (service « et si ? ») : le moteur et le rendu les lisent
+# à l'appel (parametres.temps_minimal...), jamais importés par valeur
+PARAMETRES_METIER = ["temps_minimal", "seuil_atelier", "tampon", "tampon_15m", "navette_time"]
+
+
+def valeurs_parametres():
+    """{nom: valeur} des paramètres métier courants."""
+    return {nom: globals()[nom] for nom in PARAMETRES_METIER}
+
+# Parc de rames
+parc = {
+    "R2N":    {"modele": "Regio2n",   "numero": 22201, "quantite": 10,  "utilise": 0, "places": 505},
+    "BGC":    {"modele": "BGC",       "numero": 81501, "quantite": 22,  "utilise": 0, "places": 200},
+    "REG":    {"modele": "Regiolis",  "numero": 84501, "quantite": 15,  "utilise": 0, "places": 220},
+    "2NPG":   {"modele": "2NPG",      "numero": 23501, "quantite": 30,  "utilise": 0, "places": 210},
+}
+
+# Gare où les rames sont affectés en dépôt
+DEPOT_AFFECTATION = {
+    "R2N": "AVG",
+    "BGC": "AVG",
+    "REG": "MBC",
+    "2NPG": "MBC",
+}
+
+# Gare voyageurs → faisceau de remisage (navettes EVS / EVI / EVO)
+GARE_REMISAGE = {
+    "MSC": "MBC",
+    "AVV": "AVG",
+    "AVI": "AVG",
+    "LPR": "LYG",
+    "LYD": "LYG",
+    "MAS": "MAG",
+    "HYE": "HYG",
+    "TLN": "TLG",
+    "LAC": "LAG",
+    "AXP": "AXG",
+    "GAP": "GAG",
+    "SIS": "SIG",
+    "BRI": "BRG",
+}
+
+
+# Code matériel → modèle de parc_rames.json (modes de traction). Les numéros de première rame
+# ne suffisent pas à rattacher un modèle : 22201 y est à la fois la Corail et le Regio2n.
+# Modèle absent du fichier : aucune restriction de traction (signalé au chargement).
+MODELE_PARC_RAMES = {
+    "R2N": "Regio2n",
+    "BGC": "BGC",
+    "REG": "Regiolis",
+    "2NPG": "TER_2NPG",
+}
+
+# Matériels à engager par fichier de marches, par ordre de préférence
+# (None : fichiers non listés). Seuls les matériels compatibles avec la ligne sont retenus.
+PREFERENCES_MATERIEL = {
+    "marches_intervilles-marseille-lyon.json": ["R2N"],
+    "marches_marseille-toulon-hyeres-les-arcs-draguignan.json": ["2NPG"],
+    "marches_marseille-avignon.json": ["2NPG"],
+    "marches_vallee-du-rhone.json": ["R2N"],
+    "marches_marseille-miramas-via-cote-bleue.json": ["REG"],
+    None: ["BGC", "REG"],
+}
+
+# Préférences épuisées : engager tout autre matériel compatible (mutualisation entre tractions)
+# plutôt que d'échouer
+MUTUALISATION_MATERIEL = False
+
+# Fichier de marches → nom de la ligne dans lignes.json (électrification)
+LIGNE_PAR_FICHIER = {
+    "marches_intervilles-marseille-lyon.json": "marseille_lyon",
+    "marches_marseille-avignon-via-rognac.json": "marseille_rognac_avignon",
+    "marches_avignon-tgv-capentras.json": "avignonTGV_Capentras",
+    "marches_marseille-avignon.json": "marseille_avignon",
+    "marches_marseille-miramas-via-cote-bleue.json": "marseille_martigues_avignon",
+    "marches_marseille-aix-en-provence.json": "marseille_aix",
+    "marches_marseille-aubagne.json": "marseille_aubagne",
+    "marches_marseille-toulon-hyeres-les-arcs-draguignan.json": "marseille_arcs",
+    "marches_vallee-du-rhone.json": "vallée_du_rhone",
+    "marches_marseille-briancon.json": "marches_marseille-briancon.json",
+}
+
+# ------------------ Chargement distances ------------------
+km_dict = {}
+_km_charge = False
+
+
+def charger_km(chemin=KM_MARCHES_FILE):
+    """(Re)charge km_marches.json dans km_dict (sur place : les références restent valides)."""
+    global _km_charge
+    _km_charge = True
+    km_dict.clear()
+    if not os.path.exists(chemin):
+        print(f"⚠️ {chemin} introuvable — les distances seront à 0.")
+        return
+    with open(chemin, "r", encoding="utf-8") as f:
+        try:
+            km_data = json.load(f)
+            for d in km_data:
+                km_dict[(d["origine"], d["destination"])] = d["distance"]
+                km_dict[(d["destination"], d["origine"])] = d["distance"]
+        except Exception as e:
+            print(f"⚠️ Erreur lecture {chemin}: {e}")
+
+
+def distances():
+    """km_dict, lu au premier besoin (l'import de ce module ne lit aucun fichier)."""
+    if not _km_charge:
+        charger_km()
+    return km_dict
+
+
+def charger_maintenances(chemin=MAINTENANCE_FILE):
+    with open(chemin, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,1274 @@
+# rendu_pdf.py
+# Rendu ReportLab : PDF de roulements par matériel et PDF PPHPD global.
+# Importé seulement quand un PDF est demandé (voir affectation_pdf.render_documents).
+import itertools
+import os
+import re
+import tempfile
+import numpy as np
+from collections import defaultdict, deque
+from modele_affectation import TYPES_HLP
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.widgets.markers import makeMarker
+import parametres
+from parametres import parc, DEPOT_AFFECTATION, distances
+
+# Rendu en flux : les rames sont préparées et dessinées page par page, et les pages écrites
+# par morceaux de PAGES_PAR_MORCEAU dans des PDF intermédiaires réunis à la fin (fusionner_pdf) :
+# mémoire de rendu constante, quelle que soit la taille du parc. Désactivé par défaut : un seul
+# canevas est plus rapide pour les parcs courants (≈ 12 Mo contre 86 Mo, mais 12 s contre 9 s à 6000 rames)
+RENDU_STREAMING = False
+PAGES_PAR_MORCEAU = 20
+
+# Chaînage des roulements : "gare" (couplage par gare de fin / début de journée)
+# ou "km" (affectation minimisant les km de repositionnement, nécessite scipy)
+MODE_CHAINAGE = "gare"
+SEUIL_CHAINAGE_DENSE = 300   # nb de rames au-delà duquel on résout un transport entre gares
+KM_LIEN_INCONNU = 1000       # coût d'un lien sans chemin dans le graphe de km_marches.json
+PENALITE_BOUCLE = 0.5        # départage : préférer un vrai cycle à une ligne qui boucle sur elle-même
+
+
+# ------------------ Layout PDF ------------------
+PAGE_WIDTH, PAGE_HEIGHT = A4  # portrait
+
+LEFT_MARGIN = 15 * mm
+RIGHT_MARGIN = 15 * mm
+TOP_MARGIN = 12 * mm
+BOTTOM_MARGIN = 12 * mm
+
+MAX_RAMES_PER_PAGE = 12
+ESPACEMENT_RAME = 10  # espace vertical entre cadres
+
+HAUTEUR_DISPO = PAGE_HEIGHT - TOP_MARGIN - BOTTOM_MARGIN
+RAME_HEIGHT = (HAUTEUR_DISPO - (MAX_RAMES_PER_PAGE - 1) * ESPACEMENT_RAME) / MAX_RAMES_PER_PAGE
+
+HEURE_MIN = 0
+HEURE_MAX = 24
+ECHELLE_HEURE = (PAGE_WIDTH - LEFT_MARGIN - RIGHT_MARGIN) / (HEURE_MAX - HEURE_MIN)
+
+# Fenêtre de référence pour la performance (en heure décimale)
+WINDOW_START = 5.5   # 5h30
+WINDOW_END   = 22.5  # 22h30
+WINDOW_DURATION = WINDOW_END - WINDOW_START  # 17h
+
+# Décalage horizontal (en points) pour la première / dernière gare
+FIRST_LABEL_OFFSET = 15
+LAST_LABEL_OFFSET = 15
+
+
+def x_from_time(horaire):
+    """Convertit une heure décimale en coordonnée X du PDF."""
+    return LEFT_MARGIN + (horaire - HEURE_MIN) * ECHELLE_HEURE
+
+
+def draw_train_bar(c, x1, x2, y, height=5, color=colors.black):
+    """Barre horizontale pour une marche (voyageurs ou HLP)."""
+    c.setFillColor(color)
+    c.rect(x1, y - height / 2, x2 - x1, height, stroke=0, fill=1)
+
+
+def format_time_hm(h):
+    """Retourne uniquement les minutes (MM) pour une heure décimale."""
+    try:
+        h = float(h)
+        h_int = int(h)
+        m = int(round((h - h_int) * 60))
+        if m == 60:
+            m = 0
+        return f"{m:02d}"
+    except Exception:
+        return str(h)
+
+
+def draw_station_label(c, x, y_base, gare, heure, align="left"):
+    """Affiche gare + heure sur deux lignes."""
+    c.setFont("Helvetica", 5)
+    if align == "left":
+        c.drawString(x, y_base, gare)
+        c.drawString(x, y_base - 5, heure)
+    elif align == "right":
+        c.drawRightString(x, y_base, gare)
+        c.drawRightString(x, y_base - 5, heure)
+    else:
+        c.drawCentredString(x, y_base, gare)
+        c.drawCentredString(x, y_base - 5, heure)
+
+
+def draw_time_only(c, x, y_base, heure, align="center"):
+    """Affiche uniquement l'heure sur une ligne."""
+    c.setFont("Helvetica", 5)
+    if align == "left":
+        c.drawString(x, y_base, heure)
+    elif align == "right":
+        c.drawRightString(x, y_base, heure)
+    else:
+        c.drawCentredString(x, y_base, heure)
+
+
+def format_minutes_array(heures):
+    """Version vectorisée de format_time_hm : minutes (MM) de chaque heure décimale."""
+    heures = np.asarray(heures, dtype=float)
+    minutes = np.round((heures - np.trunc(heures)) * 60).astype(int)
+    minutes[minutes == 60] = 0
+    return [f"{m:02d}" for m in minutes.tolist()]
+
+
+# ------------------ Préparation du rendu ------------------
+def marquer_unites_multiples(df_assign_mat):
+    """
+    Ajoute les colonnes _um_size (nb de rames sur la marche) et _um_lead (rame de tête) :
+    reprises des colonnes um / um_tete posées par l'affectation, sinon déduites des marches
+    répétées (première rame rencontrée = tête).
+    """
+    if "um" in df_assign_mat.columns:
+        return df_assign_mat.assign(_um_size=df_assign_mat["um"], _um_lead=df_assign_mat["um_tete"])
+    um_groups = df_assign_mat.groupby("marche", observed=True)["rame"]
+    return df_assign_mat.assign(
+        _um_size=um_groups.transform("size"),
+        _um_lead=um_groups.transform("first"),
+    )
+
+
+def prepare_rame_layouts(df_assign_mat, rame_list, gare_dortoir=None):
+    """
+    Prépare en une passe (tri + groupby uniques) toutes les données de rendu par rame :
+    libellés, coordonnées des barres, UM, écarts courts, km et performance.
+    La boucle de dessin n'a plus qu'à appeler le canvas.
+
+    Les rames de rame_list sans aucune ligne sont des rames inutilisées, garées à gare_dortoir.
+    Si df_assign_mat est une tranche du matériel, les UM doivent avoir été marquées
+    sur le matériel complet (marquer_unites_multiples).
+
+    Retourne {rame: layout} ; layout["gare_dortoir"] est renseigné pour une rame inutilisée.
+    """
+    d = df_assign_mat
+    if "_um_size" not in d.columns:
+        d = marquer_unites_multiples(d)
+    d = d.sort_values("depart", kind="stable").sort_values("rame", kind="stable")
+
+    # Km par rame (marches voyageurs)
+    voy = ~d["vide_voyageur"].astype(bool)
+    km_par_rame = d[voy].groupby("rame")["distance_km"].sum().to_dict()
+
+    # Performance : temps en marche voyageurs dans la fenêtre de référence
+    duree_fenetre = (
+        d["arrivee"].clip(lower=WINDOW_START, upper=WINDOW_END)
+        - d["depart"].clip(lower=WINDOW_START, upper=WINDOW_END)
+    ).clip(lower=0)
+    perf_par_rame = (
+        duree_fenetre[voy].groupby(d.loc[voy, "rame"]).sum() / WINDOW_DURATION * 100.0
+    ).to_dict()
+
+    # Axes parcourus (ordre d'apparition dans la journée)
+    axes_par_rame = (
+        d[["rame", "axe"]].dropna().drop_duplicates()
+        .groupby("rame")["axe"].agg(" / ".join).to_dict()
+    )
+
+    rames_utilisees = set(d["rame"].unique())
+
+    # Marches visibles dans la plage horaire affichée
+    m = d
+    x1 = x_from_time(m["depart"].to_numpy(dtype=float))
+    x2 = x_from_time(m["arrivee"].to_numpy(dtype=float))
+    visible = (x2 >= LEFT_MARGIN) & (x1 <= PAGE_WIDTH - RIGHT_MARGIN)
+    m = m[visible]
+    x1 = np.maximum(x1[visible], LEFT_MARGIN + 2)
+    x2 = np.minimum(x2[visible], PAGE_WIDTH - RIGHT_MARGIN - 2)
+
+    rames = m["rame"].to_numpy()
+    depart = m["depart"].to_numpy(dtype=float)
+    arrivee = m["arrivee"].to_numpy(dtype=float)
+    hlp = m["vide_voyageur"].astype(bool).to_numpy()
+    gare_dep = m["gare_depart"].astype(str).to_numpy()
+    gare_arr = m["gare_arrivee"].astype(str).to_numpy()
+
+    # Position dans la journée de la rame
+    debut_rame = np.ones(len(m), dtype=bool)
+    debut_rame[1:] = rames[1:] != rames[:-1]
+
+    # UM
+    um_size = m["_um_size"].to_numpy()
+    um_lead = m["_um_lead"].to_numpy()
+    um = np.where(um_size >= 2, np.where(um_lead == rames, 1, 2), 0)
+
+    # Gare de départ identique à l'arrivée précédente → libellé centré
+    gare_arr_prev = np.empty_like(gare_arr)
+    gare_arr_prev[1:] = gare_arr[:-1]
+    meme_gare = ~debut_rame & (gare_dep == gare_arr_prev)
+
+    x_label_dep = x1 + 1 - np.where(debut_rame, FIRST_LABEL_OFFSET, 0)
+
+    # Numéro de marche (HLP pour les évolutions / navettes)
+    marche_text = np.where(
+        np.isin(m["type_marche"].to_numpy(), TYPES_HLP), "HLP", m["marche"].astype(str).to_numpy()
+    ).tolist()
+    dy_num = np.where(hlp, 12, 7)
+
+    # Écarts de moins de 20 min avec la marche précédente
+    arrivee_prev = np.empty_like(arrivee)
+    arrivee_prev[0:1] = np.nan
+    arrivee_prev[1:] = arrivee[:-1]
+    ecart = depart - arrivee_prev
+    ecart_court = ~debut_rame & (ecart < 0.333)
+    ecart_txt = np.round(np.where(ecart_court, ecart, 0) * 60).astype(int).astype(str)
+    ecart_min = np.where(ecart_court, ecart_txt, None)
+    x_ecart = x_from_time((depart + arrivee_prev) / 2)
+
+    colonnes = {
+        "x1": x1.tolist(),
+        "x2": x2.tolist(),
+        "hlp": hlp.tolist(),
+        "um": um.tolist(),
+        "gare_dep": gare_dep.tolist(),
+        "gare_arr": gare_arr.tolist(),
+        "heure_dep": format_minutes_array(depart),
+        "heure_arr": format_minutes_array(arrivee),
+        "meme_gare": meme_gare.tolist(),
+        "x_label_dep": x_label_dep.tolist(),
+        "marche_text": marche_text,
+        "dy_num": dy_num.tolist(),
+        "ecart_min": ecart_min.tolist(),
+        "x_ecart": x_ecart.tolist(),
+    }
+
+    # Découpage par rame (les lignes sont déjà contiguës par rame)
+    bornes = np.flatnonzero(debut_rame).tolist() + [len(m)]
+    tranches = {rames[a]: (a, b) for a, b in zip(bornes[:-1], bornes[1:])}
+
+    layouts = {}
+    for rame in rame_list:
+        a, b = tranches.get(rame, (0, 0))
+        lay = {key: col[a:b] for key, col in colonnes.items()}
+        if rame not in rames_utilisees:
+            lay.update(axe="Non utilisée", perf=0.0, km=0, gare_dortoir=gare_dortoir)
+            layouts[rame] = lay
+            continue
+        lay["axe"] = axes_par_rame.get(rame) or "axe inconnu"
+        perf = perf_par_rame.get(rame)
+        lay["perf"] = None if perf is None else float(perf)
+        km = km_par_rame.get(rame)
+        lay["km"] = None if km is None else int(km)
+        lay["gare_dortoir"] = None
+        layouts[rame] = lay
+
+    return layouts
+
+
+FORM_CADRE_RAME = "cadre_rame"
+FORM_GRILLE_RAME = "grille_rame"
+
+
+def define_rame_forms(c):
+    """
+    Déclare les gabarits (form XObjects) du fond d'un cadre de rame, dessinés une seule
+    fois par document puis réutilisés via doForm (origine = bas du cadre) :
+      - FORM_CADRE_RAME : cadre seul (rame inutilisée)
+      - FORM_GRILLE_RAME : cadre + traits horaires et libellés "{h}h"
+    """
+    largeur = PAGE_WIDTH - LEFT_MARGIN - RIGHT_MARGIN
+
+    for nom, avec_grille in ((FORM_CADRE_RAME, False), (FORM_GRILLE_RAME, True)):
+        c.beginForm(nom, lowerx=0, lowery=-2, upperx=PAGE_WIDTH, uppery=RAME_HEIGHT + 2)
+
+        # Cadre
+        c.setStrokeColor(colors.HexColor("#3A7ECB"))
+        c.rect(LEFT_MARGIN, 0, largeur, RAME_HEIGHT)
+
+        # Traits horaires
+        if avec_grille:
+            c.setFont("Helvetica", 4)
+            c.setLineWidth(.8)
+            c.setStrokeColor(colors.lightgrey)
+            c.setFillColor(colors.black)
+            c.setDash(1, 2)
+            for h in range(HEURE_MIN, HEURE_MAX + 1):
+                xh = x_from_time(h)
+                c.line(xh, 0, xh, RAME_HEIGHT)
+                c.drawString(xh - 5, RAME_HEIGHT - 6, f"{h}h")
+
+        c.endForm()
+
+
+# ------------------ Page paramètres ------------------
+def draw_params_page(c, materiel_code, titre_suffix, flux_par_axe, bilan_chainage=None):
+    """Ajoute une page récap avec les paramètres de l'algo d'attribution + flux pour ce matériel."""
+    c.showPage()
+
+    # Titre de la page
+    titre = f"Paramètres de l'attribution – {titre_suffix}"
+    c.setFont("Helvetica-Bold", 14)
+    c.setFillColor(colors.black)
+    c.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - 40, titre)
+
+    y = PAGE_HEIGHT - 70
+    line_height = 12
+
+    # --- Paramètres généraux ---
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(LEFT_MARGIN, y, "Paramètres généraux :")
+    y -= line_height
+
+    c.setFont("Helvetica", 9)
+    temps_minimal, seuil_atelier = parametres.temps_minimal, parametres.seuil_atelier
+    tampon, tampon_15m, navette_time = parametres.tampon, parametres.tampon_15m, parametres.navette_time
+    c.drawString(LEFT_MARGIN, y, f"• Temps minimal entre deux marches : {temps_minimal:.3f} h (~{int(temps_minimal*60)} min)")
+    y -= line_height
+    c.drawString(LEFT_MARGIN, y, f"• Seuil atelier (évolution) : {seuil_atelier:.3f} h (~{int(seuil_atelier*60)} min)")
+    y -= line_height
+    c.drawString(LEFT_MARGIN, y, f"• Tampon général : {tampon:.3f} h (~{int(tampon*60)} min)")
+    y -= line_height
+    c.drawString(LEFT_MARGIN, y, f"• Tampon 15 min : {tampon_15m:.3f} h (~{int(tampon_15m*60)} min)")
+    y -= line_height
+    c.drawString(LEFT_MARGIN, y, f"• Durée navette (HLP dépôt↔gare) : {navette_time:.3f} h (~{int(navette_time*60)} min)")
+    y -= line_height
+
+    # --- Paramètres d'affichage ---
+    y -= line_height // 2
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(LEFT_MARGIN, y, "Paramètres d'affichage :")
+    y -= line_height
+
+    c.setFont("Helvetica", 9)
+    c.drawString(LEFT_MARGIN, y, f"• Plage horaire affichée : {HEURE_MIN}h → {HEURE_MAX}h")
+    y -= line_height
+    c.drawString(LEFT_MARGIN, y, f"• Offset premier label gare : {FIRST_LABEL_OFFSET} pts")
+    y -= line_height
+    c.drawString(LEFT_MARGIN, y, "• Affichage minutes uniquement pour les heures de départ / arrivée")
+    y -= line_height
+
+    # --- Indicateur de performance ---
+    y -= line_height // 2
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(LEFT_MARGIN, y, "Indicateur de performance :")
+    y -= line_height
+
+    c.setFont("Helvetica", 9)
+    c.drawString(
+        LEFT_MARGIN,
+        y,
+        f"• Fenêtre de référence : {WINDOW_START:.2f}h → {WINDOW_END:.2f}h (≈ 5h30–22h30)"
+    )
+    y -= line_height
+    c.drawString(
+        LEFT_MARGIN,
+        y,
+        f"• Durée de la fenêtre : {WINDOW_DURATION:.1f} h"
+    )
+    y -= line_height
+    c.drawString(
+        LEFT_MARGIN,
+        y,
+        "• Pour chaque rame : somme des durées en marche voyageurs dans cette fenêtre"
+    )
+    y -= line_height
+    c.drawString(
+        LEFT_MARGIN,
+        y,
+        "  divisée par la durée de la fenêtre, affichée en pourcentage (Perf : XX%)."
+    )
+    y -= line_height
+
+    # --- Chaînage des roulements (mode km) ---
+    if bilan_chainage is not None:
+        y -= line_height // 2
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(LEFT_MARGIN, y, "Chaînage des roulements :")
+        y -= line_height
+
+        c.setFont("Helvetica", 9)
+        c.drawString(
+            LEFT_MARGIN,
+            y,
+            f"• Affectation minimisant les km de repositionnement (solveur {bilan_chainage['solveur']})"
+        )
+        y -= line_height
+        c.drawString(
+            LEFT_MARGIN,
+            y,
+            f"• Repositionnement total : {bilan_chainage['km_total']:.0f} km"
+            f" ({bilan_chainage['nb_liens_inconnus']} lien(s) sans distance connue)"
+        )
+        y -= line_height
+
+    # --- Parc de rames ---
+    y -= line_height // 2
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(LEFT_MARGIN, y, "Parc de rames utilisé :")
+    y -= line_height
+
+    c.setFont("Helvetica", 9)
+    for code, info in parc.items():
+        txt_line = (f"• {code} – {info['modele']}: "
+                    f"{info['quantite']} rames (numéros {info['numero']} à {info['numero'] + info['quantite'] - 1}), "
+                    f"{info['places']} places par rame")
+        c.drawString(LEFT_MARGIN, y, txt_line)
+        y -= line_height
+        if y < BOTTOM_MARGIN + 80:
+            c.showPage()
+            y = PAGE_HEIGHT - TOP_MARGIN
+
+    # --- Équilibre des flux par axe (tableaux) POUR CE MATERIEL ---
+    y -= line_height // 2
+    if y < BOTTOM_MARGIN + 80:
+        c.showPage()
+        y = PAGE_HEIGHT - TOP_MARGIN
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(LEFT_MARGIN, y, "Équilibre des flux par axe (Arrivées - Départs)")
+    y -= line_height
+
+    col_gare_x = LEFT_MARGIN
+    col_dep_x = LEFT_MARGIN + 80
+    col_arr_x = LEFT_MARGIN + 150
+    col_diff_x = LEFT_MARGIN + 230
+    row_h = 12
+
+    for axe_label, info in flux_par_axe.items():
+        flux_df = info.get("flux")
+        fichier = info.get("fichier", "")
+        materiels = info.get("materiels", [])
+
+        # Ne montrer que les axes où ce matériel est engagé
+        if materiel_code not in materiels:
+            continue
+
+        if flux_df is None or flux_df.empty:
+            continue
+
+        if y < BOTTOM_MARGIN + 60:
+            c.showPage()
+            y = PAGE_HEIGHT - TOP_MARGIN
+            c.setFont("Helvetica-Bold", 10)
+            c.drawString(LEFT_MARGIN, y, "Équilibre des flux par axe (Arrivées - Départs)")
+            y -= line_height
+
+        # Titre de l'axe
+        c.setFont("Helvetica-Bold", 9)
+        titre_axe = f"{fichier} (axe : {axe_label})"
+        c.drawString(LEFT_MARGIN, y, titre_axe)
+        y -= row_h
+
+        # En-têtes du tableau
+        c.setFont("Helvetica-Bold", 8)
+        c.drawString(col_gare_x, y, "Gare")
+        c.drawString(col_dep_x,  y, "Départs")
+        c.drawString(col_arr_x,  y, "Arrivées")
+        c.drawString(col_diff_x, y, "Diff (Arr-Dep)")
+        y -= row_h
+
+        # Contenu du tableau
+        c.setFont("Helvetica", 8)
+        for _, row in flux_df.iterrows():
+            if y < BOTTOM_MARGIN + 40:
+                c.showPage()
+                y = PAGE_HEIGHT - TOP_MARGIN
+                c.setFont("Helvetica-Bold", 8)
+                c.drawString(col_gare_x, y, "Gare")
+                c.drawString(col_dep_x,  y, "Départs")
+                c.drawString(col_arr_x,  y, "Arrivées")
+                c.drawString(col_diff_x, y, "Diff (Arr-Dep)")
+                y -= row_h
+                c.setFont("Helvetica", 8)
+
+            # la gare est dans la première colonne après reset_index()
+            gare = str(row.iloc[0])
+
+            dep = int(row.get("Departs", 0))
+            arr = int(row.get("Arrivees", 0))
+            diff = int(row.get("Diff (Arr - Dep)", 0))
+
+            c.drawString(col_gare_x, y, gare)
+            c.drawRightString(col_dep_x + 30,  y, str(dep))
+            c.drawRightString(col_arr_x + 30,  y, str(arr))
+            c.drawRightString(col_diff_x + 40, y, str(diff))
+            y -= row_h
+
+        y -= row_h  # espace entre axes
+
+
+# ------------------ Chaînage des roulements ------------------
+def hopcroft_karp(adj):
+    """
+    Couplage maximum (Hopcroft–Karp, version itérative) entre lignes « hier » et lignes « demain ».
+
+    adj[u] (u = 1..n, adj[0] inutilisé) : liste des lignes compatibles avec u.
+    Les lignes d'une même gare partagent la même liste : chaque liste n'est parcourue
+    qu'une fois par phase de BFS. Une ligne ne s'enchaîne sur elle-même que si
+    elle est seule dans sa liste.
+
+    Retourne pair_u : pair_u[u] = ligne suivante de u (0 si non couplée).
+    """
+    n = len(adj) - 1
+    INF = float("inf")
+    pair_u = [0] * (n + 1)
+    pair_v = [0] * (n + 1)
+    dist = [INF] * (n + 1)
+
+    # Couplage glouton initial : un curseur par liste partagée
+    curseur = {}
+    attente = {}  # ligne sautée (boucle sur soi) restant disponible pour les autres
+    for u in range(1, n + 1):
+        lst = adj[u]
+        key = id(lst)
+        v = attente.get(key, 0)
+        if v and v != u:
+            del attente[key]
+        else:
+            v = 0
+            i = curseur.get(key, 0)
+            while i < len(lst):
+                w = lst[i]
+                i += 1
+                if w == u and len(lst) > 1:
+                    attente[key] = w
+                    continue
+                if pair_v[w] == 0:
+                    v = w
+                    break
+            curseur[key] = i
+        if v:
+            pair_u[u] = v
+            pair_v[v] = u
+
+    while True:
+        # --- BFS : couches à partir des lignes libres ---
+        queue = deque()
+        for u in range(1, n + 1):
+            if pair_u[u] == 0:
+                dist[u] = 0
+                queue.append(u)
+            else:
+                dist[u] = INF
+        dist_libre = INF
+        curseur = {}
+        attente = {}
+
+        while queue:
+            u = queue.popleft()
+            if dist[u] >= dist_libre:
+                continue
+            lst = adj[u]
+            key = id(lst)
+            a_visiter = []
+            v = attente.get(key, 0)
+            if v and v != u:
+                del attente[key]
+                a_visiter.append(v)
+            i = curseur.get(key, 0)
+            while i < len(lst):
+                v = lst[i]
+                i += 1
+                if v == u and len(lst) > 1:
+                    attente[key] = v
+                    continue
+                a_visiter.append(v)
+            curseur[key] = i
+
+            for v in a_visiter:
+                w = pair_v[v]
+                if w == 0:
+                    if dist_libre == INF:
+                        dist_libre = dist[u] + 1
+                elif dist[w] == INF:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+
+        if dist_libre == INF:
+            return pair_u
+
+        # --- DFS itératif : chemins augmentants de longueur minimale ---
+        it = [0] * (n + 1)
+        choix = [0] * (n + 1)
+        for racine in range(1, n + 1):
+            if pair_u[racine] != 0:
+                continue
+            pile = [racine]
+            while pile:
+                u = pile[-1]
+                lst = adj[u]
+                i = it[u]
+                suivant = 0
+                trouve = False
+                while i < len(lst):
+                    v = lst[i]
+                    i += 1
+                    if v == u and len(lst) > 1:
+                        continue
+                    w = pair_v[v]
+                    if w == 0:
+                        if dist[u] + 1 == dist_libre:
+                            choix[u] = v
+                            trouve = True
+                            break
+                    elif dist[w] == dist[u] + 1:
+                        choix[u] = v
+                        suivant = w
+                        break
+                it[u] = i
+
+                if trouve:
+                    for x in pile:
+                        pair_u[x] = choix[x]
+                        pair_v[choix[x]] = x
+                    break
+                if suivant:
+                    pile.append(suivant)
+                else:
+                    dist[u] = INF
+                    pile.pop()
+
+
+def chainer_roulements(rame_list, start_station, end_station):
+    """
+    Enchaîne chaque ligne de roulement sur une ligne qui démarre
+    à la gare où elle termine sa journée.
+    Retourne (next_line, prev_line), lignes numérotées à partir de 1.
+    """
+    nb_rames = len(rame_list)
+
+    # Lignes regroupées par gare de début de journée
+    lignes_par_gare = defaultdict(list)
+    for j, rame in enumerate(rame_list):
+        lignes_par_gare[start_station.get(rame)].append(j + 1)
+
+    # Compatibilités roulées : toutes les lignes démarrant à la gare de fin
+    adj = [[]]
+    for i, rame in enumerate(rame_list):
+        end_i = end_station.get(rame)
+        groupe = lignes_par_gare.get(end_i) if end_i is not None else None
+        adj.append(groupe if groupe else [i + 1])
+
+    pair_u = hopcroft_karp(adj)
+
+    next_line = {i: pair_u[i] for i in range(1, nb_rames + 1) if pair_u[i]}
+    for i in range(1, nb_rames + 1):
+        if i not in next_line:
+            next_line[i] = (i % nb_rames) + 1
+
+    prev_line = {i: i for i in range(1, nb_rames + 1)}
+    for i, j in next_line.items():
+        prev_line[j] = i
+
+    return next_line, prev_line
+
+
+def _transport_gares(cout_gares, fin_idx, debut_idx):
+    """
+    Affectation ligne → ligne suivante quand le coût ne dépend que des gares (fin, début) :
+    problème de transport entre gares (quelques centaines de variables, solution entière),
+    puis répartition des lignes dans chaque couple de gares en évitant les boucles sur soi.
+    Retourne (lignes, suivantes) comme linear_sum_assignment.
+    """
+    from scipy.optimize import linprog
+
+    nb_gares = len(cout_gares)
+    offre = np.bincount(fin_idx, minlength=nb_gares)
+    demande = np.bincount(debut_idx, minlength=nb_gares)
+    sources, puits = np.flatnonzero(offre), np.flatnonzero(demande)
+
+    # x[s, p] = nb de lignes finissant à sources[s] enchaînées sur une ligne démarrant à puits[p]
+    contraintes = np.vstack([
+        np.kron(np.eye(len(sources)), np.ones(len(puits))),
+        np.kron(np.ones(len(sources)), np.eye(len(puits))),
+    ])
+    res = linprog(
+        cout_gares[np.ix_(sources, puits)].ravel(),
+        A_eq=contraintes, b_eq=np.concatenate([offre[sources], demande[puits]]),
+        bounds=(0, None), method="highs",
+    )
+    flux = np.rint(res.x).astype(int).reshape(len(sources), len(puits))
+
+    suivantes = np.empty(len(fin_idx), dtype=int)
+    restantes = {b: list(np.flatnonzero(debut_idx == b)) for b in puits}
+    deja = defaultdict(list)   # gare de début → lignes déjà enchaînées vers cette gare
+    for s_, a in enumerate(sources):
+        destinations = np.repeat(puits, flux[s_])
+        for i, b in zip(np.flatnonzero(fin_idx == a).tolist(), destinations.tolist()):
+            candidates = restantes[b]
+            if candidates[-1] == i and len(candidates) > 1:
+                candidates[-1], candidates[-2] = candidates[-2], candidates[-1]
+            j = candidates.pop()
+            if j == i and deja[b]:
+                # Seule ligne restante = elle-même : échange avec un lien déjà posé vers la même gare
+                k = deja[b][-1]
+                suivantes[i], suivantes[k] = suivantes[k], i
+            else:
+                suivantes[i] = j
+            deja[b].append(i)
+
+    return np.arange(len(fin_idx)), suivantes
+
+
+def chainer_roulements_km(rame_list, start_station, end_station):
+    """
+    Enchaîne les lignes de roulement en minimisant le total des km de repositionnement
+    entre la gare de fin de journée d'une ligne et la gare de début de la suivante
+    (affectation linéaire sur les plus courts chemins du graphe de km_marches.json,
+    qui ne donne que les tronçons de ligne).
+
+    Solveur dense (Hongrois) jusqu'à SEUIL_CHAINAGE_DENSE rames ; au-delà, transport entre
+    gares sur les mêmes coûts (même optimum en km, voir _transport_gares). Un lien sans
+    chemin (gare hors du graphe ou réseau non connexe) coûte KM_LIEN_INCONNU.
+
+    Retourne (next_line, prev_line, bilan) avec
+    bilan = {"km_total", "nb_liens_inconnus", "solveur"}.
+    """
+    from scipy.optimize import linear_sum_assignment
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import shortest_path
+
+    nb_rames = len(rame_list)
+    fins = [end_station.get(rame) for rame in rame_list]
+    debuts = [start_station.get(rame) for rame in rame_list]
+
+    # Matrice des coûts entre gares (petite : quelques dizaines de gares) :
+    # plus courts chemins sur le graphe des tronçons de km_marches.json
+    km_dict = distances()
+    gares = sorted({g for troncon in km_dict for g in troncon} | {g for g in fins + debuts if g is not None})
+    idx = {g: k for k, g in enumerate(gares)}
+    inconnue = len(gares)  # gare absente : tous ses liens sont inconnus
+    if km_dict:
+        troncons = [(idx[a], idx[b], km) for (a, b), km in km_dict.items()]
+        a, b, km = (np.array(v) for v in zip(*troncons))
+        # +epsilon : un tronçon de 0 km reste une arête du graphe creux
+        graphe_km = coo_matrix((km + 1e-9, (a, b)), shape=(len(gares), len(gares))).tocsr()
+        chemins = shortest_path(graphe_km, directed=False)
+    else:
+        chemins = np.full((len(gares), len(gares)), np.inf)
+    np.fill_diagonal(chemins, 0.0)
+    cout_gares = np.full((len(gares) + 1, len(gares) + 1), float(KM_LIEN_INCONNU))
+    cout_gares[:-1, :-1] = np.where(np.isfinite(chemins), np.round(chemins, 6), KM_LIEN_INCONNU)
+
+    fin_idx = np.array([idx.get(g, inconnue) for g in fins])
+    debut_idx = np.array([idx.get(g, inconnue) for g in debuts])
+
+    if nb_rames <= SEUIL_CHAINAGE_DENSE:
+        solveur = "dense"
+        cout = cout_gares[fin_idx][:, debut_idx]
+        cout[np.diag_indices(nb_rames)] += PENALITE_BOUCLE
+        lignes, suivantes = linear_sum_assignment(cout)
+    else:
+        solveur = "transport"
+        lignes, suivantes = _transport_gares(cout_gares, fin_idx, debut_idx)
+
+    liens = cout_gares[fin_idx[lignes], debut_idx[suivantes]]
+    inconnus = liens >= KM_LIEN_INCONNU
+    bilan = {
+        "km_total": float(liens[~inconnus].sum()),
+        "nb_liens_inconnus": int(inconnus.sum()),
+        "solveur": solveur,
+    }
+
+    next_line = {int(i) + 1: int(j) + 1 for i, j in zip(lignes, suivantes)}
+    prev_line = {j: i for i, j in next_line.items()}
+
+    return next_line, prev_line, bilan
+
+
+def iter_pages_rames(df_assign_mat, rame_list, gare_dortoir, taille_page=MAX_RAMES_PER_PAGE):
+    """
+    Générateur (rendu en flux) : pour chaque page, (rames de la page, layouts de ces rames).
+    Seules les lignes des rames de la page sont extraites et préparées à chaque étape
+    (positions par rame, sans trier ni copier le DataFrame du matériel).
+    """
+    d = df_assign_mat
+    if "um" not in d.columns:
+        d = marquer_unites_multiples(d)   # UM déduites des marches répétées : sur tout le matériel
+    positions = d.groupby("rame", sort=False).indices
+    vide = np.empty(0, dtype=np.intp)
+
+    for k in range(0, len(rame_list), taille_page):
+        page = rame_list[k:k + taille_page]
+        lignes = np.sort(np.concatenate([positions.get(rame, vide) for rame in page]))
+        yield page, prepare_rame_layouts(d.iloc[lignes], page, gare_dortoir)
+
+
+def gares_debut_fin(df_assign_mat):
+    """
+    ({rame: gare de début de journée}, {rame: gare de fin}) : première marche au départ,
+    dernière à l'arrivée, par tri des seules colonnes horaires (pas du DataFrame).
+    """
+    rames = df_assign_mat["rame"].to_numpy()
+    extremes = []
+    for col_heure, col_gare, derniere in (("depart", "gare_depart", False), ("arrivee", "gare_arrivee", True)):
+        ordre = np.lexsort((df_assign_mat[col_heure].to_numpy(), rames))
+        r = rames[ordre]
+        change = r[1:] != r[:-1]
+        bords = np.flatnonzero(np.r_[change, True] if derniere else np.r_[True, change])
+        gares = df_assign_mat[col_gare].to_numpy()[ordre[bords]]
+        extremes.append(dict(zip(r[bords].tolist(), gares.tolist())))
+    return extremes[0], extremes[1]
+
+
+def draw_rame(c, lay, y_start, ligne_auj, next_line, prev_line):
+    """Dessine le cadre d'une rame (haut du cadre en y_start) à partir de son layout pré-calculé."""
+    cadre_top = y_start
+    cadre_bottom = y_start - RAME_HEIGHT
+    y_line = cadre_bottom + (RAME_HEIGHT / 2)
+
+    # ---- Roulement ----
+    ligne_demain = next_line[ligne_auj]
+    ligne_hier = prev_line[ligne_auj]
+
+    texte_roulement = f"{ligne_hier} ➜ {ligne_auj} ➜ {ligne_demain}"
+
+    # Cadre + traits horaires (gabarit partagé, rame inutilisée : cadre seul)
+    c.saveState()
+    c.translate(0, cadre_bottom)
+    c.doForm(FORM_CADRE_RAME if lay["gare_dortoir"] is not None else FORM_GRILLE_RAME)
+    c.restoreState()
+
+    # Titre rame + axe
+    c.setFont("Helvetica-Bold", 5)
+    c.setFillColor(colors.magenta)
+    c.drawString(LEFT_MARGIN + 6, cadre_top - 12, texte_roulement)
+    c.setFillColor(colors.green)
+    c.drawString(LEFT_MARGIN + 30, cadre_bottom + 4, lay["axe"])
+
+    # Performance
+    if lay["perf"] is not None:
+        c.setFont("Helvetica-Bold", 5)
+        c.setFillColor(colors.green)
+        c.drawRightString(PAGE_WIDTH - RIGHT_MARGIN - 6,
+                          cadre_bottom + 4,
+                          f"Perf : {lay['perf']:.0f}%")
+        c.setFillColor(colors.black)
+
+    # Km total
+    if lay["km"] is not None:
+        c.setFont("Helvetica-Bold", 5)
+        c.setFillColor(colors.blue)
+        c.drawString(LEFT_MARGIN + 6, cadre_bottom + 4, f"{lay['km']} km")
+        c.setFillColor(colors.black)
+
+    # === RAME INUTILISÉE ===
+    if lay["gare_dortoir"] is not None:
+        c.setFont("Helvetica-Bold", 10)
+        c.setFillColor(colors.darkgray)
+        c.drawCentredString(
+            (LEFT_MARGIN + PAGE_WIDTH - RIGHT_MARGIN) / 2,
+            y_line + 5,
+            f"Rame garée à : {lay['gare_dortoir']}"
+        )
+        return
+    # =======================
+
+    # Ligne centrale
+    c.setStrokeColor(colors.black)
+    #c.line(LEFT_MARGIN, y_line, PAGE_WIDTH - RIGHT_MARGIN, y_line)
+
+    # === Marches classiques ===
+    x1s, x2s = lay["x1"], lay["x2"]
+    for k in range(len(x1s)):
+        x1 = x1s[k]
+        x2 = x2s[k]
+        bar_color = colors.lightgrey if lay["hlp"][k] else colors.black
+
+        # ===== Épaisseur selon UM (0 = simple, 1 = rame de tête, 2 = rame suivante) =====
+        um = lay["um"][k]
+        if um == 1:
+            draw_train_bar(c, x1, x2, y_line+ 1.5, height=3, color=bar_color)
+            draw_train_bar(c, x1, x2, y_line- 2, height=0.75, color=bar_color)
+        elif um == 2:
+            draw_train_bar(c, x1, x2, y_line+ 2, height=0.75, color=bar_color)
+            draw_train_bar(c, x1, x2, y_line- 1.5, height=3, color=bar_color)
+        else:
+            draw_train_bar(c, x1, x2, y_line, height=5, color=bar_color) # Cas normal
+
+        c.setFillColor(colors.black)
+
+        # --- Affichage de la gare de départ ---
+        if k > 0:
+            if lay["meme_gare"][k]:
+                # Gares identiques → on affiche au milieu
+                y_base = y_line - 7
+                c.setFont("Helvetica", 5)
+                c.drawCentredString((x2s[k - 1] + x1) / 2.0, y_base, lay["gare_dep"][k])
+                draw_time_only(c, x2s[k - 1], y_base - 5, lay["heure_arr"][k - 1], "center")
+                draw_time_only(c, x1, y_base - 10, lay["heure_dep"][k], "center")
+            else:
+                # On affiche la gare précédente à droite
+                draw_station_label(
+                    c,
+                    x2s[k - 1] - 1,
+                    y_line - 7,
+                    lay["gare_arr"][k - 1],
+                    lay["heure_arr"][k - 1],
+                    align="right",
+                )
+
+        if not lay["meme_gare"][k]:
+            draw_station_label(
+                c, lay["x_label_dep"][k], y_line - 7,
+                lay["gare_dep"][k], lay["heure_dep"][k], align="left"
+            )
+
+        # --- Numéro de marche ---
+        c.setFont("Helvetica", 5)
+        c.setFillColor(colors.darkgray)
+        c.drawCentredString((x1 + x2) / 2, y_line + lay["dy_num"][k], lay["marche_text"][k])
+
+        # --- Affichage des écarts trop courts ---
+        if lay["ecart_min"][k] is not None:
+            c.setFont("Helvetica-Bold", 4)
+            c.setFillColor(colors.red)
+            c.drawCentredString(lay["x_ecart"][k], y_line, lay["ecart_min"][k])
+            c.setFillColor(colors.black)
+
+
+    # === AFFICHAGE DE LA DERNIÈRE GARE ===
+    if len(x1s):
+        draw_station_label(
+            c,
+            x2s[-1] + LAST_LABEL_OFFSET,
+            y_line - 7,
+            lay["gare_arr"][-1],
+            lay["heure_arr"][-1],
+            align="right",
+        )
+
+
+# ------------------ PDF par matériel ------------------
+def draw_pdf_for_material(df_assign_mat, materiel_code, flux_par_axe, mode_chainage=None, streaming=None,
+                          dossier=""):
+    """
+    Génère un PDF pour un type de matériel donné (R2N, BGC, REG, 2NPG).
+    flux_par_axe : équilibre des flux des axes où ce matériel est engagé.
+    mode_chainage : "gare" ou "km" (par défaut MODE_CHAINAGE).
+    streaming : rendu page par page (par défaut RENDU_STREAMING).
+    dossier : dossier de sortie du PDF.
+    """
+    mode_chainage = mode_chainage or MODE_CHAINAGE
+    if streaming is None:
+        streaming = RENDU_STREAMING
+    if df_assign_mat.empty:
+        return
+
+    # --- Liste complète des rames du matériel (utilisées + inutilisées) ---
+    # Les rames inutilisées restent garées au dépôt d'affectation (aucune ligne ajoutée)
+    info = parc[materiel_code]
+    all_rames = range(info["numero"], info["numero"] + info["quantite"])
+    rame_list = sorted(set(df_assign_mat["rame"].unique()).union(all_rames))
+    gare_dodo = DEPOT_AFFECTATION.get(materiel_code, "MBC")
+
+    nom_pdf = os.path.join(dossier, f"roulements_{materiel_code}.pdf")
+    titre = f"Roulements – {materiel_code}"
+
+    # Début / fin de journée
+    start_station, end_station = gares_debut_fin(df_assign_mat)
+    for rame in rame_list:
+        start_station.setdefault(rame, gare_dodo)
+        end_station.setdefault(rame, gare_dodo)
+
+    # Numérotation lignes
+    rame_to_line = {rame: i + 1 for i, rame in enumerate(rame_list)}
+
+    # Enchaînement des lignes de roulement (hier ➜ aujourd'hui ➜ demain)
+    bilan_chainage = None
+    if mode_chainage == "km":
+        next_line, prev_line, bilan_chainage = chainer_roulements_km(rame_list, start_station, end_station)
+        print(f"🔁 Chaînage {materiel_code} : {bilan_chainage['km_total']:.0f} km de repositionnement "
+              f"({bilan_chainage['nb_liens_inconnus']} lien(s) sans distance connue)")
+    else:
+        next_line, prev_line = chainer_roulements(rame_list, start_station, end_station)
+
+    def dessiner_page(c, rames_page, layouts_page):
+        y_start = PAGE_HEIGHT - TOP_MARGIN
+        for rame in rames_page:
+            draw_rame(c, layouts_page[rame], y_start, rame_to_line[rame], next_line, prev_line)
+            y_start -= (RAME_HEIGHT + ESPACEMENT_RAME)
+
+    def derniere_page(c):
+        draw_params_page(c, materiel_code, f"Matériel {materiel_code}", flux_par_axe, bilan_chainage)
+
+    if streaming:
+        pages = iter_pages_rames(df_assign_mat, rame_list, gare_dodo)
+    else:
+        # Données de rendu pré-calculées pour tout le matériel d'un coup
+        layouts = prepare_rame_layouts(df_assign_mat, rame_list, gare_dodo)
+        pages = (
+            (rame_list[k:k + MAX_RAMES_PER_PAGE], layouts)
+            for k in range(0, len(rame_list), MAX_RAMES_PER_PAGE)
+        )
+
+    if streaming:
+        ecrire_par_morceaux(nom_pdf, titre, pages, dessiner_page, derniere_page)
+    else:
+        c = nouveau_canevas(nom_pdf, titre)
+        for num_page, (rames_page, layouts_page) in enumerate(pages):
+            if num_page > 0:
+                c.showPage()
+            dessiner_page(c, rames_page, layouts_page)
+        derniere_page(c)
+        c.save()
+    print(f"PDF généré : {nom_pdf}")
+
+
+def nouveau_canevas(chemin, titre=None):
+    """Canevas A4 avec les gabarits de cadre ; titre en haut de la première page s'il est donné."""
+    c = canvas.Canvas(chemin, pagesize=A4)
+    define_rame_forms(c)
+    if titre:
+        c.setFont("Helvetica-Bold", 14)
+        c.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - 20, titre)
+    return c
+
+
+def ecrire_par_morceaux(nom_pdf, titre, pages, dessiner_page, derniere_page):
+    """
+    Rendu en flux : chaque lot de PAGES_PAR_MORCEAU pages est écrit (et libéré) dans un PDF
+    intermédiaire, la page de fin sur le dernier ; les morceaux sont ensuite réunis dans nom_pdf
+    un par un (fusionner_pdf), sans jamais tenir tout le document en mémoire.
+    """
+    dossier = os.path.dirname(os.path.abspath(nom_pdf))
+    with tempfile.TemporaryDirectory(prefix=".rendu_", dir=dossier) as tmp:
+        morceaux = []
+        lot = list(itertools.islice(pages, PAGES_PAR_MORCEAU))
+        while True:
+            suivant = list(itertools.islice(pages, PAGES_PAR_MORCEAU))
+            chemin = os.path.join(tmp, f"{len(morceaux):05d}.pdf")
+            c = nouveau_canevas(chemin, None if morceaux else titre)
+            for num_page, (rames_page, layouts_page) in enumerate(lot):
+                if num_page > 0:
+                    c.showPage()
+                dessiner_page(c, rames_page, layouts_page)
+            if not suivant:
+                derniere_page(c)
+            c.save()
+            morceaux.append(chemin)
+            if not suivant:
+                break
+            lot = suivant
+
+        fusionner_pdf(morceaux, nom_pdf)
+
+
+_REFERENCE_PDF = re.compile(rb"(\d+) 0 R\b")
+
+
+def _objets_pdf(donnees):
+    """
+    Objets d'un PDF écrit par ReportLab (table xref classique) : {numéro: corps entre
+    « N 0 obj » et « endobj »} et le dictionnaire trailer. Les objets sont délimités par
+    les positions de la table xref, jamais en cherchant des mots-clés dans les flux.
+    """
+    startxref = donnees.rindex(b"startxref")
+    debut_xref = int(donnees[startxref + len(b"startxref"):].split()[0])
+    fin_xref = donnees.index(b"trailer", debut_xref)
+    jetons = donnees[debut_xref + len(b"xref"):fin_xref].split()
+    positions = {}
+    i = 0
+    while i < len(jetons):
+        premier, nombre = int(jetons[i]), int(jetons[i + 1])
+        for k in range(nombre):
+            position, _, etat = jetons[i + 2 + 3 * k:i + 5 + 3 * k]
+            if etat == b"n":
+                positions[premier + k] = int(position)
+        i += 2 + 3 * nombre
+
+    bornes = sorted(positions.values()) + [debut_xref]
+    suivante = dict(zip(bornes, bornes[1:]))
+    objets = {}
+    for numero, position in positions.items():
+        corps = donnees[position:suivante[position]]
+        corps = corps[corps.index(b"obj") + len(b"obj"):corps.rindex(b"endobj")]
+        objets[numero] = corps
+    return objets, donnees[fin_xref:startxref]
+
+
+def _reference(dictionnaire, cle):
+    return int(re.search(rb"/" + cle + rb" (\d+) 0 R", dictionnaire).group(1))
+
+
+def fusionner_pdf(morceaux, nom_pdf):
+    """
+    Concatène les pages des PDF morceaux (écrits par ReportLab) dans nom_pdf, un morceau
+    en mémoire à la fois : les objets de chaque morceau sont renumérotés et recopiés tels quels
+    (flux compris), seuls le catalogue et l'arbre des pages sont réécrits pour le document entier.
+    """
+    # Objets 1 et 2 : catalogue et arbre des pages du document fusionné (écrits à la fin)
+    prochain = 3
+    pages = []
+    positions = {}
+    with open(nom_pdf + ".tmp", "wb") as sortie:
+        sortie.write(b"%PDF-1.4\n%\x93\x8c\x8b\x9e\n")
+        for chemin in morceaux:
+            with open(chemin, "rb") as f:
+                objets, trailer = _objets_pdf(f.read())
+            catalogue = _reference(trailer, b"Root")
+            arbre = _reference(objets[catalogue], b"Pages")
+            ignores = {catalogue, arbre, _reference(trailer, b"Info")}
+            nouveaux = {}
+            for numero in sorted(objets):
+                if numero not in ignores:
+                    nouveaux[numero] = prochain
+                    prochain += 1
+            nouveaux[arbre] = 2
+
+            def renumeroter(m):
+                return b"%d 0 R" % nouveaux[int(m.group(1))]
+
+            pages += [nouveaux[int(n)] for n in _REFERENCE_PDF.findall(
+                re.search(rb"/Kids \[(.*?)\]", objets[arbre], re.S).group(1))]
+            for numero, corps in sorted(objets.items()):
+                if numero in ignores:
+                    continue
+                # Références renumérotées dans le dictionnaire seulement, le flux est recopié tel quel
+                fin_dict = corps.find(b"stream") if b"stream" in corps else len(corps)
+                corps = _REFERENCE_PDF.sub(renumeroter, corps[:fin_dict]) + corps[fin_dict:]
+                positions[nouveaux[numero]] = sortie.tell()
+                sortie.write(b"%d 0 obj" % nouveaux[numero] + corps + b"endobj\n")
+
+        positions[1] = sortie.tell()
+        sortie.write(b"1 0 obj\n<<\n/PageMode /UseNone /Pages 2 0 R /Type /Catalog\n>>\nendobj\n")
+        positions[2] = sortie.tell()
+        sortie.write(b"2 0 obj\n<<\n/Count %d /Kids [ %s ] /Type /Pages\n>>\nendobj\n"
+                     % (len(pages), b" ".join(b"%d 0 R" % n for n in pages)))
+
+        debut_xref = sortie.tell()
+        sortie.write(b"xref\n0 %d\n0000000000 65535 f \n" % prochain)
+        for numero in range(1, prochain):
+            sortie.write(b"%010d 00000 n \n" % positions[numero])
+        sortie.write(b"trailer\n<<\n/Root 1 0 R /Size %d\n>>\nstartxref\n%d\n%%%%EOF\n" % (prochain, debut_xref))
+    os.replace(nom_pdf + ".tmp", nom_pdf)
+
+
+# Couleurs des directions dans les graphes PPHPD
+COULEURS_PPHPD = [colors.HexColor("#1f77b4"), colors.HexColor("#ff7f0e")]
+
+
+def build_pphpd_drawing(axe, dfp, largeur, hauteur):
+    """
+    Graphe vectoriel PPHPD (une courbe par direction) pour un axe.
+    dfp : PPHPD pivoté (index = heure, colonnes = directions).
+    """
+    d = Drawing(largeur, hauteur)
+
+    d.add(String(largeur / 2, hauteur - 12, f"PPHPD – {axe}",
+                 fontName="Helvetica", fontSize=10, textAnchor="middle"))
+
+    lp = LinePlot()
+    lp.x = 40
+    lp.y = 25
+    lp.width = largeur - 60
+    lp.height = hauteur - 50
+
+    heures = [float(h) for h in dfp.index]
+    lp.data = [list(zip(heures, dfp[col].astype(float).tolist())) for col in dfp.columns]
+
+    for i, col in enumerate(dfp.columns):
+        couleur = COULEURS_PPHPD[i % len(COULEURS_PPHPD)]
+        lp.lines[i].strokeColor = couleur
+        lp.lines[i].strokeWidth = 1.2
+        lp.lines[i].symbol = makeMarker("FilledCircle", size=3, fillColor=couleur, strokeColor=couleur)
+
+    lp.xValueAxis.valueMin = min(heures)
+    lp.xValueAxis.valueMax = max(heures)
+    lp.xValueAxis.valueStep = 1 if len(heures) <= 24 else 2
+    lp.xValueAxis.labels.fontName = "Helvetica"
+    lp.xValueAxis.labels.fontSize = 7
+    lp.xValueAxis.visibleGrid = True
+    lp.xValueAxis.gridStrokeColor = colors.lightgrey
+    lp.xValueAxis.gridStrokeWidth = 0.5
+    lp.yValueAxis.valueMin = 0
+    lp.yValueAxis.labels.fontName = "Helvetica"
+    lp.yValueAxis.labels.fontSize = 7
+    lp.yValueAxis.visibleGrid = True
+    lp.yValueAxis.gridStrokeColor = colors.lightgrey
+    lp.yValueAxis.gridStrokeWidth = 0.5
+    d.add(lp)
+
+    legende = Legend()
+    legende.x = lp.x + lp.width - 70
+    legende.y = lp.y + lp.height - 4
+    legende.fontName = "Helvetica"
+    legende.fontSize = 7
+    legende.dx = 8
+    legende.dy = 8
+    legende.deltay = 10
+    legende.alignment = "right"
+    legende.boxAnchor = "nw"
+    legende.colorNamePairs = [
+        (COULEURS_PPHPD[i % len(COULEURS_PPHPD)], str(col)) for i, col in enumerate(dfp.columns)
+    ]
+    d.add(legende)
+
+    return d
+
+
+def generate_pphpd_global(pphpd_par_axe, dossier=""):
+    PAGE_WIDTH, PAGE_HEIGHT = A4
+    nom_pdf = os.path.join(dossier, "PPHPD_global.pdf")
+
+    c = canvas.Canvas(nom_pdf, pagesize=A4)
+    # ========= PAGE 1 : TITRE + TEXTE TECHNIQUE =========
+    c.setFont("Helvetica-Bold", 20)
+    c.drawCentredString(PAGE_WIDTH/2, PAGE_HEIGHT - 40, "PPHPD – Global")
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, PAGE_HEIGHT - 90, "Méthode de calcul du PPHPD")
+
+    c.setFont("Helvetica", 10)
+    text = [
+        "Le PPHPD (Place Par Heure et par Direction) permet d’estimer la",
+        "capacité théorique maximale offerte par l’exploitation, heure par heure.",
+        "",
+        "Règles appliquées :",
+        " • Avant 12h : le PPHPD est calculé à partir de l’heure d’arrivée des trains.",
+        " • Après 12h : le PPHPD est calculé à partir de l’heure de départ.",
+        " • Les marches vides voyageurs (HLP, navettes, évolutions) sont exclues.",
+        " • La direction est déterminée par le numéro de marche :",
+        "      - Numéro pair   → direction Paris",
+        "      - Numéro impair → direction Province",
+    ]
+
+    y = PAGE_HEIGHT - 120
+    for line in text:
+        c.drawString(40, y, line)
+        y -= 14
+
+    c.showPage()
+    # ========= FIN PAGE INTRO =========
+
+    # Mise en page : 2 graphiques par page
+    graphs_per_page = 0
+    current_y = PAGE_HEIGHT - 80
+    graph_height = 200
+    left_margin = 40
+    right_margin = 40
+
+    for axe, df in pphpd_par_axe.items():
+        if df.empty:
+            continue
+
+        dfp = df.pivot(index="heure", columns="direction", values="pphpd").fillna(0)
+
+        # Nouvelle page si on a déjà 2 graphiques sur la page
+        if graphs_per_page >= 2:
+            c.showPage()
+            graphs_per_page = 0
+            current_y = PAGE_HEIGHT - 80
+
+        # Titre de l'axe
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(left_margin, current_y, f"Axe : {axe}")
+
+        # Graphe vectoriel juste en dessous
+        graph_top = current_y - 20
+        graph_width = PAGE_WIDTH - left_margin - right_margin
+        drawing = build_pphpd_drawing(axe, dfp, graph_width, graph_height)
+        renderPDF.draw(drawing, c, left_margin, graph_top - graph_height)
+
+        graphs_per_page += 1
+        current_y = graph_top - graph_height - 40  # espace avant le prochain graphe
+
+    c.save()
+    print(f"PDF global PPHPD généré : {nom_pdf}")
@@ -0,0 +1,264 @@
+# service_whatif.py
+# Service HTTP local (bibliothèque standard) pour les questions « et si ? » :
+# marches, distances, maintenances et parc restent en mémoire entre deux requêtes,
+# seule l'affectation est rejouée avec les paramètres demandés (résultats gardés en cache LRU).
+#
+#   python service_whatif.py [--port 8765]
+#   GET  /parametres                               paramètres et parc par défaut
+#   GET  /kpi?temps_minimal=0.25&parc.BGC=24       indicateurs (idem /affectation, /pphpd)
+#   POST /kpi  {"temps_minimal": 0.25, "parc": {"BGC": 24}, "axe": ["marseille-avignon"]}
+#   POST /recharger                                relit marches / km / maintenances, vide le cache
+# Les durées (temps_minimal, tampon...) sont en heures décimales, comme dans parametres.py.
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import affectation_pdf as moteur
+import parametres
+from cache_marches import charger_marches
+from modele_affectation import TypeMarche
+from parametres import DOSSIER_JSON, PARAMETRES_METIER, parc, charger_km, distances, charger_maintenances
+
+
+HOTE = "127.0.0.1"
+PORT = 8765
+TAILLE_CACHE_WHATIF = 64   # nb de jeux de paramètres gardés en mémoire (LRU)
+
+# Paramètres métier modifiables par requête (lus à l'appel dans parametres par le moteur et le rendu)
+PARAMETRES_WHATIF = PARAMETRES_METIER
+
+# parametres_temporaires modifie le module parametres et le dict parc partagés : un seul scénario
+# à la fois par processus (le serveur HTTP traite déjà les requêtes une par une, le verrou
+# protège les autres appelants : threads, serveur multi-thread)
+_verrou_parametres = threading.RLock()
+
+
+@contextlib.contextmanager
+def parametres_temporaires(valeurs, quantites):
+    """
+    Applique les paramètres métier (dans le module parametres, lu à l'appel par le moteur
+    et le rendu) et les quantités de parc le temps d'une affectation, puis restaure.
+    Modifie l'état global du processus : les appels concurrents sont sérialisés par _verrou_parametres.
+    """
+    with _verrou_parametres:
+        anciens = {nom: getattr(parametres, nom) for nom in valeurs}
+        anciennes_quantites = {code: parc[code]["quantite"] for code in quantites}
+        try:
+            for nom, valeur in valeurs.items():
+                setattr(parametres, nom, valeur)
+            for code, quantite in quantites.items():
+                parc[code]["quantite"] = quantite
+            yield
+        finally:
+            for nom, valeur in anciens.items():
+                setattr(parametres, nom, valeur)
+            for code, quantite in anciennes_quantites.items():
+                parc[code]["quantite"] = quantite
+
+
+def normaliser_demande(demande):
+    """
+    Demande (query string ou JSON) → clé canonique :
+    {"parametres": {nom: float}, "parc": {code: int}, "axes": [fichiers]}.
+    Les durées doivent être > 0 et les quantités des entiers ≥ 0 (0 : matériel retiré du parc).
+    Lève ValueError si la demande est mal formée (réponse 400).
+    """
+    if not isinstance(demande, dict):
+        raise ValueError("la demande doit être un objet JSON")
+
+    parametres, quantites = {}, {}
+    for nom in PARAMETRES_WHATIF:
+        if demande.get(nom) is not None:
+            parametres[nom] = _nombre(nom, demande[nom], float, minimum=0, strict=True)
+
+    parc_demande = demande.get("parc") or {}
+    if not isinstance(parc_demande, dict):
+        raise ValueError("parc doit être un objet {matériel: quantité}")
+    parc_demande = dict(parc_demande)
+    for cle, valeur in demande.items():
+        if cle.startswith("parc."):
+            parc_demande[cle[len("parc."):]] = valeur
+    for code, quantite in parc_demande.items():
+        if code not in parc:
+            raise ValueError(f"Matériel inconnu : {code} — connus : {', '.join(parc)}")
+        quantites[code] = _nombre(f"parc.{code}", quantite, int, minimum=0)
+
+    axes = demande.get("axe") or []
+    if isinstance(axes, str):
+        axes = [axes]
+    if not isinstance(axes, list) or not all(isinstance(axe, str) for axe in axes):
+        raise ValueError("axe doit être un nom de fichier ou une liste de noms")
+    return {"parametres": parametres, "parc": quantites, "axes": sorted(axes)}
+
+
+def nom_scenario(scenario):
+    """Nom stable d'un scénario normalisé (base SQLite, dossier de sortie) : whatif-<empreinte>."""
+    cle = json.dumps(scenario, sort_keys=True)
+    return "whatif-" + hashlib.sha256(cle.encode()).hexdigest()[:10]
+
+
+def _nombre(nom, valeur, type_, minimum, strict=False):
+    """
+    Valeur numérique finie de la demande (booléens refusés), convertie en type_,
+    ≥ minimum (> minimum si strict).
+    """
+    try:
+        if isinstance(valeur, bool):
+            raise ValueError
+        nombre = float(valeur)
+        if not math.isfinite(nombre) or (type_ is int and not nombre.is_integer()):
+            raise ValueError
+    except (TypeError, ValueError):
+        attendu = "un entier" if type_ is int else "un nombre"
+        raise ValueError(f"{nom} doit être {attendu} (reçu {valeur!r})") from None
+    if nombre < minimum or (strict and nombre == minimum):
+        raise ValueError(f"{nom} doit être {'>' if strict else '≥'} {minimum} (reçu {valeur!r})")
+    return type_(nombre)
+
+
+def _records(df):
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+class EtatWhatif:
+    """Données chargées une fois et résultats des derniers scénarios (cache borné)."""
+
+    def __init__(self, taille_cache=TAILLE_CACHE_WHATIF):
+        self.taille_cache = taille_cache
+        self.cache = OrderedDict()
+        self.recharger()
+
+    def recharger(self):
+        charger_km()
+        self.marches = charger_marches(
+            DOSSIER_JSON, gares_connues=moteur.gares_referentiel(), trajets_connus=distances().keys()
+        )
+        self.maintenances = charger_maintenances()
+        self.cache.clear()
+
+    def scenario(self, demande):
+        """Résultat du scénario (affectation, kpi, pphpd) et indicateur de cache."""
+        cle = json.dumps(demande, sort_keys=True)
+        if cle in self.cache:
+            self.cache.move_to_end(cle)
+            return self.cache[cle], True
+
+        resultat = self._calculer(demande)
+        self.cache[cle] = resultat
+        if len(self.cache) > self.taille_cache:
+            self.cache.popitem(last=False)
+        return resultat, False
+
+    def _calculer(self, demande):
+        # Les messages du moteur (maintenances placées...) ne vont pas dans le journal du service
+        with parametres_temporaires(demande["parametres"], demande["parc"]), \
+                contextlib.redirect_stdout(io.StringIO()):
+            res = moteur.affecter_marches(axes=demande["axes"] or None, marches=self.marches)
+            if res is None:
+                return {"affectation": [], "kpi": {}, "pphpd": {}}
+            df, _, pphpd_par_axe = res
+            df = moteur.placer_maintenances(df, self.maintenances)
+            quantites = {code: info["quantite"] for code, info in parc.items()}
+
+        est_maint = df["type_marche"] == TypeMarche.MAINT
+        trains = df[~est_maint]
+        vide = trains["vide_voyageur"].astype(bool)
+        creneaux = sum(len(self.maintenances[code]["slots"])
+                       for code in trains["materiel"].dropna().unique() if code in self.maintenances)
+        kpi = {
+            "rames_utilisees": {k: int(v) for k, v in trains.groupby("materiel", observed=True)["rame"].nunique().items()},
+            "rames_disponibles": quantites,
+            "marches": int((~vide).sum()),
+            "hlp": int(vide.sum()),
+            "km_commerciaux": float(trains["distance_km"].sum()),
+            "maintenances_placees": int(est_maint.sum()),
+            "maintenances_demandees": creneaux,
+            "pphpd_max": {axe: int(dfp["pphpd"].max()) for axe, dfp in pphpd_par_axe.items() if not dfp.empty},
+        }
+        return {
+            "affectation": _records(moteur.resume_affectation(df).reset_index()),
+            "kpi": kpi,
+            "pphpd": {axe: _records(dfp) for axe, dfp in pphpd_par_axe.items()},
+        }
+
+
+class GestionnaireWhatif(BaseHTTPRequestHandler):
+    etat = None   # EtatWhatif partagé (serveur mono-thread : les globaux du moteur ne sont jamais concurrents)
+
+    def _repondre(self, code, contenu):
+        corps = json.dumps(contenu, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _traiter(self, demande):
+        chemin = urlparse(self.path).path.rstrip("/")
+        if chemin == "/parametres":
+            return self._repondre(200, {
+                "parametres": {nom: getattr(parametres, nom) for nom in PARAMETRES_WHATIF},
+                "parc": {code: info["quantite"] for code, info in parc.items()},
+                "axes": sorted(self.etat.marches),
+            })
+        if chemin not in ("/affectation", "/kpi", "/pphpd"):
+            return self._repondre(404, {"erreur": f"Route inconnue : {chemin}"})
+
+        debut = time.perf_counter()
+        try:
+            scenario = normaliser_demande(demande)
+        except ValueError as e:
+            return self._repondre(400, {"erreur": f"Demande invalide : {e}"})
+        try:
+            resultat, en_cache = self.etat.scenario(scenario)
+        except (ValueError, RuntimeError) as e:
+            return self._repondre(422, {"erreur": str(e)})
+        self._repondre(200, {
+            chemin.lstrip("/"): resultat[chemin.lstrip("/")],
+            "cache": en_cache,
+            "duree_ms": round((time.perf_counter() - debut) * 1000, 1),
+        })
+
+    def do_GET(self):
+        requete = parse_qs(urlparse(self.path).query)
+        demande = {cle: (valeurs if cle == "axe" else valeurs[-1]) for cle, valeurs in requete.items()}
+        self._traiter(demande)
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") == "/recharger":
+            self.etat.recharger()
+            return self._repondre(200, {"recharge": True})
+        longueur = int(self.headers.get("Content-Length") or 0)
+        try:
+            demande = json.loads(self.rfile.read(longueur) or b"{}")
+        except ValueError:
+            return self._repondre(400, {"erreur": "Corps JSON invalide"})
+        self._traiter(demande)
+
+
+def servir(hote=HOTE, port=PORT):
+    GestionnaireWhatif.etat = EtatWhatif()
+    serveur = HTTPServer((hote, port), GestionnaireWhatif)
+    print(f"🌐 Service « et si ? » sur http://{hote}:{port} (Ctrl+C pour arrêter)")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        print("\nService arrêté.")
+    finally:
+        serveur.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service HTTP local d'affectation « et si ? ».")
+    parser.add_argument("--hote", default=HOTE)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    servir(args.hote, args.port)
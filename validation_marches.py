@@ -0,0 +1,87 @@
+# validation_marches.py
+# Contrôle des marches en une passe vectorisée, avant l'affectation : les lignes invalides
+# sont écartées et résumées dans un rapport compact (au lieu de planter ou de donner 0 km plus loin).
+import pandas as pd
+
+
+# code : (libellé, rejet de la marche)
+CONTROLES = {
+    "marche_invalide":      ("numéro de marche manquant ou négatif", True),
+    "gare_inconnue":        ("gare absente du référentiel (nom non converti ?)", True),
+    "heure_manquante":      ("heure de départ / d'arrivée manquante ou illisible", True),
+    "hors_journee":         ("heure hors 0h-24h (après minuit ?)", True),
+    "arrivee_avant_depart": ("arrivée avant ou égale au départ", True),
+    "um_invalide":          ("nombre de rames couplées (um) non entier ou < 1", True),
+    "distance_inconnue":    ("trajet absent de km_marches.json (compté 0 km)", False),
+}
+
+NB_EXEMPLES_RAPPORT = 3
+
+
+def controler_marches(df, gares_connues=None, trajets_connus=None):
+    """
+    Renvoie un DataFrame booléen (une colonne par contrôle de CONTROLES, True = anomalie).
+    gares_connues / trajets_connus : ensembles de référence (contrôle ignoré si None).
+    """
+    depart = pd.to_numeric(df["depart"], errors="coerce")
+    arrivee = pd.to_numeric(df["arrivee"], errors="coerce")
+    vide = df["vide_voyageur"].astype("boolean").fillna(False) if "vide_voyageur" in df.columns \
+        else pd.Series(False, index=df.index)
+
+    anomalies = pd.DataFrame(False, index=df.index, columns=list(CONTROLES))
+    # Identifiant absent ou vide ; un identifiant non numérique (texte) reste valide,
+    # un numéro négatif (dont MARCHE_ABSENTE du cache) ne l'est pas
+    marche = df["marche"]
+    numeros = pd.to_numeric(marche, errors="coerce")
+    anomalies["marche_invalide"] = marche.isna() | (marche.astype(str).str.strip() == "") | (numeros < 0)
+    anomalies["heure_manquante"] = depart.isna() | arrivee.isna()
+    anomalies["hors_journee"] = (depart < 0) | (depart >= 24) | (arrivee < 0) | (arrivee > 24)
+    anomalies["arrivee_avant_depart"] = arrivee <= depart
+    if "um" in df.columns:
+        um = pd.to_numeric(df["um"], errors="coerce")
+        anomalies["um_invalide"] = um.isna() | (um < 1) | (um % 1 != 0)
+
+    if gares_connues is not None:
+        gares_connues = list(gares_connues)
+        anomalies["gare_inconnue"] = ~df["gare_depart"].isin(gares_connues) | ~df["gare_arrivee"].isin(gares_connues)
+
+    if trajets_connus is not None:
+        trajets = pd.MultiIndex.from_arrays([df["gare_depart"], df["gare_arrivee"]])
+        anomalies["distance_inconnue"] = ~vide.to_numpy() & ~trajets.isin(list(trajets_connus))
+
+    return anomalies
+
+
+def rapport_validation(df, anomalies, colonne_source=None):
+    """Rapport compact : un compte par contrôle + quelques exemples."""
+    lignes = []
+    for code, (libelle, rejet) in CONTROLES.items():
+        masque = anomalies[code].to_numpy()
+        nb = int(masque.sum())
+        if not nb:
+            continue
+        exemples = df[masque].head(NB_EXEMPLES_RAPPORT)
+        ex = ", ".join(
+            (f"{r[colonne_source]} " if colonne_source else "")
+            + f"#{r['marche']} {r['gare_depart']}→{r['gare_arrivee']} {r['depart']}-{r['arrivee']}"
+            for _, r in exemples.iterrows()
+        )
+        lignes.append(f"   {'❌' if rejet else '⚠️'} {code:<22} {nb:>5}  {libelle} — ex. {ex}")
+    return lignes
+
+
+def valider_marches(df, gares_connues=None, trajets_connus=None, colonne_source=None):
+    """
+    Contrôle toutes les marches d'un coup, affiche le rapport et renvoie (marches valides, masque des rejets).
+    Les contrôles non bloquants (distance inconnue) sont seulement signalés.
+    """
+    anomalies = controler_marches(df, gares_connues, trajets_connus)
+    bloquants = [code for code, (_, rejet) in CONTROLES.items() if rejet]
+    rejet = anomalies[bloquants].any(axis=1).to_numpy()
+
+    lignes = rapport_validation(df, anomalies, colonne_source)
+    if lignes:
+        print(f"⚠️ Validation des marches : {int(rejet.sum())} rejetée(s) sur {len(df)}")
+        print("\n".join(lignes))
+
+    return df[~rejet], rejet